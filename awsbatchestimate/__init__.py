@@ -0,0 +1,31 @@
+# AWS Batch Cost Estimator
+#
+# Reads input CMDB information from a traditional data center to size and cost estimate AWS EC2 & RDS
+# infrastructure.
+#
+#     from awsbatchestimate import EstimatorConfig, build_catalog, estimate
+#
+#     config = EstimatorConfig(srcCPUUsage='CPU_Usage')
+#     catalog = build_catalog(config)
+#     dfEstimate = estimate(dfCMDB, catalog, config)
+#
+# The catalog is built once from the price lists and can be reused for any number of
+# estimate() calls.  The command line is python -m awsbatchestimate.
+
+from .batch import estimate_batch
+from .catalog import Catalog, CatalogPlan, build_catalog, plan_catalog
+from .catalogfile import load_catalog, save_catalog
+from .cmdbio import read_cmdb, write_cmdb
+from .config import EstimatorConfig
+from .estimator import estimate, estimate_csv_chunked
+from .incremental import estimate_incremental
+from .pricing import PriceListSource
+from .rollup import Rollup
+from .sweep import expand_scenarios, sweep
+from .trace import Tracer
+from .utilization import apply_utilization, compute_utilization
+
+__all__ = ['Catalog', 'CatalogPlan', 'EstimatorConfig', 'PriceListSource', 'apply_utilization', 'build_catalog',
+           'compute_utilization', 'estimate', 'estimate_batch', 'estimate_csv_chunked', 'estimate_incremental',
+           'expand_scenarios', 'load_catalog', 'plan_catalog', 'read_cmdb', 'Rollup', 'save_catalog', 'sweep',
+           'Tracer', 'write_cmdb']
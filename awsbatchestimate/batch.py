@@ -0,0 +1,115 @@
+# AWS Batch Cost Estimator - batch mode
+#
+# Estimates many CMDB files in one run, e.g. one per business unit.  The catalog is built
+# once for all of them, the files are spread over a process pool and each worker gets the
+# catalog once when it starts, so nothing is fetched or parsed again per file.  Every input
+# gets its own output file, and a rollup with one line of totals per file plus an overall
+# total is written next to them.
+#
+# The inputs are every CMDB file in a directory, or the files listed in a manifest: one
+# path per line, relative to the manifest, with blank lines and # comments ignored.
+
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+
+from .catalog import CatalogPlan, plan_catalog
+from .catalogfile import open_catalog
+from .classify import classify_cmdb, input_columns
+from .cmdbio import formatExtensions, read_cmdb, write_cmdb
+from .config import EstimatorConfig
+from .estimator import estimate, summarize_estimate
+
+logger = logging.getLogger(__name__)
+
+# Input files for a directory or manifest, in a stable order
+def batch_inputs(source):
+    source = Path(source)
+    if source.is_dir():
+        return sorted(path for path in source.iterdir()
+                      if path.is_file() and path.suffix.lower() in formatExtensions)
+
+    inputs = []
+    with open(source) as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if line:
+                path = Path(line)
+                inputs.append(path if path.is_absolute() else source.parent / path)
+    return inputs
+
+# Output file for an input: the input's name with _aws_bom added, in the same format
+def batch_output(inputPath, outputDir):
+    inputPath = Path(inputPath)
+    return Path(outputDir) / (inputPath.stem + '_aws_bom' + inputPath.suffix)
+
+# One plan covering every input, so a single catalog serves the whole batch
+def plan_batch(inputs, config):
+    ec2 = set()
+    rds = set()
+    for inputPath in inputs:
+        dfCMDB = read_cmdb(inputPath, config.categoricalColumns, input_columns(config))
+        plan = plan_catalog(classify_cmdb(dfCMDB, config), config)
+        ec2.update(plan.ec2)
+        rds.update(plan.rds)
+    return CatalogPlan(ec2=sorted(ec2), rds=sorted(rds))
+
+# Each pool worker gets the catalog and config once, not once per file
+batchState = {}
+
+def init_batch_worker(catalog, config):
+    batchState['catalog'] = open_catalog(catalog)
+    batchState['config'] = config
+
+# Estimate one file and return its totals
+def estimate_file(inputPath, outputPath):
+    config = batchState['config']
+    dfCMDB = read_cmdb(inputPath, config.categoricalColumns, input_columns(config))
+    dfCMDB = estimate(dfCMDB, batchState['catalog'], config)
+    write_cmdb(dfCMDB, outputPath, config.categoricalColumns)
+
+    summary = {'input': str(inputPath), 'output': str(outputPath)}
+    summary.update(summarize_estimate(dfCMDB, config))
+    summary['ebs_month_total'] = dfCMDB['ebs_month_rate'].sum()
+    return summary
+
+# Estimate every input against the catalog, writing one output per input into outputDir,
+# and return the rollup: totals per file and a TOTAL line.  workers is the process pool
+# size, 1 runs everything in this process.  The biggest files are started first so one
+# large file doesn't hold up the end of the batch.  catalog can also be the path of a
+# catalog file, which each worker then maps for itself.
+def estimate_batch(inputs, outputDir, catalog, config=None, workers=None):
+    if config is None:
+        config = EstimatorConfig()
+    Path(outputDir).mkdir(parents=True, exist_ok=True)
+
+    jobs = [(Path(inputPath), batch_output(inputPath, outputDir)) for inputPath in inputs]
+    order = {str(inputPath): position for position, (inputPath, outputPath) in enumerate(jobs)}
+    largestFirst = sorted(jobs, key=lambda job: os.path.getsize(job[0]), reverse=True)
+
+    logger.info("Estimating %d files....", len(jobs))
+    summaries = []
+    if workers == 1 or len(jobs) == 1:
+        init_batch_worker(catalog, config)
+        try:
+            for inputPath, outputPath in largestFirst:
+                summaries.append(estimate_file(inputPath, outputPath))
+                logger.info("Estimated %s", inputPath)
+        finally:
+            batchState.clear()
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_batch_worker,
+                                 initargs=(catalog, config)) as pool:
+            futures = {pool.submit(estimate_file, inputPath, outputPath): inputPath
+                       for inputPath, outputPath in largestFirst}
+            for future in as_completed(futures):
+                summaries.append(future.result())
+                logger.info("Estimated %s", futures[future])
+
+    dfRollup = pd.DataFrame(sorted(summaries, key=lambda summary: order[summary['input']]))
+    total = {'input': 'TOTAL', 'output': ''}
+    total.update((column, dfRollup[column].sum()) for column in dfRollup.columns[2:])
+    return pd.concat([dfRollup, pd.DataFrame([total])], ignore_index=True)
@@ -0,0 +1,333 @@
+# AWS Batch Cost Estimator - price catalog
+#
+# The catalog maps each (region, OS or DB engine, family) to the sorted list of instance
+# types the pricing API offers for it, with hourly, 1-year and 3-year rates, plus the fit
+# index used to match servers against it.  It is built once from the price lists and then
+# used to estimate any number of CMDB frames.
+
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from .classify import map_databases
+from .config import EstimatorConfig
+from .instancematch import build_fit_index, first_fit, matchColumns, rateColumns
+from .pricelist import parse_price_list
+from .pricing import PriceListSource
+from .trace import nullTracer
+
+logger = logging.getLogger(__name__)
+
+# Pricing location name for a region code
+def region_location(region, config):
+    if region not in config.regionLocations:
+        raise ValueError("Unknown AWS region " + repr(region) + ", add it to regionLocations")
+    return config.regionLocations[region]
+
+# Lets get specific and only get the license included, no pre-installed software, current generation, etc.
+def ec2_price_filters(region, os, family, config):
+    location = region_location(region, config)
+
+    if family == "c":
+        instanceFamily = config.awsComputeOptimized
+    elif family == "r":
+        instanceFamily = config.awsMemoryOptimized
+    else:
+        instanceFamily = config.awsGeneralPurpose
+
+    return [
+        {
+            'Type': 'TERM_MATCH',
+            'Field': 'location',
+            'Value': location
+        },
+        {
+            'Type': 'TERM_MATCH',
+            'Field': 'operatingSystem',
+            'Value': os
+        },
+        {
+            'Type': 'TERM_MATCH',
+            'Field': 'instanceFamily',
+            'Value': instanceFamily
+        },
+        {
+            'Type': 'TERM_MATCH',
+            'Field': 'currentGeneration',
+            'Value': 'Yes'
+        },
+        {
+            'Type': 'TERM_MATCH',
+            'Field': 'licenseModel',
+            'Value': 'No License required'
+        },
+        {
+            'Type': 'TERM_MATCH',
+            'Field': 'tenancy',
+            'Value': 'Shared'
+        },
+        {
+            'Type': 'TERM_MATCH',
+            'Field': 'preInstalledSw',
+            'Value': 'NA'
+        },
+        {
+            'Type': 'TERM_MATCH',
+            'Field': 'capacitystatus',
+            'Value': 'Used'
+        }
+    ]
+
+# Lets get specific and only get the license included, no pre-installed software, current generation, etc.
+def rds_price_filters(region, db, family, config):
+    location = region_location(region, config)
+
+    if family == "r":
+        instanceFamily = config.awsMemoryOptimized
+    else:
+        instanceFamily = config.awsGeneralPurpose
+
+    if db == config.awsAurora:
+        licensemodel="No license required"
+        instanceFamily = config.awsMemoryOptimized
+    else:
+        licensemodel="License included"
+
+    return [
+        {
+            'Type': 'TERM_MATCH',
+            'Field': 'location',
+            'Value': location
+        },
+        {
+            'Type': 'TERM_MATCH',
+            'Field': 'databaseEngine',
+            'Value': db
+        },
+        {
+            'Type': 'TERM_MATCH',
+            'Field': 'currentGeneration',
+            'Value': 'Yes'
+        },
+        {
+            'Type': 'TERM_MATCH',
+            'Field': 'instanceFamily',
+            'Value': instanceFamily
+        },
+        {
+            'Type': 'TERM_MATCH',
+            'Field': 'licenseModel',
+            'Value': licensemodel
+        },
+        {
+            'Type': 'TERM_MATCH',
+            'Field': 'capacitystatus',
+            'Value': 'Used'
+        }
+    ]
+
+# Sort an instance list into match order.  Memory optimized lists sort primarily by
+# memory, everything else primarily by vCPU.
+def sort_instance_list(dfInstanceList, family):
+    if(family == "r"):
+        dfInstanceList_sorted=dfInstanceList.sort_values(['memory', 'vcpu'], ascending=[True,True])
+    else:
+        dfInstanceList_sorted=dfInstanceList.sort_values(['vcpu', 'memory'], ascending=[True,True])
+
+    return dfInstanceList_sorted.reset_index(drop=True)
+
+# Turn the PriceList items of one EC2 query into the sorted instance list used for matching
+def ec2_instance_list(items, family, config):
+    return sort_instance_list(parse_price_list(items, 'AmazonEC2', family, config), family)
+
+# Turn the PriceList items of one RDS query into the sorted instance list used for matching
+def rds_instance_list(items, db, family, config):
+    return sort_instance_list(parse_price_list(items, 'AmazonRDS', family, config, db), family)
+
+@dataclass
+class Catalog:
+
+    # (region, os, family) -> (dfInstanceList_sorted, fitIndex) for EC2
+    ec2: dict = field(default_factory=dict)
+
+    # (region, db, family) -> (dfInstanceList_sorted, fitIndex) for RDS
+    rds: dict = field(default_factory=dict)
+
+    # Instance lists and indexes for the cheapest fit policies, built the first time a
+    # policy and rate asks for them
+    lookups: dict = field(default_factory=dict, repr=False)
+
+    # Instance matched to the server shapes resolved so far, per service, policy and rate,
+    # least recently used first.  Each keeps at most resolvedLimit shapes, so a long-running
+    # server's memo stays bounded however many distinct shapes it is sent.
+    resolved: dict = field(default_factory=dict, repr=False)
+    resolvedLimit: int = 1 << 18
+
+    # Guards lookups and resolved, which the server's request threads share
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    # Locks don't pickle, so a catalog sent to a worker process gets a fresh one
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state, lock=threading.Lock())
+
+    # Regions the catalog holds any group of a service for
+    def regions(self, service):
+        return {key[0] for key in (self.ec2 if service == 'ec2' else self.rds)}
+
+    # The groups to match a service's servers against under the config's match policy, as
+    # (region, os or db, family, dfInstanceList, fitIndex).  First fit uses the catalog as
+    # built.  Cheapest fit indexes each group by the match rate, and cheapest-any pools every
+    # family of a region and platform or engine into one group with family None.
+    def match_groups(self, service, config):
+        groups = self.ec2 if service == 'ec2' else self.rds
+        if config.matchPolicy == 'first-fit':
+            return [key + value for key, value in groups.items()]
+
+        lookupKey = (service, config.matchPolicy, config.matchRate)
+        with self.lock:
+            if lookupKey not in self.lookups:
+                rateColumn = rateColumns[config.matchRate]
+                if config.matchPolicy == 'cheapest':
+                    instanceLists = {key: dfInstanceList for key, (dfInstanceList, fitIndex) in groups.items()}
+                else:
+                    pooled = {}
+                    for (region, name, family), (dfInstanceList, fitIndex) in groups.items():
+                        pooled.setdefault((region, name, None), []).append(dfInstanceList)
+                    instanceLists = {key: pd.concat(dfs).drop_duplicates('instanceType').reset_index(drop=True)
+                                     for key, dfs in pooled.items()}
+                self.lookups[lookupKey] = [key + (dfInstanceList, build_fit_index(dfInstanceList, rateColumn))
+                                           for key, dfInstanceList in instanceLists.items()]
+            return self.lookups[lookupKey]
+
+    # The matched instance for each shape (region, os or db, family, cores, memory), as a
+    # tuple of the matchColumns values, or None where nothing fits.  Answers are memoized on
+    # the catalog, so chunks, batch files, sweep scenarios and server requests priced against
+    # it only resolve the shapes it hasn't seen recently.  Shapes without cores or memory
+    # never fit and aren't kept.
+    def resolve(self, service, config, shapes):
+        pooled = config.matchPolicy == 'cheapest-any'
+
+        answers = {}
+        missing = {}
+        with self.lock:
+            memo = self.resolved.setdefault((service, config.matchPolicy, config.matchRate), OrderedDict())
+            for shape in shapes:
+                region, name, family, cores, memory = shape
+                if shape in memo:
+                    memo.move_to_end(shape)
+                    answers[shape] = memo[shape]
+                elif pd.isna(cores) or pd.isna(memory):
+                    answers[shape] = None
+                else:
+                    missing.setdefault((region, name, None if pooled else family), []).append(shape)
+
+        if missing:
+            groups = {(region, name, family): (dfInstanceList, fitIndex)
+                      for region, name, family, dfInstanceList, fitIndex in self.match_groups(service, config)}
+            for key, groupShapes in missing.items():
+                if key not in groups:
+                    answers.update((shape, None) for shape in groupShapes)
+                    continue
+                dfInstanceList, fitIndex = groups[key]
+                choice = first_fit(fitIndex, [shape[3] for shape in groupShapes], [shape[4] for shape in groupShapes])
+                picked = dfInstanceList[[instanceColumn for cmdbColumn, instanceColumn in matchColumns]]
+                picked = picked.to_numpy(dtype=object)
+                answers.update((shape, tuple(picked[position]) if position >= 0 else None)
+                               for shape, position in zip(groupShapes, choice))
+            with self.lock:
+                for groupShapes in missing.values():
+                    memo.update((shape, answers[shape]) for shape in groupShapes)
+                while len(memo) > self.resolvedLimit:
+                    memo.popitem(last=False)
+
+        return [answers[shape] for shape in shapes]
+
+# Catalog groups to build, (region, os, family) for EC2 and (region, db, family) for RDS
+@dataclass
+class CatalogPlan:
+    ec2: list = field(default_factory=list)
+    rds: list = field(default_factory=list)
+
+# The full catalog: every region, platform or engine and family in the config
+def full_plan(config):
+    return CatalogPlan(
+        ec2=[(region, os, family) for region in config.regions for os in config.oses for family in config.families],
+        rds=[(region, db, family) for region in config.regions for db in config.dbs for family in config.families])
+
+# Demand-driven plan: only the groups the servers of a classified CMDB fall into, in any
+# region they map to but limited to the config's platforms, engines and families.  With
+# allFamilies every family of a region and platform or engine is included, for cheapest-any
+# matching and for sweeps, whose sizing knobs move servers between families.
+def plan_catalog(dfClassified, config, allFamilies=False):
+    if 'AWS_DB' not in dfClassified.columns:
+        dfClassified = map_databases(dfClassified.copy(), config)
+    allFamilies = allFamilies or config.matchPolicy == 'cheapest-any'
+
+    def groups(rows, nameColumn, names):
+        present = dfClassified.loc[rows, ['AWS_Region', nameColumn, 'calc_family']].drop_duplicates()
+        present = set(present.itertuples(index=False, name=None))
+        regions = sorted(set(region for region, name, family in present))
+        return [(region, name, family) for region in regions for name in names for family in config.families
+                if (region, name, family) in present
+                or (allFamilies and any((region, name, f) in present for f in config.families))]
+
+    rds = dfClassified['RDS'].to_numpy(dtype=bool)
+    return CatalogPlan(ec2=groups(~rds, 'AWS_OS', config.oses), rds=groups(rds, 'AWS_DB', config.dbs))
+
+# get_products queries for a plan, keyed the same way as the plan's groups
+def ec2_queries(config, plan=None):
+    plan = plan or full_plan(config)
+    return {(region, os, family): ec2_price_filters(region, os, family, config) for region, os, family in plan.ec2}
+
+def rds_queries(config, plan=None):
+    plan = plan or full_plan(config)
+    return {(region, db, family): rds_price_filters(region, db, family, config) for region, db, family in plan.rds}
+
+# Core matching and pricing code
+# Query the price lists for every group in the plan, by default every region, platform or
+# engine and family in the config, and turn them into the catalog
+def build_catalog(config=None, source=None, tracer=nullTracer, plan=None):
+    if config is None:
+        config = EstimatorConfig()
+    if source is None:
+        source = PriceListSource(config, tracer)
+    if plan is None:
+        plan = full_plan(config)
+
+    catalog = Catalog()
+
+    logger.info('Pricing EC2 instances....')
+
+    with tracer.stage('pricing', service='AmazonEC2', queries=len(plan.ec2)) as event:
+        ec2PriceLists = source.price_lists('AmazonEC2', ec2_queries(config, plan))
+        event['items'] = sum(len(items) for items in ec2PriceLists.values())
+
+    with tracer.stage('catalog', service='AmazonEC2') as event:
+        for region, os, family in plan.ec2:
+            logger.debug("Region %s OS %s Family %s", region, os, family)
+            dfInstanceList_sorted = ec2_instance_list(ec2PriceLists[(region, os, family)], family, config)
+            catalog.ec2[(region, os, family)] = (dfInstanceList_sorted, build_fit_index(dfInstanceList_sorted))
+        event['rows'] = sum(len(dfInstanceList) for dfInstanceList, fitIndex in catalog.ec2.values())
+
+    logger.info('Pricing RDS...')
+
+    with tracer.stage('pricing', service='AmazonRDS', queries=len(plan.rds)) as event:
+        rdsPriceLists = source.price_lists('AmazonRDS', rds_queries(config, plan))
+        event['items'] = sum(len(items) for items in rdsPriceLists.values())
+
+    with tracer.stage('catalog', service='AmazonRDS') as event:
+        for region, db, family in plan.rds:
+            logger.debug('Region %s DB %s Family %s', region, db, family)
+            dfInstanceList_sorted = rds_instance_list(rdsPriceLists[(region, db, family)], db, family, config)
+            catalog.rds[(region, db, family)] = (dfInstanceList_sorted, build_fit_index(dfInstanceList_sorted))
+        event['rows'] = sum(len(dfInstanceList) for dfInstanceList, fitIndex in catalog.rds.values())
+
+    return catalog
@@ -0,0 +1,145 @@
+# AWS Batch Cost Estimator - binary catalog files
+#
+# Saves a built catalog as fixed-width numpy arrays, so it can be priced once and then
+# opened by any number of estimator runs and worker processes without touching the price
+# lists again.  A catalog file is a directory of two .npy files:
+#
+#   instances.npy  one record per instance: type, family, vcpu, memory and the on-demand,
+#                  1-year and 3-year rates.  Each group's instances are stored together,
+#                  already in match order.
+#   groups.npy     the index, one record per (service, region, OS or engine, family) with
+#                  the start and stop of its instances.
+#
+# Both are opened with mmap_mode='r'.  The vCPU, memory and rate columns of the loaded
+# instance lists are views on the mapped array, so every process that opens the same file
+# shares those pages through the OS page cache.  The instance type and family text is
+# turned into Python strings per process, as pandas can't hold fixed-width text, and each
+# process builds its own fit indexes.
+#
+# The path given is a symlink to a versioned directory next to it.  Saving writes a new
+# version and swaps the link in one rename, so a reader opens either the old catalog or
+# the new one, never neither.  Where symlinks can't be made, as on Windows without the
+# privilege for them, the path is instead a small pointer file holding the name of the
+# version directory, swapped the same way.
+
+import os
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .catalog import Catalog
+from .instancematch import build_fit_index
+
+# Instance list columns in the order the catalog builds them, and their types in the file.
+# Text fields are fixed width, sized to the longest value when the file is written.
+instanceFields = [('instanceType', 'U'),
+                  ('memory', 'i8'),
+                  ('family', 'U'),
+                  ('one_hr_rate', 'f8'),
+                  ('one_yr_rate', 'f8'),
+                  ('three_yr_rate', 'f8'),
+                  ('vcpu', 'i8')]
+
+groupFields = [('service', 'U'), ('region', 'U'), ('name', 'U'), ('family', 'U'),
+               ('start', 'i8'), ('stop', 'i8')]
+
+def record_array(columns, fields):
+    return np.rec.fromarrays([np.asarray(columns[name], dtype=kind if kind != 'U' else str)
+                              for name, kind in fields],
+                             names=[name for name, kind in fields]).view(np.ndarray)
+
+# Write a catalog to path, replacing any catalog file already there.  It is written to a
+# new version directory and the path's link or pointer file is swapped to it with
+# os.replace, which is atomic.  The version it replaces is kept, for readers that resolved the link just before
+# the swap, and older ones are removed; processes that still have them mapped keep reading
+# them.
+def save_catalog(catalog, path):
+    path = Path(path)
+    instances = {name: [] for name, kind in instanceFields}
+    groups = {name: [] for name, kind in groupFields}
+    start = 0
+    for service, serviceGroups in (('ec2', catalog.ec2), ('rds', catalog.rds)):
+        for (region, name, family), (dfInstanceList, fitIndex) in serviceGroups.items():
+            for column, kind in instanceFields:
+                instances[column].extend(dfInstanceList[column].tolist())
+            for column, value in (('service', service), ('region', region), ('name', name),
+                                  ('family', family), ('start', start), ('stop', start + len(dfInstanceList))):
+                groups[column].append(value)
+            start = start + len(dfInstanceList)
+
+    version = path.with_name(path.name + '.v' + str(time.time_ns()) + '-' + str(os.getpid()))
+    version.mkdir(parents=True)
+    np.save(version / 'instances.npy', record_array(instances, instanceFields))
+    np.save(version / 'groups.npy', record_array(groups, groupFields))
+
+    # A catalog file saved before versioning is a plain directory, which a link can't
+    # replace in one step
+    previous = None
+    if path.is_symlink():
+        previous = os.readlink(path)
+    elif path.is_file():
+        previous = path.read_text(encoding='utf-8')
+    elif path.is_dir():
+        shutil.rmtree(path)
+
+    link = path.with_name(path.name + '.link' + str(os.getpid()))
+    if link.is_symlink() or link.exists():
+        link.unlink()
+    try:
+        os.symlink(version.name, link)
+    except (OSError, NotImplementedError):
+        link.write_text(version.name, encoding='utf-8')
+    os.replace(link, path)
+
+    for old in path.parent.glob(path.name + '.v*'):
+        if old.name not in (version.name, previous):
+            shutil.rmtree(old, ignore_errors=True)
+
+# Open a catalog file.  The instance lists are the same frames build_catalog makes, read
+# from the mapped array one group at a time with the numeric columns left as views on it,
+# and the fit indexes are rebuilt from them.  Both arrays are mapped from the version the
+# path points to; if that version is removed by newer saves before they are open, the
+# path is resolved again.
+def load_catalog(path):
+    instances, groups = map_catalog(Path(path))
+
+    catalog = Catalog()
+    for group in groups:
+        records = instances[group['start']:group['stop']]
+        dfInstanceList = pd.DataFrame({column: records[column].astype(object) if kind == 'U'
+                                       else np.asarray(records[column]) for column, kind in instanceFields},
+                                      copy=False)
+        serviceGroups = catalog.ec2 if group['service'] == 'ec2' else catalog.rds
+        key = (str(group['region']), str(group['name']), str(group['family']))
+        serviceGroups[key] = (dfInstanceList, build_fit_index(dfInstanceList))
+    return catalog
+
+# The version directory a catalog path points to: the target of its link, the directory
+# named in its pointer file, or the path itself for a catalog saved before versioning
+def catalog_version(path):
+    if path.is_file():
+        return path.with_name(path.read_text(encoding='utf-8'))
+    return path.resolve()
+
+# The instance and group arrays of the version a catalog path currently points to
+def map_catalog(path):
+    while True:
+        version = catalog_version(path)
+        if not (version / 'groups.npy').exists() and version == catalog_version(path):
+            raise FileNotFoundError("No catalog file at " + str(path) + ", write one with --save-catalog")
+        try:
+            return (np.load(version / 'instances.npy', mmap_mode='r'),
+                    np.load(version / 'groups.npy', mmap_mode='r'))
+        except FileNotFoundError:
+            if version == catalog_version(path):
+                raise
+
+# For process pool initializers: a worker handed a catalog file path maps the file itself
+# rather than being sent a pickled copy of the catalog
+def open_catalog(catalog):
+    if isinstance(catalog, (str, os.PathLike)):
+        return load_catalog(catalog)
+    return catalog
@@ -0,0 +1,122 @@
+# AWS Batch Cost Estimator - CMDB classification
+#
+# Works out what each configuration item needs on AWS: whether it is an RDS target, the
+# cores it needs, the instance family, region, platform and database engine.
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# The CMDB columns the estimator reads, in config order without repeats
+def input_columns(config):
+    columns = [config.srcCores, config.srcCPUUsage, config.srcMemProvisioned, config.srcMemUsed,
+               config.srcEnv, config.srcRegion, config.srcOS, config.srcOSVer,
+               config.srcDbInstanceCount, config.srcDB, config.srcBlockStorage]
+    return list(dict.fromkeys(columns))
+
+# The CPU usage and used memory columns to size from: the utilization columns when
+# apply_utilization() has added them, srcCPUUsage and srcMemUsed otherwise
+def cpu_usage_column(dfCMDB, config):
+    return config.utilCPU if config.utilCPU in dfCMDB.columns else config.srcCPUUsage
+
+def memory_used_column(dfCMDB, config):
+    return config.utilMemory if config.utilMemory in dfCMDB.columns else config.srcMemUsed
+
+# Classify the CMDB in one vectorized pass.  Every rule below is evaluated over the whole
+# frame with boolean masks instead of per-row .loc reads and writes, which is what made
+# large CMDB exports slow.  The columns are added in the same order as before.
+def classify_cmdb(dfCMDB, config):
+
+    #Add RDS Column
+    # List the servers with database instances along with type, flag as targets for RDS service
+    # The count is text when read from CSV with blanks, and a number in typed input
+    logger.info("Determining RDS targets....")
+    dbInstances = dfCMDB[config.srcDbInstanceCount]
+    if pd.api.types.is_numeric_dtype(dbInstances):
+        dfCMDB['RDS'] = dbInstances.notna() & (dbInstances != 0)
+    else:
+        dfCMDB['RDS'] = (dbInstances != "") & (dbInstances != "0")
+
+    # Calculate cores needed from peak CPU
+    logger.info("Calculating target EC2 cores...")
+    dfCMDB['cores_calc'] = (dfCMDB[config.srcCores].astype(float) * dfCMDB[cpu_usage_column(dfCMDB, config)].astype(float)) + config.cpuHeadroom
+    dfCMDB['cores_calc'] = dfCMDB['cores_calc'].round(decimals=0)
+
+    dfCMDB = fill_missing_memory(dfCMDB, config)
+
+    # Make an inference for ec2 family
+    logger.info("Determining EC2 instance families...")
+    memUsed = memory_used_column(dfCMDB, config)
+    memCPURatio = dfCMDB[memUsed] / dfCMDB['cores_calc']
+    env = dfCMDB[config.srcEnv].astype(str)
+    nonProd = (env.str.contains(config.DEV, regex=False)
+               | env.str.contains(config.QA, regex=False)
+               | env.str.contains(config.TEST, regex=False))
+    burstable = (dfCMDB['cores_calc'] <= config.burstableMaxCores) & (dfCMDB[memUsed] <= config.burstableMaxMemory) & nonProd
+
+    dfCMDB['calc_family'] = np.select(
+        [burstable, memCPURatio < config.computeRatioCutoff, memCPURatio > config.memoryRatioCutoff],
+        ["t", "c", "r"],
+        default="m")
+    dfCMDB['mem_cpu_ratio'] = memCPURatio
+
+    # Create AWS Region Column and map to source region
+    # Mapped source values first, then region codes and location names, then the default
+    logger.info("Mapping regions...")
+    dfCMDB['AWS_Region'] = map_regions(dfCMDB[config.srcRegion], config)
+
+    # Create AWS OS column, search for key words in source os to map to EC2 platform
+    # This code required manual tweaking to account for the different representations of RedHat
+    logger.info("Determining OS platforms...")
+    platform = dfCMDB[config.srcOS].astype(str)
+    osVer = dfCMDB[config.srcOSVer].astype(str)
+    redHat = (osVer.str.contains("RHEL", regex=False)
+              | osVer.str.contains("Red", regex=False)
+              | osVer.str.contains("RED", regex=False))
+    windows = platform.str.contains("Windows", regex=False)
+    linux = platform.str.contains("Linux", regex=False)
+
+    dfCMDB['AWS_OS'] = np.select(
+        [windows, linux & redHat],
+        [config.awsWindows, config.awsRHEL],
+        default=config.awsDefault)
+
+    return dfCMDB
+
+# AWS region code for every source Location value.  The mapping is worked out once per
+# distinct value rather than per row.
+def map_regions(location, config):
+    locationRegions = {name: region for region, name in config.regionLocations.items()}
+
+    def region_for(value):
+        if value in config.regionMap:
+            return config.regionMap[value]
+        if value in config.regionLocations:
+            return value
+        return locationRegions.get(value, config.awsDFLT)
+
+    codes, values = pd.factorize(location.astype(str))
+    regions = np.array([region_for(value) for value in values] + [config.awsDFLT], dtype=object)
+    return regions[codes]
+
+# Correct missing used memory, falling back to the provisioned memory
+def fill_missing_memory(dfCMDB, config):
+    memUsed = memory_used_column(dfCMDB, config)
+    missingMem = dfCMDB[memUsed] == 0
+    if missingMem.any():
+        dfCMDB.loc[missingMem, memUsed] = dfCMDB.loc[missingMem, config.srcMemProvisioned]
+    return dfCMDB
+
+# Map source DB to AWS_DB for the RDS targets, leaving every other row blank
+def map_databases(dfCMDB, config):
+    dbRel = dfCMDB[config.srcDB].astype(str)
+    dfCMDB['AWS_DB'] = np.select(
+        [~dfCMDB['RDS'],
+         dbRel.str.contains(config.srcOracle, regex=False),
+         dbRel.str.contains(config.srcSQLServer, regex=False)],
+        ["", config.awsOracle, config.awsSQLServer],
+        default=config.awsAurora)
+    return dfCMDB
@@ -0,0 +1,270 @@
+# AWS Batch Cost Estimator - command line
+#
+# python -m awsbatchestimate [--input FILE] [--output FILE] [options]
+# python -m awsbatchestimate --batch DIR|MANIFEST [--batch-output DIR] [options]
+# python -m awsbatchestimate --sweep GRID [--sweep-output FILE] [options]
+# python -m awsbatchestimate --serve [--host HOST] [--port PORT] [options]
+
+import argparse
+import logging
+from pathlib import Path
+
+from .batch import batch_inputs, estimate_batch, plan_batch
+from .catalog import build_catalog, plan_catalog
+from .catalogfile import load_catalog, save_catalog
+from .classify import classify_cmdb, input_columns
+from .cmdbio import file_format, read_cmdb, write_cmdb
+from .config import EstimatorConfig
+from .estimator import estimate, estimate_csv_chunked
+from .incremental import estimate_incremental, read_previous_estimate
+from .rollup import Rollup
+from .server import serve
+from .sweep import load_scenarios, sweep
+from .trace import Tracer, nullTracer
+from .utilization import apply_utilization, compute_utilization, metric_files
+
+logger = logging.getLogger(__name__)
+
+# Default input and output files
+fileInput='../data/fcasap_requirements.csv'
+fileOutput='../data/aws_bom.csv'
+fileSweepOutput='../data/aws_sweep.csv'
+dirBatchOutput='../data/aws_bom'
+
+def build_parser():
+    defaults = EstimatorConfig()
+
+    parser = argparse.ArgumentParser(prog='awsbatchestimate',
+                                     description='Size and price AWS EC2 and RDS targets for a CMDB export.')
+    parser.add_argument('--input', default=fileInput,
+                        help='CMDB input file, .csv, .parquet, .arrow or .feather (default: %(default)s)')
+    parser.add_argument('--output', default=fileOutput,
+                        help='output file, .csv, .parquet, .arrow or .feather (default: %(default)s)')
+    parser.add_argument('--rollup', default=None, metavar='FILE',
+                        help='also write cost totals per region, environment, family, platform, engine and '
+                             'service to this file, and instance counts to FILE_instances')
+    parser.add_argument('--no-output', action='store_true',
+                        help='only write the --rollup report, not the per-server output')
+    parser.add_argument('--offline', action='store_true',
+                        help='price only from the local price list cache, never call the pricing API')
+    parser.add_argument('--refresh', action='store_true',
+                        help='ignore cached price lists and rebuild the cache from the pricing API')
+    parser.add_argument('--cache-dir', default=defaults.cacheDir,
+                        help='directory holding the price list cache (default: %(default)s)')
+    parser.add_argument('--cache-ttl', type=float, default=defaults.cacheTTLHours,
+                        help='hours before a cached price list is fetched again (default: %(default)s)')
+    parser.add_argument('--pricing-workers', type=int, default=defaults.pricingWorkers,
+                        help='concurrent pricing API queries (default: %(default)s)')
+    parser.add_argument('--pricing-endpoint', default=None,
+                        help='pricing API endpoint URL, e.g. a local stand-in for testing')
+    parser.add_argument('--offer-dir', default=None,
+                        help='price from mirrored AWS bulk offer files for AmazonEC2 and AmazonRDS in this '
+                             'directory instead of the pricing API')
+    parser.add_argument('--utilization', default=None, metavar='FILE|DIR|MANIFEST',
+                        help='size from CPU and memory time series in these monitoring exports instead of '
+                             'the CMDB usage columns, written to the output as utilCPU and utilMemGB')
+    parser.add_argument('--utilization-workers', type=int, default=None,
+                        help='processes reading metric files (default: one per CPU)')
+    parser.add_argument('--cpu-statistic', choices=('p95', 'p99', 'peak'), default=defaults.cpuStatistic,
+                        help='per-server CPU statistic to size from (default: %(default)s)')
+    parser.add_argument('--memory-statistic', choices=('p95', 'p99', 'peak'), default=defaults.memoryStatistic,
+                        help='per-server memory statistic to size from (default: %(default)s)')
+    parser.add_argument('--match-policy', choices=('first-fit', 'cheapest', 'cheapest-any'),
+                        default=defaults.matchPolicy,
+                        help='first fitting instance in the inferred family, cheapest fitting instance in '
+                             'the inferred family, or cheapest fitting instance in any family '
+                             '(default: %(default)s)')
+    parser.add_argument('--match-rate', choices=('on-demand', '1yr', '3yr'), default=defaults.matchRate,
+                        help='rate the cheapest policies minimize (default: %(default)s)')
+    parser.add_argument('--full-catalog', action='store_true',
+                        help='price every region, platform, engine and family in the config instead of only '
+                             'the ones the input needs (always the case with --chunk-size and --serve)')
+    parser.add_argument('--catalog', default=None, metavar='DIR',
+                        help='load the price catalog from a binary catalog file instead of pricing, reopened '
+                             'on every catalog refresh with --serve')
+    parser.add_argument('--save-catalog', default=None, metavar='DIR',
+                        help='save the price catalog this run builds as a binary catalog file')
+    parser.add_argument('--chunk-size', type=int, default=None,
+                        help='stream the input this many rows at a time, appending each chunk to the output')
+    parser.add_argument('--previous', default=None,
+                        help='diff mode: reuse the rows of this earlier --previous output that are unchanged '
+                             'and still priced the same, and estimate only the rest')
+    parser.add_argument('--batch', default=None, metavar='DIR|MANIFEST',
+                        help='estimate every CMDB file in this directory, or listed in this manifest, against '
+                             'one catalog')
+    parser.add_argument('--batch-output', default=dirBatchOutput,
+                        help='directory for the batch outputs and rollup.csv (default: %(default)s)')
+    parser.add_argument('--batch-workers', type=int, default=None,
+                        help='processes estimating batch files (default: one per CPU)')
+    parser.add_argument('--sweep', default=None, metavar='GRID',
+                        help='sensitivity sweep: price every scenario in this JSON grid of sizing knobs '
+                             'and write a per-scenario cost summary instead of the estimate')
+    parser.add_argument('--sweep-output', default=fileSweepOutput,
+                        help='sweep summary file (default: %(default)s)')
+    parser.add_argument('--sweep-workers', type=int, default=None,
+                        help='processes pricing sweep scenarios (default: one per CPU)')
+    parser.add_argument('--trace', default=None, metavar='FILE',
+                        help='write a JSON trace of stage and pricing query timings to this file')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='debug output, including every catalog group and the servers matched to it')
+    parser.add_argument('-q', '--quiet', action='store_true', help='only warnings and errors')
+    parser.add_argument('--serve', action='store_true',
+                        help='run the HTTP/JSON estimation server instead of estimating a file')
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='address the server listens on (default: %(default)s)')
+    parser.add_argument('--port', type=int, default=8080,
+                        help='port the server listens on (default: %(default)s)')
+    parser.add_argument('--catalog-refresh', type=float, default=24,
+                        help='hours between background catalog rebuilds in server mode, 0 to never '
+                             '(default: %(default)s)')
+    return parser
+
+# Estimator configuration from the parsed command line
+def config_from_args(args):
+    return EstimatorConfig(offline=args.offline,
+                           refresh=args.refresh,
+                           cacheDir=args.cache_dir,
+                           cacheTTLHours=args.cache_ttl,
+                           pricingWorkers=args.pricing_workers,
+                           pricingEndpoint=args.pricing_endpoint,
+                           offerDir=args.offer_dir,
+                           matchPolicy=args.match_policy,
+                           matchRate=args.match_rate,
+                           cpuStatistic=args.cpu_statistic,
+                           memoryStatistic=args.memory_statistic)
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.offline and args.refresh:
+        parser.error('--offline and --refresh cannot be used together')
+    if args.chunk_size and (file_format(args.input) != 'csv' or file_format(args.output) != 'csv'):
+        parser.error('--chunk-size streams CSV input to CSV output only')
+    if args.chunk_size and args.previous:
+        parser.error('--chunk-size and --previous cannot be used together')
+    if args.sweep and (args.chunk_size or args.previous):
+        parser.error('--sweep cannot be used with --chunk-size or --previous')
+    if args.batch and (args.chunk_size or args.previous or args.sweep):
+        parser.error('--batch cannot be used with --chunk-size, --previous or --sweep')
+    if args.rollup and (args.batch or args.sweep):
+        parser.error('--rollup cannot be used with --batch or --sweep')
+    if args.no_output and not args.rollup:
+        parser.error('--no-output needs --rollup')
+    if args.serve and args.save_catalog:
+        parser.error('--save-catalog cannot be used with --serve')
+    if args.utilization and (args.chunk_size or args.batch or args.serve):
+        parser.error('--utilization cannot be used with --chunk-size, --batch or --serve')
+
+    # Debug output is only the estimator's own, not every library's
+    logging.basicConfig(format='%(message)s', level=logging.WARNING if args.quiet else logging.INFO)
+    if args.verbose:
+        logging.getLogger('awsbatchestimate').setLevel(logging.DEBUG)
+
+    config = config_from_args(args)
+
+    if args.serve:
+        serve(config, args.host, args.port, args.catalog_refresh, args.catalog)
+        return
+
+    tracer = Tracer() if args.trace else nullTracer
+    try:
+        run(args, config, tracer)
+    finally:
+        if args.trace:
+            tracer.write(args.trace)
+
+# The catalog to estimate against: loaded from --catalog, or built for the plan and saved to
+# --save-catalog if given.  With shared the estimate runs on a process pool, and a catalog
+# file is passed on as its path so each worker maps it rather than being sent a copy.
+def get_catalog(args, config, tracer, plan=None, shared=False):
+    if args.catalog:
+        if shared:
+            return args.catalog
+        with tracer.stage('load catalog'):
+            return load_catalog(args.catalog)
+
+    catalog = build_catalog(config, tracer=tracer, plan=plan)
+    if args.save_catalog:
+        logger.info("Saving catalog...")
+        save_catalog(catalog, args.save_catalog)
+    return catalog
+
+def run(args, config, tracer):
+    if args.batch:
+        run_batch(args, config, tracer)
+        return
+
+    if args.chunk_size:
+        catalog = get_catalog(args, config, tracer)
+        rollup = Rollup(config) if args.rollup else None
+        estimate_csv_chunked(args.input, None if args.no_output else args.output, args.chunk_size, catalog,
+                             config, tracer, rollup)
+        if rollup is not None:
+            logger.info("Writing rollup...")
+            rollup.write(args.rollup)
+        return
+
+    # Open input file, read into frame
+    logger.info("Reading input file....")
+    with tracer.stage('read') as event:
+        dfCMDB = read_cmdb(args.input, config.categoricalColumns, input_columns(config))
+        event['rows'] = len(dfCMDB)
+
+    # Size from monitoring data before anything is classified
+    if args.utilization:
+        with tracer.stage('utilization') as event:
+            dfUtilization = compute_utilization(metric_files(args.utilization), config, args.utilization_workers)
+            dfCMDB = apply_utilization(dfCMDB, dfUtilization, config)
+            event['rows'] = len(dfUtilization)
+
+    # Only price the groups the servers actually fall into, unless asked for everything
+    plan = None
+    if not (args.full_catalog or args.catalog):
+        with tracer.stage('plan', rows=len(dfCMDB)):
+            plan = plan_catalog(classify_cmdb(dfCMDB.copy(), config), config, allFamilies=bool(args.sweep))
+        logger.info("Planned %d EC2 and %d RDS price queries....", len(plan.ec2), len(plan.rds))
+    catalog = get_catalog(args, config, tracer, plan, shared=bool(args.sweep))
+
+    if args.sweep:
+        dfSweep = sweep(dfCMDB, catalog, load_scenarios(args.sweep), config, args.sweep_workers)
+        logger.info("Writing sweep summary...")
+        write_cmdb(dfSweep, args.sweep_output)
+        return
+
+    if args.previous:
+        dfPrevious = read_previous_estimate(args.previous, config.categoricalColumns)
+        dfCMDB = estimate_incremental(dfCMDB, dfPrevious, catalog, config, tracer)
+    else:
+        dfCMDB = estimate(dfCMDB, catalog, config, tracer)
+
+    if args.rollup:
+        logger.info("Writing rollup...")
+        with tracer.stage('rollup', rows=len(dfCMDB)):
+            Rollup(config).add(dfCMDB).write(args.rollup)
+        if args.no_output:
+            return
+
+    # Write output file
+    logger.info("Writing output file...")
+    with tracer.stage('write', rows=len(dfCMDB)):
+        write_cmdb(dfCMDB, args.output, config.categoricalColumns)
+
+def run_batch(args, config, tracer):
+    inputs = batch_inputs(args.batch)
+    if not inputs:
+        raise SystemExit("No CMDB files in " + args.batch)
+
+    plan = None
+    if not (args.full_catalog or args.catalog):
+        with tracer.stage('plan'):
+            plan = plan_batch(inputs, config)
+        logger.info("Planned %d EC2 and %d RDS price queries....", len(plan.ec2), len(plan.rds))
+    catalog = get_catalog(args, config, tracer, plan, shared=True)
+
+    with tracer.stage('batch', files=len(inputs)) as event:
+        dfRollup = estimate_batch(inputs, args.batch_output, catalog, config, args.batch_workers)
+        event['rows'] = int(dfRollup['servers'].iloc[-1])
+
+    logger.info("Writing rollup...")
+    dfRollup.to_csv(Path(args.batch_output) / 'rollup.csv', index=False)
@@ -0,0 +1,175 @@
+# AWS Batch Cost Estimator - CMDB input and output
+#
+# Reads and writes CMDB frames as CSV, Parquet, Arrow IPC or Feather, picked by file
+# extension.  CSV is read the way pandas reads it, every column as text unless it parses as
+# a number.  The columnar formats carry an explicit schema instead: the low cardinality
+# text columns are categoricals and integer columns are downcast to the smallest type that
+# holds them, which cuts load time, file size and memory for large inventories that get
+# estimated over and over.
+#
+# Given the columns the estimator reads, a CSV is read on pyarrow's multithreaded parser
+# instead, which types every column the way pandas does: numbers, booleans in any case, and
+# text for anything else, including blanks.  The text of the columns the estimator reads
+# comes back as Python strings, as from pandas; text in the other columns stays in Arrow
+# buffers.  Where Arrow reads something pandas wouldn't take as a number (dates and times,
+# nan, numbers out of range) those columns are read again with pandas.  Floats are rounded
+# correctly, so every pandas read here uses its round trip parser to agree; integers
+# written in hex or with a leading + come back as numbers where pandas reads text and
+# floats.  Without pyarrow, or with repeated column names, it falls back to pandas.
+#
+# This read isn't column-projected.  Parsing only the estimator's columns and passing the
+# rest through as raw text (convert_options.column_types set to strings for them) saves
+# nothing but converting the other columns' numbers, a fifth of the parse for a 200
+# column export and nothing measurable for a narrow one, and it would write numeric
+# columns the estimator doesn't read to Parquet, Arrow and Feather as text.
+#
+# The columnar formats need pyarrow, which is only imported when one of them is used.
+
+import csv
+import itertools
+
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+# File extensions for each supported format
+formatExtensions = {
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+    '.arrow': 'arrow',
+    '.ipc': 'arrow',
+    '.feather': 'feather',
+}
+
+def file_format(path):
+    suffix = Path(path).suffix.lower()
+    if suffix not in formatExtensions:
+        raise ValueError("Unsupported CMDB file format " + repr(suffix) + " for " + str(path) +
+                         ", expected one of " + ", ".join(sorted(formatExtensions)))
+    return formatExtensions[suffix]
+
+def import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+    except ImportError:
+        raise ImportError("Parquet, Arrow and Feather files need the pyarrow library "
+                          "(pip install pyarrow)") from None
+    return pyarrow
+
+# Apply the columnar schema to a frame: categoricals for the listed columns that are
+# present, integer columns downcast, and float columns downcast to float32 only where every
+# value survives the round trip so sizing and prices are unchanged
+def apply_schema(dfCMDB, categoricalColumns):
+    for column in dfCMDB.columns:
+        values = dfCMDB[column]
+        if column in categoricalColumns:
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                dfCMDB[column] = values.astype('category')
+        elif pd.api.types.is_bool_dtype(values):
+            continue
+        elif pd.api.types.is_integer_dtype(values):
+            dfCMDB[column] = pd.to_numeric(values, downcast='integer')
+        elif pd.api.types.is_float_dtype(values) and values.dtype != np.float32:
+            narrowed = values.astype(np.float32)
+            if np.array_equal(narrowed.to_numpy(dtype=np.float64), values.to_numpy(), equal_nan=True):
+                dfCMDB[column] = narrowed
+    return dfCMDB
+
+# Every spelling of a word in upper and lower case
+def spellings(word):
+    return [''.join(letters) for letters in itertools.product(*[(c.lower(), c.upper()) for c in word])]
+
+# Arrow column types that come out of a CSV the same as from pandas
+def pandas_compatible(column):
+    import pyarrow
+    if pyarrow.types.is_floating(column.type):
+        values = column.to_numpy()
+        # Arrow parses nan and overflowing exponents, and reads integers past int64 as floats
+        return bool(np.isfinite(values).all() and (np.abs(values) < 2.0 ** 63).all())
+    return (pyarrow.types.is_integer(column.type) or pyarrow.types.is_boolean(column.type)
+            or pyarrow.types.is_string(column.type))
+
+# Read a CSV with pyarrow, typed the way read_csv types it with keep_default_na=False.  The
+# given columns' text is returned as object columns and every other text column as Arrow
+# backed strings.  Every column is typed, so numbers in the other columns stay numbers.
+# Returns None if pyarrow isn't installed or the file has repeated column names, which
+# pandas would rename.
+def read_csv_arrow(path, columns):
+    try:
+        import pyarrow
+        import pyarrow.csv
+    except ImportError:
+        return None
+
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        header = next(csv.reader(f), [])
+    if len(set(header)) != len(header):
+        return None
+
+    convertOptions = pyarrow.csv.ConvertOptions(null_values=[], strings_can_be_null=False,
+                                                quoted_strings_can_be_null=False,
+                                                true_values=spellings('true'), false_values=spellings('false'))
+    try:
+        table = pyarrow.csv.read_csv(path, convert_options=convertOptions)
+    except pyarrow.ArrowInvalid:
+        # A quoted value spanning lines, which the parallel reader can't split around
+        table = pyarrow.csv.read_csv(path, convert_options=convertOptions,
+                                     parse_options=pyarrow.csv.ParseOptions(newlines_in_values=True))
+
+    typed = set(columns)
+    retyped = [name for name in header if not pandas_compatible(table.column(name))]
+    dfRetyped = None
+    if retyped:
+        dfRetyped = pd.read_csv(path, keep_default_na=False, usecols=retyped, float_precision='round_trip')
+    dfTyped = table.select([name for name in header if name in typed and name not in retyped]).to_pandas()
+    dfPassThrough = table.select([name for name in header if name not in typed and name not in retyped])
+    dfPassThrough = dfPassThrough.to_pandas(types_mapper={pyarrow.string(): pd.StringDtype('pyarrow')}.get)
+    return pd.DataFrame({name: dfRetyped[name] if name in retyped else
+                         dfTyped[name] if name in typed else dfPassThrough[name]
+                         for name in header})
+
+# Read a CMDB file.  columns are the ones the estimator reads; given those, a CSV is read on
+# pyarrow, with the text of every other column kept in Arrow buffers.
+def read_cmdb(path, categoricalColumns=(), columns=None):
+    fmt = file_format(path)
+
+    if fmt == 'csv':
+        dfCMDB = read_csv_arrow(path, columns) if columns else None
+        if dfCMDB is None:
+            dfCMDB = pd.read_csv(path, keep_default_na=False, float_precision='round_trip')
+        return dfCMDB
+
+    pa = import_pyarrow()
+    if fmt == 'parquet':
+        dfCMDB = pd.read_parquet(path)
+    elif fmt == 'feather':
+        dfCMDB = pd.read_feather(path)
+    else:
+        try:
+            table = pa.ipc.open_file(path).read_all()
+        except pa.ArrowInvalid:
+            with pa.ipc.open_stream(path) as reader:
+                table = reader.read_all()
+        dfCMDB = table.to_pandas()
+
+    return apply_schema(dfCMDB, categoricalColumns)
+
+def write_cmdb(dfCMDB, path, categoricalColumns=()):
+    fmt = file_format(path)
+
+    if fmt == 'csv':
+        dfCMDB.to_csv(path)
+        return
+
+    pa = import_pyarrow()
+    dfCMDB = apply_schema(dfCMDB.copy(), categoricalColumns)
+    if fmt == 'parquet':
+        dfCMDB.to_parquet(path)
+    elif fmt == 'feather':
+        dfCMDB.reset_index(drop=True).to_feather(path)
+    else:
+        table = pa.Table.from_pandas(dfCMDB, preserve_index=False)
+        with pa.ipc.new_file(str(path), table.schema) as writer:
+            writer.write_table(table)
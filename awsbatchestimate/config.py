@@ -0,0 +1,199 @@
+# AWS Batch Cost Estimator - configuration
+#
+# Everything that used to be edited in the header of the script: input column mappings,
+# the source to AWS value mappings, the price catalog dimensions, storage rates and the
+# pricing source options.  The field names are the old global names, so a header that was
+# customised before carries over as EstimatorConfig(srcCPUUsage='CPU_Usage', ...).
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from .regions import regionLocations
+
+@dataclass
+class EstimatorConfig:
+
+    # Input column mappings
+
+    # Column which indicates source cores and peak load
+    srcCores: str = 'vCPU'
+    srcCPUUsage: str = 'cpuUsage'
+
+    # Column which indicates peak memory useage in GB
+    # If srcMemUsed is blank or zero, the estimator will use srcMemProvsioned as the target memory
+    srcMemProvisioned: str = 'Memory GB'
+    srcMemUsed: str = 'Memory GB'
+
+    # Columns indicating environment (dev, test, prod, etc.)
+    srcEnv: str = 'Environment'
+    DEV: str = 'Dev'
+    QA: str = 'QA'
+    TEST: str = 'Test'
+
+    # Region mappings, including using a default region if not specified as europe or asia
+    srcRegion: str = 'Location'
+    srcASIA: str = "AP"
+    awsASIA: str = "ap-northeast-2"
+    srcEU: str = 'EU'
+    awsEU: str = 'eu-central-1'
+    awsDFLT: str = 'us-east-1'
+    awsLocDFLT: str = "US East (N. Virginia)"
+    awsLocEU: str = "EU (Frankfurt)"
+    awsLocASIA: str = "Asia Pacific (Seoul)"
+
+    # Source Location values mapped to AWS region codes, on top of srcASIA and srcEU above.
+    # A Location that is already a region code or a pricing location name (e.g. 'eu-west-2'
+    # or "EU (London)") maps to that region, anything else to awsDFLT.
+    regionMap: dict = field(default_factory=dict)
+
+    # Region code to pricing location name for every region, from the regions table with
+    # awsLocDFLT, awsLocEU and awsLocASIA for their regions.  Left empty it is filled in.
+    regionLocations: dict = field(default_factory=dict)
+
+    # OS platforms for AWS.  The customer source is all over the board and requires some manual
+    # tweaking.  So far only coded for Windows, RHEL, and Amazon Linux (default)
+    srcOS: str = 'Platform'
+    srcOSVer: str = 'OS Ver'
+    awsWindows: str = "Windows"
+    awsRHEL: str = "RHEL"
+    awsSLES: str = "SLES"
+    awsDefault: str = "Linux"
+
+    # Compute families.  These are super families.  X and T are actually subfamilies in the pricing API
+    awsComputeOptimized: str = "Compute optimized"
+    awsMemoryOptimized: str = "Memory optimized"
+    awsGeneralPurpose: str = "General purpose"
+
+    # EC2 instance types left out of the catalog: generations by the first two characters of
+    # the type, and variants (AMD 'a', local NVMe 'd', extended memory 'e') by the character
+    # after them
+    skipGenerations: tuple = ("t2", "t3", "m4", "c4", "r4")
+    skipVariants: tuple = ("a", "d", "e")
+
+    # Database mappings
+
+    # Column which determines if a configuration item is an RDS candidate
+    # Non zero value in this column indicates a database present
+    srcDbInstanceCount: str = 'RDS_Instances'
+
+    # Dataase constants
+    srcOracle: str = "Oracle"
+    srcSQLServer: str = "SQL "
+    srcDB: str = "DB Rel/Ver"
+    awsOracle: str = "Oracle"
+    awsSQLServer: str = "SQL Server"
+    awsAurora: str = "Aurora MySQL"
+
+    # Regions, platforms, families and database engines to build the full price catalog for.
+    # Left empty they default to awsDFLT and every region regionMap maps a Location to, the
+    # three platforms and Oracle and Aurora.  A catalog planned from a CMDB covers whichever
+    # regions its servers map to, limited to these platforms, families and engines.  Servers
+    # whose Location is itself a region code or location name outside these regions are left
+    # unmatched by a full catalog, with a warning.
+    regions: tuple = ()
+    families: tuple = ("m", "c", "r", "t")
+    oses: tuple = ()
+    dbs: tuple = ()
+
+    # Sizing.  Cores needed are cores x peak CPU usage plus cpuHeadroom, rounded.  Servers
+    # with less than computeRatioCutoff GB per core go compute optimized, more than
+    # memoryRatioCutoff memory optimized, and non-production servers within
+    # burstableMaxCores and burstableMaxMemory GB burstable.
+    cpuHeadroom: float = .51
+    computeRatioCutoff: float = 3.5
+    memoryRatioCutoff: float = 4.5
+    burstableMaxCores: float = 8
+    burstableMaxMemory: float = 32
+
+    # Utilization sizing.  Monitoring exports hold one row per server and sample: the server
+    # name in metricServer, matched to srcServer in the CMDB, CPU used as a fraction of the
+    # server's cores (like srcCPUUsage) in metricCPU and memory used in GB in metricMemory.
+    # cpuStatistic and memoryStatistic pick the 'p95', 'p99' or 'peak' of each server's
+    # samples to size from.  Percentiles come from sketches accurate to sketchAccuracy
+    # relative error.  The CPU usage and used memory sized from go in two added columns,
+    # utilCPU and utilMemory, holding the statistic for servers with metrics and the
+    # srcCPUUsage and srcMemUsed values for the rest; where they exist they are read instead
+    # of srcCPUUsage and srcMemUsed, which are left as they were.
+    srcServer: str = 'Server'
+    metricServer: str = 'Server'
+    metricCPU: str = 'cpuUsage'
+    metricMemory: str = 'memoryUsed'
+    cpuStatistic: str = 'p95'
+    memoryStatistic: str = 'p95'
+    sketchAccuracy: float = .01
+    utilCPU: str = 'utilCPU'
+    utilMemory: str = 'utilMemGB'
+
+    # Instance matching.  matchPolicy 'first-fit' picks the first instance in the inferred
+    # family's sorted list that fits, 'cheapest' the lowest priced instance that fits in the
+    # inferred family and 'cheapest-any' the lowest priced that fits in any of the catalog's
+    # families.  matchRate is the rate the cheapest policies minimize: 'on-demand', '1yr' or
+    # '3yr'.
+    matchPolicy: str = 'first-fit'
+    matchRate: str = 'on-demand'
+
+    # Fixed rates for block storage
+    ec2EBSUnitCost: float = .151
+    rdsEBSUnitCost: float = .116
+    srcBlockStorage: str = 'Total File System  in GB'
+
+    # Columnar input and output (Parquet, Arrow IPC, Feather, picked by file extension) are
+    # typed: these low cardinality columns are stored as categoricals and integer columns are
+    # downcast.  CSV input and output are unchanged.  Left empty it covers the mapped source
+    # columns and the computed AWS columns.
+    categoricalColumns: tuple = ()
+
+    # Price source.  With offerDir set, prices come from mirrored bulk offer files for
+    # AmazonEC2 and AmazonRDS in that directory instead of the pricing API.
+    offerDir: Optional[str] = None
+
+    # Price list cache.  Responses from the pricing API are kept in a SQLite database under
+    # cacheDir, keyed by service code and the exact filter set, and reused until they are
+    # older than cacheTTLHours.  offline prices only from the cache, refresh rebuilds it.
+    cacheDir: str = str(Path.home() / '.cache' / 'awsbatchestimate')
+    cacheTTLHours: float = 24
+    offline: bool = False
+    refresh: bool = False
+
+    # Pricing API fetch.  Independent queries run concurrently on a pool of pricingWorkers
+    # threads sharing one client.  Pages that are throttled, fail on the server or lose their
+    # connection are retried up to pricingMaxAttempts times with jittered exponential backoff
+    # capped at pricingMaxBackoff seconds.  pricingEndpoint points the client somewhere else,
+    # e.g. a local stand-in for testing.
+    pricingWorkers: int = 8
+    pricingMaxAttempts: int = 8
+    pricingBaseBackoff: float = .5
+    pricingMaxBackoff: float = 20
+    pricingEndpoint: Optional[str] = None
+
+    def __post_init__(self):
+        if self.offline and self.refresh:
+            raise ValueError("offline and refresh cannot be used together")
+        if self.matchPolicy not in ('first-fit', 'cheapest', 'cheapest-any'):
+            raise ValueError("matchPolicy must be 'first-fit', 'cheapest' or 'cheapest-any', not " +
+                             repr(self.matchPolicy))
+        if self.matchRate not in ('on-demand', '1yr', '3yr'):
+            raise ValueError("matchRate must be 'on-demand', '1yr' or '3yr', not " + repr(self.matchRate))
+
+        for name in ('cpuStatistic', 'memoryStatistic'):
+            if getattr(self, name) not in ('p95', 'p99', 'peak'):
+                raise ValueError(name + " must be 'p95', 'p99' or 'peak', not " + repr(getattr(self, name)))
+
+        regionMap = {self.srcASIA: self.awsASIA, self.srcEU: self.awsEU}
+        regionMap.update(self.regionMap)
+        self.regionMap = regionMap
+        if not self.regionLocations:
+            self.regionLocations = dict(regionLocations)
+            self.regionLocations.update({self.awsDFLT: self.awsLocDFLT, self.awsEU: self.awsLocEU,
+                                         self.awsASIA: self.awsLocASIA})
+        if not self.regions:
+            self.regions = tuple(dict.fromkeys((self.awsDFLT, self.awsEU, self.awsASIA) +
+                                               tuple(self.regionMap.values())))
+        if not self.oses:
+            self.oses = (self.awsWindows, self.awsRHEL, self.awsDefault)
+        if not self.dbs:
+            self.dbs = (self.awsOracle, self.awsAurora)
+        if not self.categoricalColumns:
+            self.categoricalColumns = (self.srcRegion, self.srcOS, self.srcOSVer, self.srcEnv, self.srcDB,
+                                       'calc_family', 'AWS_Region', 'AWS_OS', 'AWS_DB', 'ec2_instance_type')
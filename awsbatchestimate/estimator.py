@@ -0,0 +1,186 @@
+# AWS Batch Cost Estimator - estimation
+#
+# Sizes and prices CMDB frames against a price catalog: classification, EC2 and RDS
+# matching and EBS pricing.  estimate() works on a frame in memory, estimate_csv_chunked()
+# streams a CSV file through it in chunks.  Each stage is recorded on the tracer.
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+from .classify import classify_cmdb, map_databases, memory_used_column
+from .config import EstimatorConfig
+from .instancematch import matchColumns
+from .trace import nullTracer
+
+logger = logging.getLogger(__name__)
+
+# Columns estimate() adds to the input, in the order it adds them
+estimateColumns = ['RDS', 'cores_calc', 'calc_family', 'mem_cpu_ratio', 'AWS_Region', 'AWS_OS',
+                   'ec2_instance_type', 'one_hr_rate', 'one_yr_rate', 'three_yr_rate', 'AWS_DB',
+                   'ebs_month_rate']
+
+# Size and price a CMDB frame against the catalog and return the estimated frame, leaving
+# the input untouched.  Nothing here touches the price lists, so it can be called over and
+# over with the same catalog.  Every step works row by row, so a chunk of a frame gives
+# the same rows as the whole frame would.
+def estimate(dfCMDB, catalog, config=None, tracer=nullTracer):
+    if config is None:
+        config = EstimatorConfig()
+    dfCMDB = dfCMDB.copy()
+
+    with tracer.stage('classify', rows=len(dfCMDB)):
+        dfCMDB = classify_cmdb(dfCMDB, config)
+    with tracer.stage('ec2', rows=len(dfCMDB)) as event:
+        dfCMDB = match_ec2(dfCMDB, catalog, config)
+        event['matched'] = int(dfCMDB['ec2_instance_type'].notna().sum())
+    with tracer.stage('rds', rows=len(dfCMDB)) as event:
+        dfCMDB = match_rds(dfCMDB, catalog, config)
+        event['matched'] = int((dfCMDB['RDS'] & dfCMDB['ec2_instance_type'].notna()).sum())
+    with tracer.stage('ebs', rows=len(dfCMDB)):
+        dfCMDB = price_storage(dfCMDB, config)
+
+    return dfCMDB
+
+# Match calculated capacity requirements to EC2 instance types
+# Price resulting EC2 instance types by hour, year, and 3-year RIs
+# The result columns always exist so every chunk has the same columns
+def match_ec2(dfCMDB, catalog, config):
+    logger.info('Matching EC2 instances....')
+    dfCMDB['ec2_instance_type'] = pd.Series(np.nan, index=dfCMDB.index, dtype=object)
+    dfCMDB['one_hr_rate'] = np.nan
+    dfCMDB['one_yr_rate'] = np.nan
+    dfCMDB['three_yr_rate'] = np.nan
+
+    # Map instances to EC2 instance types
+    return assign_shapes(dfCMDB, ~dfCMDB['RDS'].to_numpy(dtype=bool), 'AWS_OS', 'ec2', catalog, config)
+
+# Review and price RDS
+def match_rds(dfCMDB, catalog, config):
+    # Map source DB to AWS_DB
+    dfCMDB = map_databases(dfCMDB, config)
+
+    logger.info('Matching RDS instances....')
+    # Map instances to RDS instance types
+    return assign_shapes(dfCMDB, dfCMDB['RDS'].to_numpy(dtype=bool), 'AWS_DB', 'rds', catalog, config)
+
+# Match the rows of one service by shape.  Servers with the same region, platform or
+# engine, family, cores and memory always get the same instance, so the rows are collapsed
+# to their distinct shapes, each shape is resolved once against the catalog and the
+# answers are broadcast back to every row with that shape.  Rows that don't fit anything
+# are left untouched, and rows in regions the catalog has no prices for are counted in a
+# warning, since a catalog built for other regions can't match them.
+def assign_shapes(dfCMDB, rows, nameColumn, service, catalog, config):
+    if not rows.any():
+        return dfCMDB
+
+    dfShapes = dfCMDB.loc[rows, ['AWS_Region', nameColumn, 'calc_family', 'cores_calc', memory_used_column(dfCMDB, config)]]
+    regions = dfShapes['AWS_Region'].astype(str)
+    outside = regions[~regions.isin(catalog.regions(service))].value_counts()
+    if len(outside):
+        logger.warning("%d %s servers are in regions the catalog has no prices for and are left unmatched: %s",
+                       outside.sum(), service.upper(),
+                       ", ".join(region + " (" + str(count) + ")" for region, count in outside.items()))
+    shapeCodes = dfShapes.groupby(list(dfShapes.columns), dropna=False, sort=False).ngroup().to_numpy()
+    firstRows = np.unique(shapeCodes, return_index=True)[1]
+    shapes = list(dfShapes.iloc[firstRows].itertuples(index=False, name=None))
+    logger.debug("%d %s rows, %d distinct shapes", len(dfShapes), service, len(shapes))
+
+    matches = catalog.resolve(service, config, shapes)
+    found = np.array([match is not None for match in matches])
+    if not found.any():
+        return dfCMDB
+
+    # Set by position, since a frame put together from several exports can repeat labels
+    rowFound = found[shapeCodes]
+    matchedRows = np.flatnonzero(rows)[rowFound]
+    matchedCodes = shapeCodes[rowFound]
+    for column, (cmdbColumn, instanceColumn) in enumerate(matchColumns):
+        values = np.array([match[column] if match is not None else None for match in matches],
+                          dtype=dfCMDB[cmdbColumn].dtype)
+        columnValues = dfCMDB[cmdbColumn].to_numpy(copy=True)
+        columnValues[matchedRows] = values[matchedCodes]
+        dfCMDB[cmdbColumn] = columnValues
+
+    return dfCMDB
+
+# Compute EBS and snapshots
+# Flat storage rates assuming 1% monthly rate of change on EC2
+def price_storage(dfCMDB, config):
+    logger.info('Pricing EBS and snapshots...')
+    storage = dfCMDB[config.srcBlockStorage].astype(float)
+    dfCMDB['ebs_month_rate'] = np.where(dfCMDB['RDS'],
+                                        storage * config.rdsEBSUnitCost,
+                                        storage * config.ec2EBSUnitCost)
+    return dfCMDB
+
+# Totals for an estimated frame: server counts, unmatched servers, servers per inferred
+# family and the summed hourly, 1-year and 3-year rates
+def summarize_estimate(dfEstimate, config):
+    rds = dfEstimate['RDS'].to_numpy(dtype=bool)
+    summary = {'servers': len(dfEstimate),
+               'ec2_servers': int((~rds).sum()),
+               'rds_servers': int(rds.sum()),
+               'unmatched': int(dfEstimate['ec2_instance_type'].isna().sum())}
+    familyCounts = dfEstimate['calc_family'].value_counts()
+    for family in config.families:
+        summary['family_' + family] = int(familyCounts.get(family, 0))
+    summary['one_hr_total'] = dfEstimate['one_hr_rate'].sum()
+    summary['one_yr_total'] = dfEstimate['one_yr_rate'].sum()
+    summary['three_yr_total'] = dfEstimate['three_yr_rate'].sum()
+    return summary
+
+# Work out one dtype per column for a chunked read.  Chunks are typed independently, so a
+# column can come back as int in one chunk and float or text in another, which would write
+# differently from a single read.  Scanning the file once and widening int to float, and
+# anything mixed to text, gives every chunk the types the whole file would have.
+def scan_csv_dtypes(path, chunkRows):
+    dtypes = {}
+    for chunk in pd.read_csv(path, keep_default_na=False, chunksize=chunkRows, float_precision='round_trip'):
+        for column, dtype in chunk.dtypes.items():
+            dtypes.setdefault(column, set()).add(dtype.kind)
+
+    columnTypes = {}
+    for column, kinds in dtypes.items():
+        if kinds == {'i'}:
+            columnTypes[column] = np.int64
+        elif kinds <= {'i', 'f'}:
+            columnTypes[column] = np.float64
+        elif kinds == {'b'}:
+            columnTypes[column] = bool
+        else:
+            columnTypes[column] = str
+    return columnTypes
+
+# Streaming pipeline: read the input chunkRows rows at a time, estimate each chunk against
+# the catalog and append it to the output, so memory is bounded by the chunk size.  Each
+# chunk is also added to rollup if one is given, and with no outputPath the rows are only
+# rolled up, not written.
+def estimate_csv_chunked(inputPath, outputPath, chunkRows, catalog, config=None, tracer=nullTracer,
+                         rollup=None):
+    if config is None:
+        config = EstimatorConfig()
+
+    logger.info("Scanning input file....")
+    with tracer.stage('scan'):
+        columnTypes = scan_csv_dtypes(inputPath, chunkRows)
+
+    first = True
+    chunks = iter(pd.read_csv(inputPath, keep_default_na=False, chunksize=chunkRows, dtype=columnTypes,
+                              float_precision='round_trip'))
+    while True:
+        with tracer.stage('read') as event:
+            dfChunk = next(chunks, None)
+            event['rows'] = 0 if dfChunk is None else len(dfChunk)
+        if dfChunk is None:
+            break
+        logger.info("Estimating rows %d to %d....", dfChunk.index[0], dfChunk.index[-1])
+        dfChunk = estimate(dfChunk, catalog, config, tracer)
+        if rollup is not None:
+            with tracer.stage('rollup', rows=len(dfChunk)):
+                rollup.add(dfChunk)
+        if outputPath is not None:
+            with tracer.stage('write', rows=len(dfChunk)):
+                dfChunk.to_csv(outputPath, mode='w' if first else 'a', header=first)
+        first = False
@@ -0,0 +1,147 @@
+# AWS Batch Cost Estimator - incremental re-estimation
+#
+# A CMDB only changes by a few percent between runs, so most rows come out exactly as they
+# did last time.  Diff mode writes two extra columns with the estimate:
+#
+#   row_fingerprint   hash of the input columns the estimator reads for the row
+#   catalog_digest    hash of the catalog group (region, OS or engine, family) the row was
+#                     priced from, together with the sizing settings in the config
+#
+# and the next run copies the computed columns across from the previous output for every
+# row whose fingerprint is still there and whose catalog group still has the same digest.
+# Only new or changed rows, and rows whose prices moved, go through estimate().  A previous
+# output without the two columns (or no previous output at all) just means a full run.
+
+import dataclasses
+import hashlib
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .classify import fill_missing_memory, input_columns
+from .cmdbio import file_format, read_cmdb
+from .config import EstimatorConfig
+from .estimator import estimate, estimateColumns
+from .trace import nullTracer
+
+logger = logging.getLogger(__name__)
+
+fingerprintColumn = 'row_fingerprint'
+digestColumn = 'catalog_digest'
+
+# Config fields that only say where prices come from or how files are stored.  They don't
+# change the estimate, so they stay out of the catalog digest.
+operationalFields = {'categoricalColumns', 'offerDir', 'cacheDir', 'cacheTTLHours', 'offline', 'refresh',
+                     'pricingWorkers', 'pricingMaxAttempts', 'pricingBaseBackoff', 'pricingMaxBackoff',
+                     'pricingEndpoint'}
+
+# Input columns the estimator reads, and the utilization columns when they were added
+def fingerprint_columns(dfCMDB, config):
+    return input_columns(config) + [column for column in (config.utilCPU, config.utilMemory)
+                                    if column in dfCMDB.columns]
+
+# One int64 fingerprint per row over the columns the estimator reads.  The values are hashed
+# as text so a row fingerprints the same whether it came from CSV or a typed file.
+def row_fingerprints(dfCMDB, config):
+    columns = dfCMDB[fingerprint_columns(dfCMDB, config)].astype(str)
+    return pd.util.hash_pandas_object(columns, index=False).astype(np.int64)
+
+def digest(*parts):
+    hasher = hashlib.blake2b(digest_size=8)
+    for part in parts:
+        hasher.update(part.encode('utf-8'))
+        hasher.update(b'\0')
+    return int.from_bytes(hasher.digest(), 'little', signed=True)
+
+# Digest of the sizing settings, and of every catalog group on top of it.  Keys are
+# ('ec2', region, os, family) and ('rds', region, db, family).
+def catalog_digests(catalog, config):
+    settings = repr([(f.name, getattr(config, f.name)) for f in dataclasses.fields(config)
+                     if f.name not in operationalFields])
+    configDigest = digest(settings)
+
+    digests = {}
+    for service, groups in (('ec2', catalog.ec2), ('rds', catalog.rds)):
+        for key, (dfInstanceList_sorted, fitIndex) in groups.items():
+            # Cheapest-any can pick from every family of the region and platform or engine
+            if config.matchPolicy == 'cheapest-any':
+                prices = "".join(dfInstanceList.to_csv() for (region, name, family), (dfInstanceList, fitIndex)
+                                 in groups.items() if (region, name) == key[:2])
+            else:
+                prices = dfInstanceList_sorted.to_csv()
+            digests[(service,) + key] = digest(settings, prices)
+    return configDigest, digests
+
+# The catalog digest each estimated row was priced with, from its computed columns.  Rows
+# with no catalog group (a platform or engine that isn't in the catalog) get the config
+# digest alone.
+def row_catalog_digests(dfEstimate, configDigest, digests):
+    rowDigests = pd.Series(configDigest, index=dfEstimate.index, dtype=np.int64)
+    groupColumns = ['RDS', 'AWS_Region', 'AWS_OS', 'AWS_DB', 'calc_family']
+    for (rds, region, os, db, family), rows in dfEstimate.groupby(groupColumns, observed=True, sort=False).groups.items():
+        key = ('rds', region, db, family) if rds else ('ec2', region, os, family)
+        rowDigests.loc[rows] = digests.get(key, configDigest)
+    return rowDigests
+
+# Previous output for diff mode, or None if there isn't one.  CSV output is read back with
+# its index column, exact floats and blanks as missing values, so copied rows write out the
+# same as they did the first time.
+def read_previous_estimate(path, categoricalColumns=()):
+    if path is None or not Path(path).exists():
+        return None
+    if file_format(path) == 'csv':
+        dfPrevious = pd.read_csv(path, index_col=0, keep_default_na=False, na_values=[''],
+                                 float_precision='round_trip')
+    else:
+        dfPrevious = read_cmdb(path, categoricalColumns)
+    if fingerprintColumn not in dfPrevious.columns or digestColumn not in dfPrevious.columns:
+        logger.info("Previous output has no fingerprints, estimating every row....")
+        return None
+    if 'AWS_DB' in dfPrevious.columns:
+        dfPrevious['AWS_DB'] = dfPrevious['AWS_DB'].astype(object).fillna("")
+    return dfPrevious
+
+# Estimate dfCMDB against the catalog, reusing the rows of dfPrevious that are still
+# current, and return the estimated frame with the fingerprint and digest columns
+def estimate_incremental(dfCMDB, dfPrevious, catalog, config=None, tracer=nullTracer):
+    if config is None:
+        config = EstimatorConfig()
+
+    fingerprints = row_fingerprints(dfCMDB, config)
+    configDigest, digests = catalog_digests(catalog, config)
+
+    # Previous rows that are still current, one per fingerprint
+    if dfPrevious is not None:
+        current = dfPrevious[digestColumn] == row_catalog_digests(dfPrevious, configDigest, digests)
+        dfCurrent = dfPrevious[current].drop_duplicates(fingerprintColumn, keep='last').set_index(fingerprintColumn)
+        reuse = fingerprints.isin(dfCurrent.index).to_numpy()
+    else:
+        dfCurrent = None
+        reuse = np.zeros(len(dfCMDB), dtype=bool)
+
+    logger.info("Reusing %d of %d rows, estimating %d....", reuse.sum(), len(dfCMDB), (~reuse).sum())
+
+    parts = []
+    columns = None
+
+    if not reuse.all():
+        dfChanged = estimate(dfCMDB[~reuse], catalog, config, tracer)
+        dfChanged[fingerprintColumn] = fingerprints[~reuse]
+        dfChanged[digestColumn] = row_catalog_digests(dfChanged, configDigest, digests)
+        columns = list(dfChanged.columns)
+        parts.append(dfChanged)
+
+    if reuse.any():
+        dfReused = fill_missing_memory(dfCMDB[reuse].copy(), config)
+        rowFingerprints = fingerprints[reuse]
+        for column in estimateColumns + [digestColumn]:
+            dfReused[column] = rowFingerprints.map(dfCurrent[column])
+        dfReused[fingerprintColumn] = rowFingerprints
+        if columns is None:
+            columns = (list(dfCMDB.columns) + [c for c in estimateColumns if c not in dfCMDB.columns] +
+                       [fingerprintColumn, digestColumn])
+        parts.append(dfReused[columns])
+
+    return pd.concat(parts).reindex(dfCMDB.index)[columns]
@@ -0,0 +1,70 @@
+# AWS Batch Cost Estimator - instance matching
+#
+# Maps calculated capacity requirements (cores and memory) onto a sorted list of instance
+# types.  The rule is first fit: a server gets the first instance in the sorted list with
+# at least as many vCPUs and at least as much memory as it needs.  Memory optimized lists
+# are sorted memory first, everything else vCPU first, so the order of the list decides
+# which fitting instance wins.
+#
+# Rather than scanning the list for every server, the answer is precomputed.  Whether an
+# instance covers a requirement only depends on the smallest distinct vCPU count and the
+# smallest distinct memory size in the list that are at least as large as the requirement.
+# Those distinct values form a small grid, the first fitting instance is worked out once
+# for every cell, and each server is then resolved with two searchsorted lookups.
+#
+# The cheapest fit policies use the same grid, with the lowest priced covering instance in
+# each cell instead of the first one.
+
+import numpy as np
+
+# Columns copied from the matched instance onto each server
+matchColumns = [('ec2_instance_type', 'instanceType'),
+                ('one_hr_rate', 'one_hr_rate'),
+                ('one_yr_rate', 'one_yr_rate'),
+                ('three_yr_rate', 'three_yr_rate')]
+
+# Rate column each cheapest fit policy rate minimizes
+rateColumns = {'on-demand': 'one_hr_rate',
+               '1yr': 'one_yr_rate',
+               '3yr': 'three_yr_rate'}
+
+# Build the fit index for an instance list that is already in match order.  Returns the
+# distinct vCPU and memory steps and a table holding, for each pair of steps, the position
+# of the instance chosen for requirements up to both, or -1 if none fits.  The extra last
+# row and column cover requirements larger than anything in the list.
+#
+# With no rateColumn the choice is the first instance covering both steps.  With one it is
+# the instance with the lowest rate among those covering both, the first of them on a tie;
+# instances without a rate are never picked.  Either way the lookup is the same two
+# searchsorted calls.
+def build_fit_index(dfInstanceList_sorted, rateColumn=None):
+    vcpus = dfInstanceList_sorted['vcpu'].to_numpy(dtype=float)
+    memory = dfInstanceList_sorted['memory'].to_numpy(dtype=float)
+
+    vcpuSteps = np.unique(vcpus)
+    memSteps = np.unique(memory)
+
+    table = np.full((len(vcpuSteps) + 1, len(memSteps) + 1), -1, dtype=np.int64)
+    if len(vcpus) == 0:
+        return vcpuSteps, memSteps, table
+
+    fits = ((vcpus[np.newaxis, np.newaxis, :] >= vcpuSteps[:, np.newaxis, np.newaxis])
+            & (memory[np.newaxis, np.newaxis, :] >= memSteps[np.newaxis, :, np.newaxis]))
+
+    if rateColumn is None:
+        table[:-1, :-1] = np.where(fits.any(axis=2), fits.argmax(axis=2), -1)
+    else:
+        rates = dfInstanceList_sorted[rateColumn].to_numpy(dtype=float)
+        rates = np.where(np.isnan(rates), np.inf, rates)
+        cost = np.where(fits, rates[np.newaxis, np.newaxis, :], np.inf)
+        table[:-1, :-1] = np.where(np.isfinite(cost.min(axis=2)), cost.argmin(axis=2), -1)
+
+    return vcpuSteps, memSteps, table
+
+# Position of the chosen instance for every requirement, -1 where nothing fits.
+# Missing requirements sort past the last step and so never match.
+def first_fit(fitIndex, cores, memory):
+    vcpuSteps, memSteps, table = fitIndex
+    vcpuStep = np.searchsorted(vcpuSteps, np.asarray(cores, dtype=float), side='left')
+    memStep = np.searchsorted(memSteps, np.asarray(memory, dtype=float), side='left')
+    return table[vcpuStep, memStep]
@@ -0,0 +1,243 @@
+# AWS Batch Cost Estimator - bulk offer files
+#
+# Reads the public AWS bulk price list offer files (AmazonEC2, AmazonRDS) as an alternative
+# to querying the pricing API.  The offer files are several GB, so they are streamed: the
+# JSON format is walked one product and one SKU's terms at a time, and the CSV format one
+# price dimension row at a time.  Only products matching one of the estimator's queries
+# are kept, so memory depends on the size of the catalog being built, not on the file.
+#
+# The result is the same thing get_products would return for each query, a list of
+# PriceList item JSON strings, so the rest of the estimator can't tell the difference.
+
+import csv
+import gzip
+import json
+from pathlib import Path
+
+# Read size for the JSON stream
+chunkSize = 1 << 20
+
+# CSV offer files use display names for the product attributes.  These are the ones the
+# estimator filters on or reads.
+csvAttributes = {
+    'location': 'Location',
+    'operatingSystem': 'Operating System',
+    'databaseEngine': 'Database Engine',
+    'instanceFamily': 'Instance Family',
+    'currentGeneration': 'Current Generation',
+    'licenseModel': 'License Model',
+    'tenancy': 'Tenancy',
+    'preInstalledSw': 'Pre Installed S/W',
+    'capacitystatus': 'CapacityStatus',
+    'instanceType': 'Instance Type',
+    'vcpu': 'vCPU',
+    'memory': 'Memory',
+}
+
+# Term attributes carried over from the CSV columns
+csvTermAttributes = ['LeaseContractLength', 'OfferingClass', 'PurchaseOption']
+
+# Locate the offer file for a service in a mirror directory.  Both a flat layout
+# (AmazonEC2.json) and the layout of the bulk API (AmazonEC2/current/index.json) work,
+# as JSON or CSV, optionally gzipped.
+def find_offer_file(directory, serviceCode):
+    directory = Path(directory)
+    for stem in (directory / serviceCode,
+                 directory / serviceCode / 'index',
+                 directory / serviceCode / 'current' / 'index'):
+        for suffix in ('.json', '.csv', '.json.gz', '.csv.gz'):
+            path = stem.parent / (stem.name + suffix)
+            if path.is_file():
+                return path
+    raise FileNotFoundError("No offer file for " + serviceCode + " in " + str(directory))
+
+def open_offer_file(path):
+    path = Path(path)
+    if path.suffix == '.gz':
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+# TERM_MATCH filters grouped by the fields they test, so a product is checked against all
+# queries with one dict lookup per group instead of one comparison per query
+class QueryMatcher:
+
+    def __init__(self, queries):
+        self.groups = {}
+        for name, filters in queries.items():
+            fields = tuple(sorted(f['Field'] for f in filters))
+            values = {f['Field']: f['Value'] for f in filters}
+            key = tuple(str(values[field]).casefold() for field in fields)
+            self.groups.setdefault(fields, {}).setdefault(key, []).append(name)
+
+    # Names of the queries an attribute dict satisfies
+    def match(self, attributes):
+        names = []
+        for fields, keys in self.groups.items():
+            key = tuple(str(attributes.get(field, '')).casefold() for field in fields)
+            names.extend(keys.get(key, ()))
+        return names
+
+# Incremental reader over a JSON document, just enough to walk the nested objects of an
+# offer file member by member while decoding each member's value in one go
+class JSONStream:
+
+    def __init__(self, handle):
+        self.handle = handle
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        if self.pos > len(self.buffer) // 2:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        data = self.handle.read(chunkSize)
+        if not data:
+            self.eof = True
+        self.buffer += data
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buffer) or self.eof:
+                break
+            self.fill()
+        if self.pos >= len(self.buffer):
+            raise ValueError("Unexpected end of offer file")
+        return self.buffer[self.pos]
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError("Malformed offer file, expected " + repr(char) +
+                             " but found " + repr(self.buffer[self.pos]))
+        self.pos += 1
+
+    # Decode the next complete value.  A value running into the end of the buffer may be
+    # cut short, and a number cut after its point or exponent still decodes as a shorter
+    # number, so keep reading until the value is followed by a delimiter or the file ends.
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                if self.eof or (end < len(self.buffer) and self.buffer[end] in ' \t\r\n,:]}'):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self.fill()
+
+    # Iterate the keys of the object starting here.  The caller must consume each key's
+    # value (with value() or a nested members()) before asking for the next key.
+    def members(self):
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            if self.peek() == ',':
+                self.pos += 1
+            else:
+                self.expect('}')
+                return
+
+# Walk a JSON offer file.  Products come before terms in the offer files, so matching SKUs
+# are known by the time their terms are read.
+def read_json_offer(handle, matcher):
+    products = {}
+    terms = {}
+
+    stream = JSONStream(handle)
+    for section in stream.members():
+        if section == 'products':
+            for sku in stream.members():
+                product = stream.value()
+                names = matcher.match(product.get('attributes', {}))
+                if names:
+                    products[sku] = (product, names)
+        elif section == 'terms':
+            for termType in stream.members():
+                for sku in stream.members():
+                    offers = stream.value()
+                    if sku in products:
+                        terms.setdefault(sku, {})[termType] = offers
+        else:
+            stream.value()
+
+    return products, terms
+
+# Walk a CSV offer file.  Each row is one price dimension of one term of one SKU, with the
+# product attributes repeated on every row.
+def read_csv_offer(handle, matcher):
+    products = {}
+    terms = {}
+
+    reader = csv.reader(handle)
+    for header in reader:
+        if header and header[0] == 'SKU':
+            break
+    else:
+        raise ValueError("Malformed offer file, no SKU header row")
+    column = {name: position for position, name in enumerate(header)}
+    attributeColumns = [(field, column[name]) for field, name in csvAttributes.items()
+                        if name in column]
+    termAttributeColumns = [(name, column[name]) for name in csvTermAttributes if name in column]
+
+    for row in reader:
+        if len(row) < len(header):
+            continue
+        sku = row[column['SKU']]
+        if sku not in products:
+            attributes = {field: row[position] for field, position in attributeColumns}
+            names = matcher.match(attributes)
+            if not names:
+                continue
+            products[sku] = ({'sku': sku, 'productFamily': row[column['Product Family']],
+                              'attributes': attributes}, names)
+
+        termCode = sku + "." + row[column['OfferTermCode']]
+        offer = terms.setdefault(sku, {}).setdefault(row[column['TermType']], {}).setdefault(
+            termCode, {'sku': sku,
+                       'offerTermCode': row[column['OfferTermCode']],
+                       'effectiveDate': row[column['EffectiveDate']],
+                       'termAttributes': {name: row[position]
+                                          for name, position in termAttributeColumns
+                                          if row[position]},
+                       'priceDimensions': {}})
+        offer['priceDimensions'][row[column['RateCode']]] = {
+            'rateCode': row[column['RateCode']],
+            'description': row[column['PriceDescription']],
+            'unit': row[column['Unit']],
+            'beginRange': row[column['StartingRange']],
+            'endRange': row[column['EndingRange']],
+            'pricePerUnit': {row[column['Currency']]: row[column['PricePerUnit']]}}
+
+    return products, terms
+
+# Return the PriceList items for a dict of get_products style queries, keyed the same way
+# as the queries, from the service's offer file in a mirror directory
+def offer_price_lists(directory, serviceCode, queries):
+    matcher = QueryMatcher(queries)
+    path = find_offer_file(directory, serviceCode)
+
+    with open_offer_file(path) as handle:
+        if '.csv' in path.suffixes:
+            products, terms = read_csv_offer(handle, matcher)
+        else:
+            products, terms = read_json_offer(handle, matcher)
+
+    priceLists = {name: [] for name in queries}
+    for sku, (product, names) in products.items():
+        item = json.dumps({'product': product,
+                           'serviceCode': serviceCode,
+                           'terms': terms.get(sku, {})})
+        for name in names:
+            priceLists[name].append(item)
+
+    return priceLists
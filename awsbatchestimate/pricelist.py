@@ -0,0 +1,94 @@
+# AWS Batch Cost Estimator - price list parsing
+#
+# Turns the PriceList items of one query into typed instance list columns.  EC2 items of
+# skipped instance types are dropped by their raw text before any JSON is decoded, the rest
+# are decoded in a single json.loads call, and every column is built as a plain list and
+# converted once, rather than growing a frame row by row.
+#
+# Rates are found by what the terms are, not by their codes.  The on-demand rate is the
+# hourly price dimension of the OnDemand term.  The 1-year and 3-year rates are the upfront
+# fee of the standard Reserved term whose termAttributes have that LeaseContractLength and
+# PurchaseOption 'All Upfront'.  Reserved terms without an OfferingClass, as RDS has, count
+# as standard.  An item without a matching term gets no rate for it.
+
+import json
+import re
+
+import numpy as np
+import pandas as pd
+
+# Instance list columns, in the order the catalog has always had them
+instanceColumns = ['instanceType', 'memory', 'family', 'one_hr_rate', 'one_yr_rate', 'three_yr_rate', 'vcpu']
+
+hoursPerYear = 8760
+
+# Anything but a digit, for memory sizes like "1,952 GiB"
+nonDigits = re.compile('[^0-9]')
+
+# The instance type in an item's raw JSON
+instanceTypeField = re.compile(r'"instanceType"\s*:\s*"([^"]*)"')
+
+# Whole GiB of a memory attribute, the fraction dropped: "3.75 GiB" is 3
+def parse_memory(memory):
+    return int(nonDigits.sub('', memory.split('.', 1)[0]))
+
+# The price dimensions of a term by unit ('Hrs', 'Quantity'), as floats
+def term_prices(term):
+    return {dimension['unit']: float(dimension['pricePerUnit']['USD'])
+            for dimension in term['priceDimensions'].values()}
+
+def on_demand_prices(terms):
+    for term in terms.get('OnDemand', {}).values():
+        return term_prices(term)
+    return {}
+
+def reserved_prices(terms, leaseContractLength, purchaseOption):
+    for term in terms.get('Reserved', {}).values():
+        termAttributes = term.get('termAttributes', {})
+        if (termAttributes.get('LeaseContractLength') == leaseContractLength
+                and termAttributes.get('PurchaseOption') == purchaseOption
+                and termAttributes.get('OfferingClass', 'standard') == 'standard'):
+            return term_prices(term)
+    return {}
+
+# Whether an EC2 instance type is filtered out: its generation (the first two characters,
+# e.g. 'm4') is in skipGenerations or its variant (the character after them, e.g. the 'd'
+# of 'm5d') is in skipVariants
+def skipped(instanceType, config):
+    return instanceType[0:2] in config.skipGenerations or instanceType[2:3] in config.skipVariants
+
+# Parse the items of one query into the instance list, unsorted.  For RDS SQL Server, which
+# has no 1-year All Upfront term, the 1-year rate is the Partial Upfront fee plus a year of
+# its hourly charge.
+def parse_price_list(items, service, family, config, db=None):
+    columns = {column: [] for column in instanceColumns}
+    sqlServer = service == 'AmazonRDS' and db == config.awsSQLServer
+
+    if service == 'AmazonEC2':
+        items = [item for item in items
+                 if not skipped(instanceTypeField.search(item).group(1), config)]
+
+    for item in json.loads('[' + ','.join(items) + ']'):
+        itemAttributes = item['product']['attributes']
+        instanceType = itemAttributes['instanceType']
+        terms = item['terms']
+        if sqlServer:
+            partialUpfront = reserved_prices(terms, '1yr', 'Partial Upfront')
+            oneYear = partialUpfront.get('Quantity', np.nan) + partialUpfront.get('Hrs', np.nan) * hoursPerYear
+        else:
+            oneYear = reserved_prices(terms, '1yr', 'All Upfront').get('Quantity', np.nan)
+
+        columns['instanceType'].append(instanceType)
+        columns['memory'].append(parse_memory(itemAttributes['memory']))
+        columns['vcpu'].append(int(itemAttributes['vcpu']))
+        columns['one_hr_rate'].append(on_demand_prices(terms).get('Hrs', np.nan))
+        columns['one_yr_rate'].append(oneYear)
+        columns['three_yr_rate'].append(reserved_prices(terms, '3yr', 'All Upfront').get('Quantity', np.nan))
+
+    return pd.DataFrame({'instanceType': pd.Series(columns['instanceType'], dtype=object),
+                         'memory': np.array(columns['memory'], dtype=np.int64),
+                         'family': pd.Series([family] * len(columns['instanceType']), dtype=object),
+                         'one_hr_rate': np.array(columns['one_hr_rate'], dtype=float),
+                         'one_yr_rate': np.array(columns['one_yr_rate'], dtype=float),
+                         'three_yr_rate': np.array(columns['three_yr_rate'], dtype=float),
+                         'vcpu': np.array(columns['vcpu'], dtype=np.int64)})
@@ -0,0 +1,207 @@
+# AWS Batch Cost Estimator - price lists
+#
+# Fetches get_products price lists for the catalog, from the pricing API through an on-disk
+# cache or from mirrored bulk offer files.  One pricing client is shared by every query
+# (boto3 clients are thread safe), each query is paginated to the end and the independent
+# queries run on a bounded thread pool with throttling-aware backoff.
+#
+# boto3 is only imported when the pricing API is actually called, so offline, cached and
+# offer file runs don't pay for it.
+#
+# Every query is recorded on the tracer with where its price list came from, and for API
+# fetches the calls made, their latency and retries.
+
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from .offerfiles import offer_price_lists
+from .trace import nullTracer
+
+logger = logging.getLogger(__name__)
+
+# Error codes the pricing API uses when it is throttling us
+throttlingErrors = {'Throttling', 'ThrottlingException', 'TooManyRequestsException',
+                    'RequestLimitExceeded'}
+
+# Cache key is the service code plus the filter set, sorted so the order the filters were
+# written in doesn't matter
+def price_list_key(serviceCode, filters):
+    filterSet = sorted((f['Type'], f['Field'], f['Value']) for f in filters)
+    return json.dumps([serviceCode, filterSet])
+
+def open_price_cache(directory):
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(directory / 'pricelist.sqlite'))
+    conn.execute("""CREATE TABLE IF NOT EXISTS price_lists (
+                        key TEXT PRIMARY KEY,
+                        service_code TEXT NOT NULL,
+                        fetched_at REAL NOT NULL,
+                        price_list TEXT NOT NULL)""")
+    return conn
+
+class PriceListSource:
+
+    def __init__(self, config, tracer=nullTracer):
+        self.config = config
+        self.tracer = tracer
+        self.client = None
+        self.clientLock = threading.Lock()
+        self.cache = None
+
+    # Price lists for a dict of queries, keyed the same way as the queries, from the
+    # mirrored bulk offer files when offerDir is set and from the pricing API (through the
+    # cache) otherwise
+    def price_lists(self, serviceCode, queries):
+        if self.config.offerDir:
+            logger.info("Reading %s offer file....", serviceCode)
+            start = time.perf_counter()
+            priceLists = offer_price_lists(self.config.offerDir, serviceCode, queries)
+            seconds = time.perf_counter() - start
+            for name, items in priceLists.items():
+                self.tracer.query(service=serviceCode, names=[list(name)], source='offer-file',
+                                  items=len(items), seconds=seconds)
+            return priceLists
+        return self.get_price_lists(serviceCode, queries)
+
+    # Return the cached PriceList items for a key, or None if there is no usable entry.
+    # Offline runs accept stale entries, everything else honours the TTL.
+    def cached_price_list(self, key):
+        if self.cache is None:
+            self.cache = open_price_cache(self.config.cacheDir)
+        row = self.cache.execute("SELECT fetched_at, price_list FROM price_lists WHERE key = ?",
+                                 (key,)).fetchone()
+        if row is None:
+            return None
+        fetchedAt, priceList = row
+        if self.config.offline or (time.time() - fetchedAt) < self.config.cacheTTLHours * 3600:
+            return json.loads(priceList)
+        return None
+
+    def store_price_list(self, key, serviceCode, items):
+        if self.cache is None:
+            self.cache = open_price_cache(self.config.cacheDir)
+        with self.cache:
+            self.cache.execute("INSERT OR REPLACE INTO price_lists VALUES (?, ?, ?, ?)",
+                               (key, serviceCode, time.time(), json.dumps(items)))
+
+    # One pricing client for the source.  The lock only guards creation.  Botocore's own
+    # retries are turned off since get_products_page does the throttling-aware and network
+    # error retries itself.
+    def get_pricing_client(self):
+        with self.clientLock:
+            if self.client is None:
+                import boto3
+                from botocore.config import Config
+
+                self.client = boto3.client(
+                    'pricing',
+                    endpoint_url=self.config.pricingEndpoint,
+                    config=Config(retries={'total_max_attempts': 1},
+                                  max_pool_connections=max(10, self.config.pricingWorkers)))
+        return self.client
+
+    # Fetch one page of get_products, backing off and retrying when throttled, when the
+    # service has a transient failure or when the connection fails or times out, as
+    # botocore's own retries would.  Calls, their latency and retries are counted in stats.
+    def get_products_page(self, client, request, stats):
+        from botocore.exceptions import ClientError, ConnectionClosedError, ConnectionError, ReadTimeoutError
+
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                return client.get_products(**request)
+            except ClientError as e:
+                attempt = attempt + 1
+                code = e.response.get('Error', {}).get('Code')
+                status = e.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0)
+                if (code not in throttlingErrors and status < 500) or attempt >= self.config.pricingMaxAttempts:
+                    raise
+                stats['retries'] = stats['retries'] + 1
+            except (ConnectionError, ConnectionClosedError, ReadTimeoutError):
+                attempt = attempt + 1
+                if attempt >= self.config.pricingMaxAttempts:
+                    raise
+                stats['retries'] = stats['retries'] + 1
+            finally:
+                stats['apiCalls'] = stats['apiCalls'] + 1
+                stats['apiSeconds'] = stats['apiSeconds'] + time.perf_counter() - start
+            time.sleep(random.uniform(0, min(self.config.pricingMaxBackoff,
+                                             self.config.pricingBaseBackoff * 2 ** attempt)))
+
+    # Fetch every PriceList item for a query, following NextToken to the last page.  Returns
+    # the items and the fetch's stats.
+    def fetch_price_list(self, serviceCode, filters):
+        start = time.perf_counter()
+        stats = {'apiCalls': 0, 'apiSeconds': 0.0, 'retries': 0}
+        client = self.get_pricing_client()
+        request = {'ServiceCode': serviceCode, 'Filters': filters, 'MaxResults': 100}
+        items = []
+        while True:
+            response = self.get_products_page(client, request, stats)
+            items.extend(response['PriceList'])
+            nextToken = response.get('NextToken')
+            if not nextToken:
+                stats['seconds'] = time.perf_counter() - start
+                return items, stats
+            request['NextToken'] = nextToken
+
+    # Return the PriceList items for a dict of get_products queries, keyed the same way as
+    # the queries.  Fresh cache entries are used as they are.  Everything else is fetched
+    # once per distinct filter set on a bounded thread pool, and written back to the cache
+    # from this thread since the SQLite connection isn't shared across threads.  If a fetch
+    # fails, the fetches still queued are cancelled and the error is raised once the running
+    # ones are in, so everything fetched is cached for the next run.  Refresh runs ignore
+    # the cache, offline runs never call the API.
+    def get_price_lists(self, serviceCode, queries):
+        priceLists = {}
+        missing = {}
+
+        for name, filters in queries.items():
+            key = price_list_key(serviceCode, filters)
+            start = time.perf_counter()
+            items = None if self.config.refresh else self.cached_price_list(key)
+            if items is not None:
+                priceLists[name] = items
+                self.tracer.query(service=serviceCode, names=[list(name)], source='cache', items=len(items),
+                                  seconds=time.perf_counter() - start)
+            else:
+                missing.setdefault(key, (filters, []))[1].append(name)
+
+        if missing and self.config.offline:
+            filters = next(iter(missing.values()))[0]
+            raise RuntimeError("No cached price list for " + serviceCode + " " +
+                               json.dumps({f['Field']: f['Value'] for f in filters}) +
+                               ", run once without offline to populate the cache")
+
+        if missing:
+            failure = None
+            with ThreadPoolExecutor(max_workers=self.config.pricingWorkers) as pool:
+                futures = {pool.submit(self.fetch_price_list, serviceCode, filters): key
+                           for key, (filters, names) in missing.items()}
+                for future in as_completed(futures):
+                    key = futures[future]
+                    try:
+                        items, stats = future.result()
+                    except Exception as e:
+                        if failure is None:
+                            failure = e
+                            for pending in futures:
+                                pending.cancel()
+                        continue
+                    self.store_price_list(key, serviceCode, items)
+                    for name in missing[key][1]:
+                        priceLists[name] = items
+                    self.tracer.query(service=serviceCode, names=[list(name) for name in missing[key][1]],
+                                      source='api', items=len(items), **stats)
+            if failure is not None:
+                raise failure
+
+        return priceLists
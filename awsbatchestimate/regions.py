@@ -0,0 +1,44 @@
+# AWS Batch Cost Estimator - AWS regions
+#
+# Every AWS region code and the location name the pricing API and the offer files use for
+# it.  The price filters look locations up here, and a CMDB Location column can hold a
+# region code or a location name directly as well as the source values mapped in the
+# config.
+
+regionLocations = {
+    'us-east-1': "US East (N. Virginia)",
+    'us-east-2': "US East (Ohio)",
+    'us-west-1': "US West (N. California)",
+    'us-west-2': "US West (Oregon)",
+    'ca-central-1': "Canada (Central)",
+    'ca-west-1': "Canada West (Calgary)",
+    'mx-central-1': "Mexico (Central)",
+    'sa-east-1': "South America (Sao Paulo)",
+    'eu-central-1': "EU (Frankfurt)",
+    'eu-central-2': "EU (Zurich)",
+    'eu-west-1': "EU (Ireland)",
+    'eu-west-2': "EU (London)",
+    'eu-west-3': "EU (Paris)",
+    'eu-south-1': "EU (Milan)",
+    'eu-south-2': "EU (Spain)",
+    'eu-north-1': "EU (Stockholm)",
+    'il-central-1': "Israel (Tel Aviv)",
+    'me-south-1': "Middle East (Bahrain)",
+    'me-central-1': "Middle East (UAE)",
+    'af-south-1': "Africa (Cape Town)",
+    'ap-east-1': "Asia Pacific (Hong Kong)",
+    'ap-east-2': "Asia Pacific (Taipei)",
+    'ap-south-1': "Asia Pacific (Mumbai)",
+    'ap-south-2': "Asia Pacific (Hyderabad)",
+    'ap-northeast-1': "Asia Pacific (Tokyo)",
+    'ap-northeast-2': "Asia Pacific (Seoul)",
+    'ap-northeast-3': "Asia Pacific (Osaka)",
+    'ap-southeast-1': "Asia Pacific (Singapore)",
+    'ap-southeast-2': "Asia Pacific (Sydney)",
+    'ap-southeast-3': "Asia Pacific (Jakarta)",
+    'ap-southeast-4': "Asia Pacific (Melbourne)",
+    'ap-southeast-5': "Asia Pacific (Malaysia)",
+    'ap-southeast-7': "Asia Pacific (Thailand)",
+    'us-gov-east-1': "AWS GovCloud (US-East)",
+    'us-gov-west-1': "AWS GovCloud (US)",
+}
@@ -0,0 +1,81 @@
+# AWS Batch Cost Estimator - rollup reports
+#
+# Cost totals for finance instead of the per-server bill of materials.  A Rollup is fed
+# estimated frames, whole or one chunk at a time, and keeps only running totals per group
+# of AWS region, environment, inferred family, platform, engine and service (EC2 or RDS):
+# server and unmatched counts, the hourly, 1-year and 3-year rates, monthly EBS and the
+# 1-year and 3-year TCO (reserved rate plus that many months of EBS).  Alongside it keeps an
+# instance histogram, the number of servers matched to each instance type in each group.
+#
+# Memory depends on the number of distinct groups, not the number of servers, so an
+# inventory of any size can be summarized while it streams through estimate_csv_chunked().
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .cmdbio import write_cmdb
+from .config import EstimatorConfig
+
+# Totals kept for every group
+rollupTotals = ['servers', 'unmatched', 'one_hr_total', 'one_yr_total', 'three_yr_total', 'ebs_month_total']
+
+class Rollup:
+
+    def __init__(self, config=None):
+        self.config = config or EstimatorConfig()
+        self.keys = ['AWS_Region', self.config.srcEnv, 'calc_family', 'AWS_OS', 'AWS_DB', 'service']
+        self.totals = None
+        self.histogram = None
+
+    # Add the totals of an estimated frame or chunk
+    def add(self, dfEstimate):
+        dfKeys = pd.DataFrame({key: dfEstimate[key].astype(object).to_numpy()
+                               for key in self.keys if key != 'service'})
+        dfKeys['service'] = np.where(dfEstimate['RDS'].to_numpy(dtype=bool), 'RDS', 'EC2')
+
+        instanceType = dfEstimate['ec2_instance_type'].astype(object).to_numpy()
+        dfTotals = dfKeys.assign(servers=1,
+                                 unmatched=pd.isna(instanceType).astype(np.int64),
+                                 one_hr_total=dfEstimate['one_hr_rate'].to_numpy(dtype=float),
+                                 one_yr_total=dfEstimate['one_yr_rate'].to_numpy(dtype=float),
+                                 three_yr_total=dfEstimate['three_yr_rate'].to_numpy(dtype=float),
+                                 ebs_month_total=dfEstimate['ebs_month_rate'].to_numpy(dtype=float))
+        self.totals = self.merge(self.totals, dfTotals.groupby(self.keys, dropna=False, sort=False).sum())
+
+        dfInstances = dfKeys.assign(ec2_instance_type=instanceType, servers=1)
+        self.histogram = self.merge(self.histogram,
+                                    dfInstances.groupby(self.keys + ['ec2_instance_type'], dropna=False,
+                                                        sort=False).sum())
+        return self
+
+    # Fold a chunk's group totals into the running ones
+    @staticmethod
+    def merge(running, chunk):
+        if running is None:
+            return chunk
+        return pd.concat([running, chunk]).groupby(level=list(range(chunk.index.nlevels)), dropna=False,
+                                                   sort=False).sum()
+
+    # Group totals with the TCO columns, one row per group in key order
+    def report(self):
+        if self.totals is None:
+            return pd.DataFrame(columns=self.keys + rollupTotals + ['one_yr_tco', 'three_yr_tco'])
+        dfReport = self.totals.reset_index().sort_values(self.keys, ignore_index=True)
+        dfReport['one_yr_tco'] = dfReport['one_yr_total'] + 12 * dfReport['ebs_month_total']
+        dfReport['three_yr_tco'] = dfReport['three_yr_total'] + 36 * dfReport['ebs_month_total']
+        return dfReport
+
+    # Server count per instance type in every group, unmatched servers under a blank type
+    def instances(self):
+        if self.histogram is None:
+            return pd.DataFrame(columns=self.keys + ['ec2_instance_type', 'servers'])
+        return self.histogram.reset_index().sort_values(self.keys + ['ec2_instance_type'], ignore_index=True)
+
+    # Write the report to path and the instance histogram next to it, as
+    # <name>_instances.<ext>
+    def write(self, path):
+        path = Path(path)
+        write_cmdb(self.report(), path)
+        write_cmdb(self.instances(), path.with_name(path.stem + '_instances' + path.suffix))
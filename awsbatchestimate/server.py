@@ -0,0 +1,168 @@
+# AWS Batch Cost Estimator - estimation server
+#
+# Long-running HTTP/JSON server for interactive what-if pricing.  The price catalog is
+# built once at start-up, or opened from a saved catalog file, and kept in memory, so a
+# request only pays for classification and matching of the servers it sends.  A background
+# thread rebuilds (or reopens) the catalog on a schedule and swaps it in when it is ready;
+# requests keep using the old one until then.
+#
+# Endpoints:
+#   GET  /health    catalog status
+#   POST /estimate  {"servers": [{CMDB columns}, ...]} -> {"servers": [{estimated row}, ...]}
+#   POST /refresh   rebuild the catalog now
+
+import json
+import logging
+import threading
+import time
+from dataclasses import replace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+from .catalog import build_catalog
+from .catalogfile import load_catalog
+from .estimator import estimate
+
+logger = logging.getLogger(__name__)
+
+class EstimationRequestHandler(BaseHTTPRequestHandler):
+
+    def send_json(self, status, body):
+        data = body.encode('utf-8') if isinstance(body, str) else json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_error_json(self, status, message):
+        self.send_json(status, {'error': message})
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'null')
+
+    def do_GET(self):
+        if self.path == '/health':
+            self.send_json(200, self.server.status())
+        else:
+            self.send_error_json(404, "Unknown path " + self.path)
+
+    def do_POST(self):
+        if self.path == '/estimate':
+            self.handle_estimate()
+        elif self.path == '/refresh':
+            try:
+                self.server.refresh_catalog(force=True)
+            except Exception as e:
+                self.send_error_json(502, "Catalog refresh failed: " + str(e))
+                return
+            self.send_json(200, self.server.status())
+        else:
+            self.send_error_json(404, "Unknown path " + self.path)
+
+    # Estimate a batch of servers.  The body is {"servers": [...]} or just the list, each
+    # server an object with the CMDB columns the config maps.
+    def handle_estimate(self):
+        try:
+            body = self.read_json()
+        except ValueError as e:
+            self.send_error_json(400, "Request body is not valid JSON: " + str(e))
+            return
+
+        servers = body.get('servers') if isinstance(body, dict) else body
+        if not isinstance(servers, list) or not all(isinstance(s, dict) for s in servers):
+            self.send_error_json(400, "Expected a list of server objects under 'servers'")
+            return
+        if not servers:
+            self.send_json(200, {'servers': []})
+            return
+
+        try:
+            dfEstimate = estimate(pd.DataFrame.from_records(servers), self.server.catalog,
+                                  self.server.config)
+        except KeyError as e:
+            self.send_error_json(400, "Missing CMDB column " + str(e))
+            return
+        except Exception as e:
+            logger.exception("Estimate failed")
+            self.send_error_json(500, "Estimate failed: " + str(e))
+            return
+
+        self.send_json(200, '{"servers": ' + dfEstimate.to_json(orient='records') + '}')
+
+    # Request lines go to the debug log rather than stderr
+    def log_message(self, format, *args):
+        logger.debug("%s " + format, self.address_string(), *args)
+
+class EstimationServer(ThreadingHTTPServer):
+
+    daemon_threads = True
+
+    # refreshHours is how often the background thread rebuilds the catalog, 0 to never.  With
+    # catalogPath the catalog is the saved catalog file there instead of being priced.
+    def __init__(self, address, config, refreshHours=24, catalogPath=None):
+        super().__init__(address, EstimationRequestHandler)
+        self.config = config
+        self.refreshHours = refreshHours
+        self.catalogPath = catalogPath
+        self.catalog = None
+        self.catalogBuiltAt = None
+        self.refreshLock = threading.Lock()
+        self.stopRefresh = threading.Event()
+        self.refreshThread = None
+
+        self.refresh_catalog()
+
+    # Build a new catalog and swap it in.  A forced rebuild goes back to the pricing API
+    # rather than the cache, unless the config prices offline or from offer files.  Each
+    # build uses its own price list source so the cache connection stays on this thread.
+    # A catalog file is reopened instead, which picks up a newly saved one.
+    def refresh_catalog(self, force=False):
+        with self.refreshLock:
+            config = self.config
+            if force and not (config.offline or config.offerDir):
+                config = replace(config, refresh=True)
+            if self.catalogPath:
+                catalog = load_catalog(self.catalogPath)
+            else:
+                catalog = build_catalog(config)
+            self.catalog = catalog
+            self.catalogBuiltAt = time.time()
+
+    def refresh_loop(self):
+        while not self.stopRefresh.wait(self.refreshHours * 3600):
+            try:
+                self.refresh_catalog(force=True)
+            except Exception as e:
+                logger.error("Catalog refresh failed, keeping the current catalog: %s", e)
+
+    def status(self):
+        return {'status': 'ok',
+                'catalogBuiltAt': self.catalogBuiltAt,
+                'catalogFile': self.catalogPath,
+                'ec2Groups': len(self.catalog.ec2),
+                'rdsGroups': len(self.catalog.rds),
+                'refreshHours': self.refreshHours}
+
+    def serve_forever(self, poll_interval=0.5):
+        if self.refreshHours and self.refreshThread is None:
+            self.refreshThread = threading.Thread(target=self.refresh_loop, name='catalog-refresh',
+                                                  daemon=True)
+            self.refreshThread.start()
+        super().serve_forever(poll_interval)
+
+    def server_close(self):
+        self.stopRefresh.set()
+        super().server_close()
+
+def serve(config, host='127.0.0.1', port=8080, refreshHours=24, catalogPath=None):
+    server = EstimationServer((host, port), config, refreshHours, catalogPath)
+    logger.info("Serving estimates on http://%s:%d....", host, server.server_address[1])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,108 @@
+# AWS Batch Cost Estimator - scenario sweeps
+#
+# Sensitivity analysis over the sizing knobs.  A sweep takes a grid of parameter sets and
+# prices every scenario against one shared catalog, so the price lists are only fetched
+# once, and returns a one row per scenario cost summary.
+#
+# Scenarios that only differ in storage rates size and match exactly the same, so each
+# distinct set of sizing knobs is estimated once (on a process pool when there are several)
+# and the storage rates of every scenario are applied to its totals in one vectorized step.
+
+import itertools
+import json
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+
+import pandas as pd
+
+from .catalogfile import open_catalog
+from .config import EstimatorConfig
+from .estimator import estimate, summarize_estimate
+
+logger = logging.getLogger(__name__)
+
+# Knobs that change sizing and matching
+sizingFields = ('cpuHeadroom', 'computeRatioCutoff', 'memoryRatioCutoff', 'burstableMaxCores',
+                'burstableMaxMemory')
+
+# Knobs that only change the storage total
+storageFields = ('ec2EBSUnitCost', 'rdsEBSUnitCost')
+
+# Expand a grid into a list of scenarios.  A dict maps each knob to a value or a list of
+# values and is expanded to every combination, a list gives the scenarios one by one.
+def expand_scenarios(grid):
+    if isinstance(grid, dict):
+        names = list(grid)
+        values = [v if isinstance(v, (list, tuple)) else [v] for v in grid.values()]
+        scenarios = [dict(zip(names, combination)) for combination in itertools.product(*values)]
+    else:
+        scenarios = [dict(scenario) for scenario in grid]
+
+    for scenario in scenarios:
+        unknown = set(scenario) - set(sizingFields) - set(storageFields)
+        if unknown:
+            raise ValueError("A sweep can't vary " + ", ".join(sorted(unknown)) + ", only " +
+                             ", ".join(sizingFields + storageFields))
+    return scenarios
+
+# Scenarios from a JSON grid file
+def load_scenarios(path):
+    with open(path) as f:
+        return expand_scenarios(json.load(f))
+
+# Each pool worker gets the CMDB, catalog and base config once, not once per scenario
+sweepState = {}
+
+def init_sweep_worker(dfCMDB, catalog, config):
+    sweepState['dfCMDB'] = dfCMDB
+    sweepState['catalog'] = open_catalog(catalog)
+    sweepState['config'] = config
+
+# Estimate the CMDB with one set of sizing knobs and total it up.  Storage is totalled in
+# GB so the rates can be applied afterwards.
+def summarize_sizing(sizing):
+    config = replace(sweepState['config'], **dict(sizing))
+    dfEstimate = estimate(sweepState['dfCMDB'], sweepState['catalog'], config)
+
+    rds = dfEstimate['RDS'].to_numpy(dtype=bool)
+    storage = dfEstimate[config.srcBlockStorage].to_numpy(dtype=float)
+    summary = summarize_estimate(dfEstimate, config)
+    summary['ec2_storage_gb'] = storage[~rds].sum()
+    summary['rds_storage_gb'] = storage[rds].sum()
+    return summary
+
+# Price every scenario against the catalog and return the per-scenario summary: the
+# effective value of every knob, server counts, counts per family, the hourly, 1-year and
+# 3-year totals and the monthly EBS total.  workers is the process pool size, 1 runs
+# everything in this process.  catalog can also be the path of a catalog file, which each
+# worker then maps for itself.
+def sweep(dfCMDB, catalog, scenarios, config=None, workers=None):
+    if config is None:
+        config = EstimatorConfig()
+
+    dfScenarios = pd.DataFrame([{name: scenario.get(name, getattr(config, name))
+                                 for name in sizingFields + storageFields}
+                                for scenario in scenarios])
+    sizings = list(dict.fromkeys(tuple(row) for row in dfScenarios[list(sizingFields)].itertuples(index=False)))
+    sizingArgs = [tuple(zip(sizingFields, sizing)) for sizing in sizings]
+
+    logger.info("Sweeping %d scenarios over %d sizings....", len(dfScenarios), len(sizings))
+    if workers == 1 or len(sizings) == 1:
+        init_sweep_worker(dfCMDB, catalog, config)
+        try:
+            summaries = [summarize_sizing(sizing) for sizing in sizingArgs]
+        finally:
+            sweepState.clear()
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_sweep_worker,
+                                 initargs=(dfCMDB, catalog, config)) as pool:
+            summaries = list(pool.map(summarize_sizing, sizingArgs))
+
+    # Line each scenario up with the summary of its sizing, then apply its storage rates
+    dfSummaries = pd.DataFrame(summaries, index=pd.MultiIndex.from_tuples(sizings, names=sizingFields))
+    dfSweep = dfScenarios.join(dfSummaries, on=list(sizingFields))
+    dfSweep['ebs_month_total'] = (dfSweep['ec2_storage_gb'] * dfSweep['ec2EBSUnitCost'] +
+                                  dfSweep['rds_storage_gb'] * dfSweep['rdsEBSUnitCost'])
+    dfSweep.index.name = 'scenario'
+    return dfSweep
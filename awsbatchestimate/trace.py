@@ -0,0 +1,141 @@
+# AWS Batch Cost Estimator - instrumentation
+#
+# A Tracer records what a run did: one event per pipeline stage (wall time, rows processed,
+# peak RSS growth, and resident memory at the end and its change over the stage) and one
+# per pricing query (the query names it answered, wall time, API calls and their latency,
+# items returned, retries, or where the price list came from if not the API).  The events
+# are written out as a JSON trace, and hooks see every event as it is recorded so they can
+# be forwarded to a metrics system.
+#
+# Stage memory is measured two ways.  peakRSSDeltaMB is how far the stage pushed the
+# process high-water mark, so it catches short-lived peaks, but it is zero for any stage
+# that stays under an earlier one.  rssMB and rssDeltaMB sample the current RSS before and
+# after the stage, which shows memory a stage keeps or frees.  Each is left out where the
+# platform can't report it: the high-water mark needs the resource module, which Windows
+# doesn't have, and the current RSS needs /proc.
+#
+# Everything that takes a tracer defaults to nullTracer, which records nothing.
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# ru_maxrss is in KB on Linux and bytes on macOS
+rssUnit = 1 if sys.platform == 'darwin' else 1024
+
+# Process high-water mark RSS in bytes, or None without the resource module
+def peak_rss():
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * rssUnit
+
+# Current RSS in bytes, or None where /proc isn't available
+def current_rss():
+    try:
+        pageSize = os.sysconf('SC_PAGE_SIZE')
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * pageSize
+    except (AttributeError, ValueError, OSError):
+        return None
+
+class Tracer:
+
+    # hooks are called with every event dict as it is recorded
+    def __init__(self, hooks=()):
+        self.hooks = list(hooks)
+        self.stages = []
+        self.queries = []
+        self.started = time.time()
+        self.lock = threading.Lock()
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def record(self, events, event):
+        with self.lock:
+            events.append(event)
+        for hook in self.hooks:
+            try:
+                hook(event)
+            except Exception:
+                logger.warning("Trace hook %r failed", hook, exc_info=True)
+
+    # Time a stage.  The block can set event['rows'] and any other counts on the yielded
+    # event.
+    @contextmanager
+    def stage(self, name, **fields):
+        event = {'kind': 'stage', 'name': name}
+        event.update(fields)
+        peakBefore = peak_rss()
+        rssBefore = current_rss()
+        start = time.perf_counter()
+        try:
+            yield event
+        finally:
+            event['seconds'] = time.perf_counter() - start
+            peakAfter = peak_rss()
+            if peakAfter is not None:
+                event['peakRSSDeltaMB'] = round((peakAfter - peakBefore) / 2 ** 20, 2)
+            rssAfter = current_rss()
+            if rssAfter is not None:
+                event['rssMB'] = round(rssAfter / 2 ** 20, 2)
+                event['rssDeltaMB'] = round((rssAfter - rssBefore) / 2 ** 20, 2)
+            self.record(self.stages, event)
+
+    # Record one pricing query: service, names (the list of query names it answered, each a
+    # list; identical queries are fetched once for all their names), seconds, source ('api',
+    # 'cache' or 'offer-file'), items and, for the API, apiCalls, apiSeconds and retries
+    def query(self, **fields):
+        event = {'kind': 'query'}
+        event.update(fields)
+        self.record(self.queries, event)
+
+    # Totals per stage name and over all queries
+    def summary(self):
+        stages = {}
+        for event in self.stages:
+            total = stages.setdefault(event['name'], {'count': 0, 'seconds': 0.0, 'rows': 0})
+            total['count'] = total['count'] + 1
+            total['seconds'] = total['seconds'] + event['seconds']
+            total['rows'] = total['rows'] + event.get('rows', 0)
+
+        queries = {'count': len(self.queries)}
+        for field in ('apiCalls', 'apiSeconds', 'retries', 'items'):
+            queries[field] = sum(event.get(field, 0) for event in self.queries)
+        for source in ('api', 'cache', 'offer-file'):
+            queries[source] = sum(1 for event in self.queries if event.get('source') == source)
+
+        peak = peak_rss()
+        return {'stages': stages, 'queries': queries,
+                'peakRSSMB': None if peak is None else round(peak / 2 ** 20, 1)}
+
+    def to_dict(self):
+        return {'started': self.started,
+                'seconds': time.time() - self.started,
+                'stages': self.stages,
+                'queries': self.queries,
+                'summary': self.summary()}
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
+
+# Tracer that records nothing, for runs without a trace
+class NullTracer(Tracer):
+
+    @contextmanager
+    def stage(self, name, **fields):
+        yield {}
+
+    def query(self, **fields):
+        pass
+
+nullTracer = NullTracer()
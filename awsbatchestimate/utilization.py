@@ -0,0 +1,184 @@
+# AWS Batch Cost Estimator - utilization sizing
+#
+# Sizes servers from monitoring time series instead of the single CPU and memory figures in
+# the CMDB.  Metric files (CSV, Parquet, Arrow IPC or Feather, one row per server and
+# sample) are streamed in chunks, so files far larger than memory can be read, and each
+# server's CPU and memory samples go into a quantile sketch:
+#
+#   Samples are counted in logarithmic buckets, bucket i holding values in
+#   (gamma^(i-1), gamma^i] with gamma = (1 + a) / (1 - a), and a quantile is read back as
+#   the middle of the bucket holding that rank.  That is within relative error a
+#   (sketchAccuracy) of the true quantile, whatever the distribution.  Sketches add up
+#   bucket by bucket, so files can be sketched in parallel and merged.
+#
+# Memory depends on the number of servers and buckets in use, not on the number of samples.
+# Peaks are kept exactly.  The p95, p99 and peak of every server come out as one frame, and
+# apply_utilization() adds the configured statistics to the CMDB as the utilCPU and
+# utilMemory columns, which cores_calc, family inference and matching then size from.  The
+# CMDB's own columns are left alone, so provisioned memory survives even where it is also
+# the used memory column.
+
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .batch import batch_inputs
+from .cmdbio import file_format, formatExtensions, import_pyarrow
+from .config import EstimatorConfig
+
+logger = logging.getLogger(__name__)
+
+# Rows read from a metric file at a time
+chunkRows = 1 << 20
+
+# Bucket for samples of zero or less
+zeroBucket = np.iinfo(np.int32).min
+
+statisticNames = ['p95', 'p99', 'peak']
+quantiles = {'p95': .95, 'p99': .99}
+
+# Metric files for a file, a directory of them or a manifest listing them
+def metric_files(source):
+    source = Path(source)
+    if source.is_file() and source.suffix.lower() in formatExtensions:
+        return [source]
+    return batch_inputs(source)
+
+# Read the server, CPU and memory columns of a metric file chunkRows rows at a time
+def read_metric_chunks(path, config):
+    columns = [config.metricServer, config.metricCPU, config.metricMemory]
+    fmt = file_format(path)
+    if fmt == 'csv':
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunkRows)
+        return
+
+    pa = import_pyarrow()
+    if fmt == 'parquet':
+        import pyarrow.parquet
+        batches = pyarrow.parquet.ParquetFile(path).iter_batches(batch_size=chunkRows, columns=columns)
+    else:
+        try:
+            reader = pa.ipc.open_file(path)
+            batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        except pa.ArrowInvalid:
+            batches = pa.ipc.open_stream(path)
+    for batch in batches:
+        yield batch.to_pandas()[columns]
+
+class UtilizationSketch:
+
+    def __init__(self, accuracy=.01):
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.logGamma = np.log(self.gamma)
+        # metric -> sample count per (server, bucket), and exact peak per server
+        self.counts = {}
+        self.peaks = {}
+
+    # Add one chunk of samples.  Samples without a server or a value are ignored.
+    def add(self, servers, metric, values):
+        values = np.asarray(values, dtype=float)
+        keep = ~np.isnan(values) & pd.notna(servers)
+        servers = np.asarray(servers)[keep].astype(str)
+        values = values[keep]
+        if len(values) == 0:
+            return self
+
+        positive = values > 0
+        buckets = np.full(len(values), zeroBucket, dtype=np.int64)
+        buckets[positive] = np.ceil(np.log(values[positive]) / self.logGamma)
+
+        dfSamples = pd.DataFrame({'server': servers, 'bucket': buckets, 'value': values})
+        counts = dfSamples.groupby(['server', 'bucket'], sort=False).size()
+        peaks = dfSamples.groupby('server', sort=False)['value'].max()
+        self.merge_counts(metric, counts, peaks)
+        return self
+
+    def merge_counts(self, metric, counts, peaks):
+        if metric in self.counts:
+            counts = self.counts[metric].add(counts, fill_value=0).astype(np.int64)
+            peaks = pd.concat([self.peaks[metric], peaks]).groupby(level=0).max()
+        self.counts[metric] = counts
+        self.peaks[metric] = peaks
+
+    # Add another sketch built with the same accuracy
+    def merge(self, other):
+        for metric in other.counts:
+            self.merge_counts(metric, other.counts[metric], other.peaks[metric])
+        return self
+
+    # Every server's p95, p99 and peak of a metric, indexed by server
+    def statistics(self, metric):
+        if metric not in self.counts:
+            return pd.DataFrame(columns=statisticNames, dtype=float)
+
+        dfBuckets = self.counts[metric].sort_index().rename('count').reset_index()
+        counts = dfBuckets.groupby('server', sort=False)['count']
+        cumulative = counts.cumsum().to_numpy()
+        total = counts.transform('sum').to_numpy()
+        bucketValues = np.where(dfBuckets['bucket'] == zeroBucket, 0.0,
+                                2 * self.gamma ** dfBuckets['bucket'].to_numpy(dtype=float) / (self.gamma + 1))
+
+        dfStatistics = pd.DataFrame(index=self.peaks[metric].index)
+        for name, quantile in quantiles.items():
+            # The first bucket per server whose cumulative count passes the quantile's rank
+            reached = cumulative > quantile * (total - 1)
+            first = dfBuckets.loc[reached, 'server'].drop_duplicates()
+            dfStatistics[name] = pd.Series(bucketValues[first.index], index=first.to_numpy())
+        # A bucket's middle can be past the largest sample in it
+        dfStatistics['peak'] = self.peaks[metric]
+        for name in quantiles:
+            dfStatistics[name] = np.minimum(dfStatistics[name], dfStatistics['peak'])
+        return dfStatistics
+
+# Sketch one metric file
+def sketch_file(path, config):
+    sketch = UtilizationSketch(config.sketchAccuracy)
+    samples = 0
+    for dfChunk in read_metric_chunks(path, config):
+        servers = dfChunk[config.metricServer].to_numpy()
+        sketch.add(servers, 'cpu', dfChunk[config.metricCPU])
+        sketch.add(servers, 'memory', dfChunk[config.metricMemory])
+        samples = samples + len(dfChunk)
+    return sketch, samples
+
+# Per-server utilization statistics over every metric file: cpu_p95, cpu_p99, cpu_peak,
+# memory_p95, memory_p99 and memory_peak, indexed by server name.  Files are sketched on a
+# process pool of workers processes, 1 reads them in this process.
+def compute_utilization(paths, config=None, workers=None):
+    if config is None:
+        config = EstimatorConfig()
+    paths = list(paths)
+
+    logger.info("Reading %d metric files....", len(paths))
+    if workers == 1 or len(paths) == 1:
+        results = [sketch_file(path, config) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            largestFirst = sorted(paths, key=os.path.getsize, reverse=True)
+            results = list(pool.map(sketch_file, largestFirst, [config] * len(paths)))
+
+    sketch = UtilizationSketch(config.sketchAccuracy)
+    for fileSketch, samples in results:
+        sketch.merge(fileSketch)
+    logger.info("Sketched %d samples....", sum(samples for fileSketch, samples in results))
+
+    return pd.concat([sketch.statistics('cpu').add_prefix('cpu_'),
+                      sketch.statistics('memory').add_prefix('memory_')], axis=1)
+
+# Size from utilization: return the CMDB with the utilCPU and utilMemory columns added,
+# holding the configured statistics for every server with metrics and the srcCPUUsage and
+# srcMemUsed values for the rest.  The input frame is left untouched.
+def apply_utilization(dfCMDB, dfUtilization, config):
+    dfServer = dfUtilization.reindex(dfCMDB[config.srcServer].astype(str).to_numpy())
+    columns = {}
+    for column, source, statistic in ((config.utilCPU, config.srcCPUUsage, 'cpu_' + config.cpuStatistic),
+                                      (config.utilMemory, config.srcMemUsed, 'memory_' + config.memoryStatistic)):
+        values = dfServer[statistic].to_numpy(dtype=float)
+        measured = ~np.isnan(values)
+        columns[column] = np.where(measured, values, dfCMDB[source].to_numpy(dtype=float))
+    logger.info("Sized %d of %d servers from utilization", int(measured.sum()), len(dfCMDB))
+    return dfCMDB.assign(**columns)
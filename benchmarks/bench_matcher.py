@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+# AWS Batch Cost Estimator - instance matcher benchmark
+#
+# Times the matcher the estimator uses, which collapses rows to their distinct shapes,
+# resolves each shape through the catalog's fit index and broadcasts the answers back,
+# against the per-row while-loop it replaced, at 10k, 100k and 1M CMDB rows.  Every size
+# starts from a fresh catalog, so no shapes are memoized from the run before.  The old loop
+# is far too slow to run at those sizes, so it is timed on a sample of --legacy-rows rows
+# and extrapolated linearly (it does the same amount of work for every row).
+#
+# Usage: python benchmarks/bench_matcher.py [--sizes 10000 100000 1000000] [--legacy-rows 2000]
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from awsbatchestimate.catalog import Catalog
+from awsbatchestimate.config import EstimatorConfig
+from awsbatchestimate.estimator import assign_shapes
+from awsbatchestimate.instancematch import build_fit_index
+
+# A general purpose and a memory optimized list, roughly the shape the pricing API returns
+instanceShapes = {
+    'm': [('m5.large', 2, 8), ('m5.xlarge', 4, 16), ('m5.2xlarge', 8, 32), ('m5.4xlarge', 16, 64),
+          ('m5.8xlarge', 32, 128), ('m5.12xlarge', 48, 192), ('m5.16xlarge', 64, 256),
+          ('m5.24xlarge', 96, 384), ('m6i.large', 2, 8), ('m6i.xlarge', 4, 16),
+          ('m6i.2xlarge', 8, 32), ('m6i.4xlarge', 16, 64), ('m6i.8xlarge', 32, 128),
+          ('m6i.12xlarge', 48, 192), ('m6i.16xlarge', 64, 256), ('m6i.24xlarge', 96, 384),
+          ('m6i.32xlarge', 128, 512)],
+    'r': [('r5.large', 2, 16), ('r5.xlarge', 4, 32), ('r5.2xlarge', 8, 64), ('r5.4xlarge', 16, 128),
+          ('r5.8xlarge', 32, 256), ('r5.12xlarge', 48, 384), ('r5.16xlarge', 64, 512),
+          ('r5.24xlarge', 96, 768), ('r6i.large', 2, 16), ('r6i.xlarge', 4, 32),
+          ('r6i.2xlarge', 8, 64), ('r6i.4xlarge', 16, 128), ('r6i.8xlarge', 32, 256),
+          ('r6i.16xlarge', 64, 512), ('r6i.32xlarge', 128, 1024)],
+}
+
+def instance_list(family):
+    rows = instanceShapes[family]
+    dfInstanceList = pd.DataFrame({
+        'instanceType': [r[0] for r in rows],
+        'memory': [r[2] for r in rows],
+        'family': family,
+        'one_hr_rate': [r[1] * .048 for r in rows],
+        'one_yr_rate': [r[1] * .048 * 8760 * .6 for r in rows],
+        'three_yr_rate': [r[1] * .048 * 8760 * 3 * .4 for r in rows],
+        'vcpu': [r[1] for r in rows]})
+    if family == "r":
+        dfInstanceList = dfInstanceList.sort_values(['memory', 'vcpu'], ascending=[True, True])
+    else:
+        dfInstanceList = dfInstanceList.sort_values(['vcpu', 'memory'], ascending=[True, True])
+    return dfInstanceList.reset_index(drop=True)
+
+# Classified rows of one family, with the match columns as match_ec2 sets them up
+def cmdb(rows, family, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'cores_calc': rng.choice([1, 2, 3, 4, 6, 8, 12, 16, 24, 32, 48, 64, 200], rows).astype(float),
+        'Memory GB': rng.choice([1, 2, 4, 8, 12, 16, 24, 32, 64, 96, 128, 256, 512, 2048], rows).astype(float),
+        'AWS_Region': 'us-east-1',
+        'AWS_OS': 'Linux',
+        'calc_family': family,
+        'ec2_instance_type': pd.Series(np.nan, index=range(rows), dtype=object),
+        'one_hr_rate': np.nan,
+        'one_yr_rate': np.nan,
+        'three_yr_rate': np.nan})
+
+def catalog(family, dfInstanceList_sorted):
+    return Catalog(ec2={('us-east-1', 'Linux', family): (dfInstanceList_sorted, build_fit_index(dfInstanceList_sorted))})
+
+def shape_match(dfCMDB, catalog, config):
+    return assign_shapes(dfCMDB, np.ones(len(dfCMDB), dtype=bool), 'AWS_OS', 'ec2', catalog, config)
+
+# The matching loop as it was before the fit index, kept here only as the baseline
+def legacy_match(dfCMDB, dfInstanceList_sorted, memColumn):
+    for index in dfCMDB.index.tolist():
+        found = False
+        instance = 0
+        while ((not(found)) & (instance < len(dfInstanceList_sorted))):
+            if ((dfInstanceList_sorted.loc[instance, 'memory'] >= dfCMDB.loc[index, memColumn]) and
+                    (dfInstanceList_sorted.loc[instance, 'vcpu'] >= dfCMDB.loc[index, 'cores_calc'])):
+                found = True
+                dfCMDB.loc[index, 'ec2_instance_type'] = dfInstanceList_sorted.loc[instance, 'instanceType']
+                dfCMDB.loc[index, 'one_hr_rate'] = dfInstanceList_sorted.loc[instance, 'one_hr_rate']
+                dfCMDB.loc[index, 'one_yr_rate'] = dfInstanceList_sorted.loc[instance, 'one_yr_rate']
+                dfCMDB.loc[index, 'three_yr_rate'] = dfInstanceList_sorted.loc[instance, 'three_yr_rate']
+            instance = instance + 1
+    return dfCMDB
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the indexed instance matcher.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--legacy-rows', type=int, default=2000,
+                        help='rows to time the old loop on before extrapolating')
+    args = parser.parse_args()
+
+    config = EstimatorConfig()
+    print("%-8s %10s %14s %14s %10s" % ('family', 'rows', 'legacy (s)', 'indexed (s)', 'speedup'))
+    for family in ('m', 'r'):
+        dfInstanceList_sorted = instance_list(family)
+
+        # Check both matchers agree before timing anything
+        sample = cmdb(args.legacy_rows, family, seed=1)
+        expected = legacy_match(sample.copy(), dfInstanceList_sorted, 'Memory GB')
+        actual = shape_match(sample.copy(), catalog(family, dfInstanceList_sorted), config)
+        pd.testing.assert_frame_equal(expected, actual)
+
+        start = time.perf_counter()
+        legacy_match(sample.copy(), dfInstanceList_sorted, 'Memory GB')
+        legacyPerRow = (time.perf_counter() - start) / args.legacy_rows
+
+        for rows in args.sizes:
+            dfCMDB = cmdb(rows, family)
+            rowCatalog = catalog(family, dfInstanceList_sorted)
+            start = time.perf_counter()
+            shape_match(dfCMDB, rowCatalog, config)
+            indexed = time.perf_counter() - start
+            legacy = legacyPerRow * rows
+            print("%-8s %10d %14.1f %14.4f %9.0fx" % (family, rows, legacy, indexed, legacy / indexed))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+
+# AWS Batch Cost Estimator - pipeline benchmark
+#
+# Times every stage of an estimate run and measures its peak memory, without AWS: the
+# input is a synthetic CMDB (synthetic_cmdb.py) and the price lists are served by the local
+# pricing stub (pricing_stub.py) from recorded fixtures (record_fixtures.py), or synthetic
+# price lists (synthetic_pricelist.py) on a checkout where none have been recorded.
+#
+# Stages: read, classify, pricing (catalog build through the stub with an empty cache),
+# ec2 (EC2 matching), rds (RDS matching), ebs (EBS pricing) and write.  Each stage is timed
+# --repeat times and the median kept, then run once more under tracemalloc for its peak
+# allocation.  The estimator's progress output is discarded.
+#
+# The results are JSON with the commit, library versions, machine and parameters, so runs
+# on different commits can be compared with --compare.
+#
+# Usage: python benchmarks/bench_pipeline.py [--rows 100000] [--seed 0] [--repeat 3]
+#                                            [--format csv] [--fixtures FILE]
+#                                            [--output results.json]
+#                                            [--compare baseline.json]
+
+import sys
+import os
+import json
+import time
+import platform
+import argparse
+import resource
+import statistics
+import subprocess
+import tempfile
+import tracemalloc
+import contextlib
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+benchDir = Path(__file__).resolve().parent
+sys.path.insert(0, str(benchDir.parent))
+sys.path.insert(0, str(benchDir))
+from awsbatchestimate.catalog import build_catalog
+from awsbatchestimate.classify import classify_cmdb
+from awsbatchestimate.cmdbio import read_cmdb, write_cmdb
+from awsbatchestimate.config import EstimatorConfig
+from awsbatchestimate.estimator import match_ec2, match_rds, price_storage
+from pricing_stub import defaultFixtures, load_fixtures, start_stub
+from synthetic_cmdb import synthetic_cmdb
+
+stageNames = ['read', 'classify', 'pricing', 'ec2', 'rds', 'ebs', 'write']
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=benchDir, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=benchDir,
+                               capture_output=True, text=True, check=True).stdout.strip() != ''
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+# Time one stage: the median of repeat runs, then one more run under tracemalloc for the
+# peak.  setup() builds a fresh input for every run so stages that modify it in place
+# start from the same state.
+def measure(run, setup, repeat):
+    seconds = []
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(repeat):
+            args = setup()
+            start = time.perf_counter()
+            result = run(*args)
+            seconds.append(time.perf_counter() - start)
+
+        args = setup()
+        tracemalloc.start()
+        try:
+            run(*args)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return result, {'seconds': statistics.median(seconds), 'min': min(seconds),
+                    'peakMB': round(peak / 2 ** 20, 2)}
+
+def benchmark(rows, seed, repeat, fmt, fixtures):
+    # boto3 wants credentials and a region even for the stub
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'benchmark')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'benchmark')
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+    responses = load_fixtures(fixtures)
+    stub = start_stub(responses)
+    stages = {}
+    with tempfile.TemporaryDirectory() as work:
+        work = Path(work)
+        inputPath = work / ('cmdb.' + fmt)
+        outputPath = work / ('aws_bom.' + fmt)
+        dfInput = synthetic_cmdb(rows, seed)
+        if fmt == 'csv':
+            dfInput.to_csv(inputPath, index=False)
+        else:
+            write_cmdb(dfInput, inputPath)
+
+        config = EstimatorConfig(srcMemUsed='Peak Mem Used', cacheDir=str(work / 'cache'),
+                                 refresh=True, pricingEndpoint=stub.endpoint)
+
+        dfCMDB, stages['read'] = measure(read_cmdb, lambda: (inputPath, config.categoricalColumns), repeat)
+        dfCMDB, stages['classify'] = measure(classify_cmdb, lambda: (dfCMDB.copy(), config), repeat)
+        callsBefore = stub.calls
+        catalog, stages['pricing'] = measure(build_catalog, lambda: (config,), repeat)
+        stages['pricing']['apiCalls'] = (stub.calls - callsBefore) // (repeat + 1)
+        dfCMDB, stages['ec2'] = measure(match_ec2, lambda: (dfCMDB.copy(), catalog, config), repeat)
+        dfCMDB, stages['rds'] = measure(match_rds, lambda: (dfCMDB.copy(), catalog, config), repeat)
+        dfCMDB, stages['ebs'] = measure(price_storage, lambda: (dfCMDB.copy(), config), repeat)
+        _, stages['write'] = measure(write_cmdb, lambda: (dfCMDB, outputPath, config.categoricalColumns), repeat)
+    stub.shutdown()
+
+    commit, dirty = git_commit()
+    return {'commit': commit,
+            'dirty': dirty,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'machine': platform.platform() + ' ' + platform.machine() + ' ' + str(os.cpu_count()) + ' CPUs',
+            'rows': rows,
+            'seed': seed,
+            'repeat': repeat,
+            'format': fmt,
+            'fixtures': 'synthetic' if responses is None else str(fixtures or defaultFixtures),
+            'stages': stages,
+            'totalSeconds': sum(stage['seconds'] for stage in stages.values()),
+            'maxRSSMB': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+
+def print_results(results, baseline=None):
+    print("rows " + str(results['rows']) + "  commit " + str(results['commit'])[:12] +
+          (" (dirty)" if results['dirty'] else ""))
+    if baseline:
+        print("baseline commit " + str(baseline['commit'])[:12] + ", rows " + str(baseline['rows']))
+    header = "%-10s %12s %10s" % ('stage', 'seconds', 'peak MB')
+    if baseline:
+        header = header + " %12s %8s" % ('base sec', 'speedup')
+    print(header)
+    # The total line's peak is the process's maximum resident set size
+    for name in stageNames + ['total']:
+        if name == 'total':
+            stage = {'seconds': results['totalSeconds'], 'peakMB': results['maxRSSMB']}
+            base = baseline and {'seconds': baseline['totalSeconds']}
+        else:
+            stage = results['stages'][name]
+            base = baseline and baseline['stages'].get(name)
+        line = "%-10s %12.4f %10.2f" % (name, stage['seconds'], stage['peakMB'])
+        if base:
+            line = line + " %12.4f %7.2fx" % (base['seconds'], base['seconds'] / max(stage['seconds'], 1e-9))
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-stage timing and peak memory of an estimate run.')
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--format', choices=('csv', 'parquet', 'arrow', 'feather'), default='csv')
+    parser.add_argument('--fixtures', default=None,
+                        help='recorded get_products fixtures (default: the recording in benchmarks/fixtures '
+                             'if there is one, otherwise synthetic price lists)')
+    parser.add_argument('--output', default=None, help='write the results as JSON to this file')
+    parser.add_argument('--compare', default=None, help='results JSON of an earlier run to compare with')
+    args = parser.parse_args()
+
+    results = benchmark(args.rows, args.seed, args.repeat, args.format, args.fixtures)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
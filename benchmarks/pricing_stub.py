@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+# AWS Batch Cost Estimator - local pricing API stand-in
+#
+# Serves get_products from a fixture file written by record_fixtures.py, speaking the
+# same JSON protocol as the pricing API so an unmodified boto3 client pointed at it with
+# --pricing-endpoint works.  Pages are cut at MaxResults and continued with NextToken.  A
+# filter set that wasn't recorded gets an empty price list, the same as the real API gives
+# for a query that matches nothing.  Without a recording every query is answered with
+# synthetic price lists (synthetic_pricelist.py), so a fresh checkout needs no AWS.
+#
+# --delay adds latency to every call, and --throttle N answers the first N calls with a
+# ThrottlingException, as the API does when rate limiting.  --drop N closes the connection
+# on the first N calls without answering, as a network blip would.
+#
+# Usage: python benchmarks/pricing_stub.py [--port 8765] [--fixtures FILE] [--delay 0]
+#            [--throttle 0] [--drop 0]
+#        --fixtures defaults to benchmarks/fixtures/get_products.json.gz, or synthetic
+#        price lists if that hasn't been recorded
+#
+# Point the estimator at it with --pricing-endpoint http://127.0.0.1:8765.  boto3 still
+# wants credentials and a region, any values will do.
+
+import sys
+import gzip
+import json
+import time
+import argparse
+import threading
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from awsbatchestimate.pricing import price_list_key
+from synthetic_pricelist import synthetic_price_list
+
+defaultFixtures = Path(__file__).resolve().parent / 'fixtures' / 'get_products.json.gz'
+
+# Fixture responses from a recorded file.  With no path, the default recording if there is
+# one, and None otherwise for a stub that serves synthetic price lists.
+def load_fixtures(path=None):
+    if path is None:
+        if not defaultFixtures.exists():
+            return None
+        path = defaultFixtures
+    if not Path(path).exists():
+        raise FileNotFoundError("No get_products fixtures at " + str(path) +
+                                ", record them with benchmarks/record_fixtures.py")
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)['responses']
+
+class PricingStubHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/x-amz-json-1.1')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        target = self.headers.get('X-Amz-Target', '')
+        if not target.endswith('.GetProducts'):
+            self.send_body(400, {'__type': 'InvalidParameterException', 'message': 'Unsupported ' + target})
+            return
+
+        with self.server.lock:
+            self.server.calls = self.server.calls + 1
+            dropped = self.server.calls <= self.server.drop
+            throttled = self.server.calls <= self.server.throttle
+        if dropped:
+            self.close_connection = True
+            return
+        if throttled:
+            self.send_body(400, {'__type': 'ThrottlingException', 'message': 'Rate exceeded'})
+            return
+        if self.server.delay:
+            time.sleep(self.server.delay)
+
+        if self.server.fixtures is None:
+            items = synthetic_price_list(request['ServiceCode'], request.get('Filters', []))
+        else:
+            items = self.server.fixtures.get(price_list_key(request['ServiceCode'], request.get('Filters', [])), [])
+        start = int(request.get('NextToken') or 0)
+        end = start + int(request.get('MaxResults', 100))
+        response = {'FormatVersion': 'aws_v1', 'PriceList': items[start:end]}
+        if end < len(items):
+            response['NextToken'] = str(end)
+        self.send_body(200, response)
+
+class PricingStub(ThreadingHTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self, address, fixtures, delay=0, throttle=0, drop=0):
+        super().__init__(address, PricingStubHandler)
+        self.fixtures = fixtures
+        self.delay = delay
+        self.throttle = throttle
+        self.drop = drop
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    @property
+    def endpoint(self):
+        return 'http://' + self.server_address[0] + ':' + str(self.server_address[1])
+
+# Start a stub on a free local port in a background thread, for benchmarks in the same
+# process or tests.  Call shutdown() on the result when done.
+def start_stub(fixtures, delay=0, throttle=0, drop=0):
+    stub = PricingStub(('127.0.0.1', 0), fixtures, delay, throttle, drop)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    return stub
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve recorded get_products fixtures.')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--fixtures', default=None,
+                        help='recorded fixture file (default: ' + str(defaultFixtures) + ' if recorded, '
+                             'otherwise synthetic price lists)')
+    parser.add_argument('--delay', type=float, default=0, help='seconds added to every call')
+    parser.add_argument('--throttle', type=int, default=0, help='calls to throttle before serving any')
+    parser.add_argument('--drop', type=int, default=0, help='calls to drop the connection on before serving any')
+    args = parser.parse_args()
+
+    stub = PricingStub(('127.0.0.1', args.port), load_fixtures(args.fixtures), args.delay, args.throttle,
+                       args.drop)
+    print("Serving get_products on " + stub.endpoint + "....")
+    try:
+        stub.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+# AWS Batch Cost Estimator - record get_products fixtures
+#
+# Records the full get_products price list for every catalog query into one gzipped JSON
+# fixture file, keyed the same way as the price list cache.  pricing_stub.py serves the
+# file back as a local stand-in for the pricing API, so benchmarks and end to end runs
+# don't need AWS.  Record once from the live pricing API (needs credentials), or from the
+# price list cache of an earlier run with --from-cache.
+#
+# Usage: python benchmarks/record_fixtures.py
+#            [--output benchmarks/fixtures/get_products.json.gz]
+#            [--from-cache ~/.cache/awsbatchestimate]
+
+import sys
+import gzip
+import json
+import time
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from awsbatchestimate.catalog import ec2_queries, rds_queries
+from awsbatchestimate.config import EstimatorConfig
+from awsbatchestimate.pricing import PriceListSource, price_list_key
+
+defaultFixtures = Path(__file__).resolve().parent / 'fixtures' / 'get_products.json.gz'
+
+def record(config, source):
+    responses = {}
+    for serviceCode, queries in (('AmazonEC2', ec2_queries(config)), ('AmazonRDS', rds_queries(config))):
+        priceLists = source.get_price_lists(serviceCode, queries)
+        for name, filters in queries.items():
+            responses[price_list_key(serviceCode, filters)] = priceLists[name]
+    return responses
+
+def main():
+    parser = argparse.ArgumentParser(description='Record get_products responses for the catalog queries.')
+    parser.add_argument('--output', default=str(defaultFixtures))
+    parser.add_argument('--from-cache', default=None, metavar='CACHE_DIR',
+                        help='record from this price list cache instead of the pricing API')
+    parser.add_argument('--pricing-endpoint', default=None)
+    args = parser.parse_args()
+
+    if args.from_cache:
+        config = EstimatorConfig(cacheDir=args.from_cache, offline=True)
+        recordedFrom = 'cache'
+    else:
+        # Never serve a recording from the cache, always go to the API
+        config = EstimatorConfig(refresh=True, pricingEndpoint=args.pricing_endpoint)
+        recordedFrom = args.pricing_endpoint or 'pricing API'
+    responses = record(config, PriceListSource(config))
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with gzip.open(output, 'wt', encoding='utf-8') as f:
+        json.dump({'recordedAt': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                   'recordedFrom': recordedFrom,
+                   'responses': responses}, f)
+    print("Recorded " + str(len(responses)) + " queries, " +
+          str(sum(len(items) for items in responses.values())) + " products to " + str(output))
+
+if __name__ == '__main__':
+    main()
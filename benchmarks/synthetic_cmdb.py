@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+# AWS Batch Cost Estimator - synthetic CMDB generator
+#
+# Writes a CMDB export of any size with the columns the estimator reads and roughly the
+# mix a data center inventory has: mostly small servers, memory tracking core count at a
+# few GB per core, lightly used CPUs, a production heavy environment split, Windows and a
+# spread of Linux distributions, a minority of database hosts and storage with a long
+# tail.  The same seed always gives the same file, so benchmark runs are comparable.
+#
+# Usage: python benchmarks/synthetic_cmdb.py ROWS OUTPUT [--seed 0]
+#        OUTPUT can be .csv, .parquet, .arrow or .feather
+
+import sys
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from awsbatchestimate.cmdbio import write_cmdb
+
+def weighted(rng, choices, rows):
+    values = [c[0] for c in choices]
+    weights = np.array([c[1] for c in choices], dtype=float)
+    return rng.choice(np.array(values, dtype=object), rows, p=weights / weights.sum())
+
+def synthetic_cmdb(rows, seed=0):
+    rng = np.random.default_rng(seed)
+
+    vcpu = weighted(rng, [(1, 6), (2, 30), (4, 30), (8, 18), (16, 9), (24, 2), (32, 3), (48, 1), (64, 1)], rows).astype(int)
+    gbPerCore = weighted(rng, [(1, 5), (2, 25), (4, 40), (8, 25), (16, 5)], rows).astype(float)
+    memory = vcpu * gbPerCore
+    # Some inventories don't have memory for every server
+    memory[rng.random(rows) < .02] = 0
+
+    # Mostly idle with a tail of busy servers
+    cpuUsage = rng.beta(1.6, 4, rows).round(2)
+    # Peak memory used is a share of what is provisioned
+    memUsed = (memory * rng.uniform(.4, 1, rows)).round(0)
+
+    environment = weighted(rng, [('Prod', 45), ('Dev', 20), ('QA', 10), ('Test', 10), ('UAT', 8), ('DR', 7)], rows)
+    location = weighted(rng, [('US', 60), ('EU', 25), ('AP', 12), ('', 3)], rows)
+
+    windows = rng.random(rows) < .45
+    platform = np.where(windows, 'Windows', 'Linux')
+    osVer = np.where(windows,
+                     weighted(rng, [('Windows 2012 R2', 35), ('Windows 2016', 40), ('Windows 2019', 25)], rows),
+                     weighted(rng, [('RHEL 7', 40), ('Red Hat 6', 10), ('RED HAT 8', 10), ('CentOS 7', 20),
+                                    ('SLES 12', 10), ('Ubuntu 18.04', 10)], rows))
+
+    # About one server in six hosts databases
+    database = rng.random(rows) < .17
+    dbInstances = np.where(database, weighted(rng, [('1', 80), ('2', 15), ('4', 5)], rows), '')
+    dbRelease = np.where(database,
+                         weighted(rng, [('Oracle 12c', 35), ('Oracle 19c', 15), ('SQL Server 2016', 30),
+                                        ('MySQL 5.7', 12), ('Postgres 11', 8)], rows),
+                         '')
+
+    storage = np.clip(rng.lognormal(5.3, 1.1, rows), 20, 20000).round(0).astype(int)
+
+    return pd.DataFrame({
+        'Server': ['srv' + str(i).zfill(7) for i in range(rows)],
+        'vCPU': vcpu,
+        'cpuUsage': cpuUsage,
+        'Memory GB': memory,
+        'Environment': environment,
+        'Location': location,
+        'Platform': platform,
+        'OS Ver': osVer,
+        'RDS_Instances': dbInstances,
+        'DB Rel/Ver': dbRelease,
+        'Total File System  in GB': storage,
+        'Peak Mem Used': memUsed,
+    })
+
+def main():
+    parser = argparse.ArgumentParser(description='Write a synthetic CMDB export.')
+    parser.add_argument('rows', type=int)
+    parser.add_argument('output')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    dfCMDB = synthetic_cmdb(args.rows, args.seed)
+    if args.output.endswith('.csv'):
+        dfCMDB.to_csv(args.output, index=False)
+    else:
+        write_cmdb(dfCMDB, args.output)
+
+if __name__ == '__main__':
+    main()
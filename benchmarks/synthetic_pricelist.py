@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+
+# AWS Batch Cost Estimator - synthetic get_products price lists
+#
+# Builds get_products PriceList items for any catalog query without AWS, in the same JSON
+# layout the pricing API returns: product attributes, an OnDemand term and standard
+# Reserved terms for 1 and 3 years All Upfront and 1 year Partial Upfront, found by their
+# termAttributes.  Every general purpose, compute and memory optimized query gets a few
+# generations of instance types, including ones the catalog filters out (t2, m4, the 'a',
+# 'd' and 'e' variants), so the parser's filtering and the matchers see realistic lists.
+#
+# Prices are worked out from vCPUs and memory, with newer generations a little cheaper and
+# Windows, RHEL and licensed database engines dearer, so the cheapest fit policies have
+# real choices to make.  The same query always gives the same items.
+#
+# pricing_stub.py serves these when no recorded fixture file exists.
+#
+# Usage: python benchmarks/synthetic_pricelist.py [--output FILE] writes them as a fixture
+#        file for every query of the full catalog.
+
+import sys
+import gzip
+import json
+import hashlib
+import time
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from awsbatchestimate.catalog import ec2_queries, rds_queries
+from awsbatchestimate.config import EstimatorConfig
+from awsbatchestimate.pricing import price_list_key
+
+# (instance type, vCPU, memory GiB) by pricing API instance family
+ec2Shapes = {
+    'General purpose': [('t2.micro', 1, 1), ('t2.large', 2, 8), ('t3.medium', 2, 4), ('t3.xlarge', 4, 16),
+                        ('m4.large', 2, 8), ('m4.4xlarge', 16, 64), ('m5.large', 2, 8), ('m5.xlarge', 4, 16),
+                        ('m5.2xlarge', 8, 32), ('m5.4xlarge', 16, 64), ('m5.8xlarge', 32, 128),
+                        ('m5.12xlarge', 48, 192), ('m5.16xlarge', 64, 256), ('m5.24xlarge', 96, 384),
+                        ('m5a.large', 2, 8), ('m5d.xlarge', 4, 16), ('m6i.large', 2, 8), ('m6i.xlarge', 4, 16),
+                        ('m6i.2xlarge', 8, 32), ('m6i.4xlarge', 16, 64), ('m6i.8xlarge', 32, 128),
+                        ('m6i.16xlarge', 64, 256), ('m6i.32xlarge', 128, 512)],
+    'Compute optimized': [('c4.large', 2, 3.75), ('c4.2xlarge', 8, 15), ('c5.large', 2, 4), ('c5.xlarge', 4, 8),
+                          ('c5.2xlarge', 8, 16), ('c5.4xlarge', 16, 32), ('c5.9xlarge', 36, 72),
+                          ('c5.18xlarge', 72, 144), ('c5d.large', 2, 4), ('c6i.large', 2, 4),
+                          ('c6i.2xlarge', 8, 16), ('c6i.8xlarge', 32, 64), ('c6i.32xlarge', 128, 256)],
+    'Memory optimized': [('r4.large', 2, 15.25), ('r4.4xlarge', 16, 122), ('r5.large', 2, 16), ('r5.xlarge', 4, 32),
+                         ('r5.2xlarge', 8, 64), ('r5.4xlarge', 16, 128), ('r5.8xlarge', 32, 256),
+                         ('r5.12xlarge', 48, 384), ('r5.24xlarge', 96, 768), ('r5a.large', 2, 16),
+                         ('r6i.large', 2, 16), ('r6i.4xlarge', 16, 128), ('r6i.32xlarge', 128, 1024),
+                         ('x1e.xlarge', 4, 122)],
+}
+
+rdsShapes = {
+    'General purpose': [('db.m5.large', 2, 8), ('db.m5.xlarge', 4, 16), ('db.m5.2xlarge', 8, 32),
+                        ('db.m5.4xlarge', 16, 64), ('db.m5.12xlarge', 48, 192), ('db.m5.24xlarge', 96, 384),
+                        ('db.m6i.large', 2, 8), ('db.m6i.8xlarge', 32, 128)],
+    'Memory optimized': [('db.r5.large', 2, 16), ('db.r5.xlarge', 4, 32), ('db.r5.2xlarge', 8, 64),
+                         ('db.r5.4xlarge', 16, 128), ('db.r5.8xlarge', 32, 256), ('db.r5.12xlarge', 48, 384),
+                         ('db.r5.24xlarge', 96, 768), ('db.r6i.large', 2, 16), ('db.r6i.16xlarge', 64, 512)],
+}
+
+# Price multiplier by generation, the first digit of the type
+generationDiscount = {'2': 1.1, '3': 1.05, '4': 1.1, '5': 1.0, '6': .95}
+
+# Price multiplier for operating systems and engines that carry a license
+licensePremium = {'Windows': 1.8, 'RHEL': 1.3, 'SUSE': 1.2, 'SLES': 1.2, 'Oracle': 2.5, 'SQL Server': 2.2}
+
+def on_demand_rate(instanceType, vcpu, memory, attributes):
+    generation = instanceType.replace('db.', '').lstrip('abcdefghijklmnopqrstuvwxyz')[:1]
+    rate = (vcpu * .04 + memory * .005) * generationDiscount.get(generation, 1)
+    for name in (attributes.get('operatingSystem'), attributes.get('databaseEngine')):
+        rate = rate * licensePremium.get(name, 1)
+    return rate
+
+def price_dimension(sku, termCode, unit, usd, description):
+    rateCode = sku + '.' + termCode + '.' + ('6YS6EN2CT7' if unit == 'Hrs' else '2TG2D8R56U')
+    return rateCode, {'unit': unit, 'endRange': 'Inf', 'description': description, 'appliesTo': [],
+                      'rateCode': rateCode, 'beginRange': '0', 'pricePerUnit': {'USD': '%.7f' % usd}}
+
+def term(sku, termCode, dimensions, termAttributes):
+    return sku + '.' + termCode, {'priceDimensions': dict(dimensions), 'sku': sku,
+                                  'effectiveDate': '2020-01-01T00:00:00Z', 'offerTermCode': termCode,
+                                  'termAttributes': termAttributes}
+
+# One PriceList item, as the JSON text the API returns
+def price_list_item(serviceCode, attributes, instanceType, vcpu, memory):
+    sku = hashlib.blake2b((serviceCode + json.dumps(attributes, sort_keys=True) + instanceType).encode('utf-8'),
+                          digest_size=8).hexdigest().upper()
+    hourly = on_demand_rate(instanceType, vcpu, memory, attributes)
+
+    onDemand = [term(sku, 'JRTCKXETXF', [price_dimension(sku, 'JRTCKXETXF', 'Hrs', hourly, 'On demand')], {})]
+    reserved = []
+    for termCode, lease, purchaseOption, upfront, hours in (('6QCMYABX3D', '1yr', 'All Upfront', .6, 0),
+                                                             ('NQ3QZPMQV9', '3yr', 'All Upfront', 1.2, 0),
+                                                             ('HU7G6KETJZ', '1yr', 'Partial Upfront', .3, .3)):
+        dimensions = [price_dimension(sku, termCode, 'Quantity', hourly * 8760 * upfront, 'Upfront Fee'),
+                      price_dimension(sku, termCode, 'Hrs', hourly * hours, 'hourly')]
+        reserved.append(term(sku, termCode, dimensions, {'LeaseContractLength': lease, 'OfferingClass': 'standard',
+                                                         'PurchaseOption': purchaseOption}))
+
+    productAttributes = dict(attributes)
+    productAttributes.update({'instanceType': instanceType, 'vcpu': str(vcpu), 'memory': '%g GiB' % memory})
+    return json.dumps({'product': {'productFamily': 'Compute Instance' if serviceCode == 'AmazonEC2'
+                                                    else 'Database Instance',
+                                   'attributes': productAttributes, 'sku': sku},
+                       'serviceCode': serviceCode,
+                       'terms': {'OnDemand': dict(onDemand), 'Reserved': dict(reserved)},
+                       'version': '20200101000000', 'publicationDate': '2020-01-01T00:00:00Z'})
+
+# PriceList items for one get_products query.  Every item carries the filtered attributes,
+# so it matches the query the way the API's would.
+def synthetic_price_list(serviceCode, filters):
+    attributes = {f['Field']: f['Value'] for f in filters}
+    shapes = ec2Shapes if serviceCode == 'AmazonEC2' else rdsShapes
+    return [price_list_item(serviceCode, attributes, instanceType, vcpu, memory)
+            for instanceType, vcpu, memory in shapes.get(attributes.get('instanceFamily'), [])]
+
+# Fixture responses, keyed like the price list cache, for every query of the full catalog
+def synthetic_fixtures(config=None):
+    config = config or EstimatorConfig()
+    responses = {}
+    for serviceCode, queries in (('AmazonEC2', ec2_queries(config)), ('AmazonRDS', rds_queries(config))):
+        for filters in queries.values():
+            responses[price_list_key(serviceCode, filters)] = synthetic_price_list(serviceCode, filters)
+    return responses
+
+def main():
+    parser = argparse.ArgumentParser(description='Write synthetic get_products fixtures for the full catalog.')
+    parser.add_argument('--output', default=str(Path(__file__).resolve().parent / 'fixtures' /
+                                                'get_products.json.gz'))
+    args = parser.parse_args()
+
+    responses = synthetic_fixtures()
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with gzip.open(output, 'wt', encoding='utf-8') as f:
+        json.dump({'recordedAt': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                   'recordedFrom': 'synthetic',
+                   'responses': responses}, f)
+    print("Wrote " + str(len(responses)) + " queries, " +
+          str(sum(len(items) for items in responses.values())) + " products to " + str(output))
+
+if __name__ == '__main__':
+    main()
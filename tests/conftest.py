@@ -0,0 +1,38 @@
+# Shared test fixtures.  The benchmark helpers (pricing stub, synthetic CMDB) double as test
+# fixtures, so the benchmarks directory is put on the path the same way the benchmarks do it.
+
+import sys
+from pathlib import Path
+
+import pytest
+
+from awsbatchestimate.catalog import build_catalog
+from awsbatchestimate.config import EstimatorConfig
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'benchmarks'))
+from synthetic_pricelist import synthetic_price_list
+
+# Price list source answering every query with synthetic price lists, without HTTP
+class SyntheticSource:
+
+    def __init__(self):
+        self.queries = 0
+
+    def price_lists(self, serviceCode, queries):
+        self.queries = self.queries + len(queries)
+        return {name: synthetic_price_list(serviceCode, filters) for name, filters in queries.items()}
+
+# The full catalog of the default config, priced from synthetic price lists.  Tests must
+# not modify it.
+@pytest.fixture(scope='session')
+def catalog():
+    return build_catalog(EstimatorConfig(), SyntheticSource())
+
+# boto3 wants credentials and a region even for a local stub
+@pytest.fixture
+def aws_credentials(monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'test')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'test')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    monkeypatch.delenv('AWS_ENDPOINT_URL_PRICING', raising=False)
+    monkeypatch.delenv('AWS_ENDPOINT_URL', raising=False)
@@ -0,0 +1,62 @@
+# Tests for batch mode: every output must be what estimating its file alone gives, and the
+# rollup must add up
+
+import pandas as pd
+import pytest
+
+from awsbatchestimate.batch import batch_inputs, estimate_batch
+from awsbatchestimate.catalogfile import save_catalog
+from awsbatchestimate.classify import input_columns
+from awsbatchestimate.cmdbio import read_cmdb, write_cmdb
+from awsbatchestimate.config import EstimatorConfig
+from awsbatchestimate.estimator import estimate, summarize_estimate
+from synthetic_cmdb import synthetic_cmdb
+
+config = EstimatorConfig(srcMemUsed='Peak Mem Used')
+
+@pytest.fixture
+def inputs(tmp_path):
+    inputDir = tmp_path / 'input'
+    inputDir.mkdir()
+    synthetic_cmdb(300, seed=21).to_csv(inputDir / 'finance.csv', index=False)
+    synthetic_cmdb(120, seed=22).to_csv(inputDir / 'hr.csv', index=False)
+    synthetic_cmdb(500, seed=23).to_parquet(inputDir / 'retail.parquet', index=False)
+    (inputDir / 'notes.txt').write_text('not a CMDB')
+    return inputDir
+
+def test_inputs_from_a_directory_or_manifest(tmp_path, inputs):
+    assert [path.name for path in batch_inputs(inputs)] == ['finance.csv', 'hr.csv', 'retail.parquet']
+
+    (tmp_path / 'manifest.txt').write_text("# business units\ninput/retail.parquet\n\n" +
+                                           str(inputs / 'hr.csv') + "  # absolute\n")
+    assert batch_inputs(tmp_path / 'manifest.txt') == [tmp_path / 'input' / 'retail.parquet', inputs / 'hr.csv']
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_outputs_equal_single_estimates(tmp_path, inputs, catalog, workers):
+    # The pool gets a catalog file, the way the command line passes it on
+    catalogPath = tmp_path / 'catalog'
+    save_catalog(catalog, catalogPath)
+    dfRollup = estimate_batch(batch_inputs(inputs), tmp_path / 'output', str(catalogPath) if workers > 1 else catalog,
+                              config, workers)
+
+    for position, inputPath in enumerate(batch_inputs(inputs)):
+        dfEstimate = estimate(read_cmdb(inputPath, config.categoricalColumns, input_columns(config)), catalog, config)
+        outputPath = tmp_path / 'output' / (inputPath.stem + '_aws_bom' + inputPath.suffix)
+        expectedPath = tmp_path / ('expected' + inputPath.suffix)
+        write_cmdb(dfEstimate, expectedPath, config.categoricalColumns)
+        if inputPath.suffix == '.csv':
+            assert outputPath.read_bytes() == expectedPath.read_bytes()
+        else:
+            pd.testing.assert_frame_equal(read_cmdb(outputPath), read_cmdb(expectedPath))
+
+        row = dfRollup.iloc[position]
+        assert row['input'] == str(inputPath) and row['output'] == str(outputPath)
+        for name, value in summarize_estimate(dfEstimate, config).items():
+            assert row[name] == pytest.approx(value), name
+        assert row['ebs_month_total'] == pytest.approx(dfEstimate['ebs_month_rate'].sum())
+
+    total = dfRollup.iloc[-1]
+    assert total['input'] == 'TOTAL' and len(dfRollup) == 4
+    for column in dfRollup.columns[2:]:
+        assert total[column] == pytest.approx(dfRollup[column].iloc[:-1].sum()), column
+    assert total['servers'] == 920
@@ -0,0 +1,33 @@
+# Tests for building the price catalog
+
+from awsbatchestimate.catalog import build_catalog, full_plan
+from awsbatchestimate.config import EstimatorConfig
+from pricing_stub import load_fixtures, start_stub
+
+def test_catalog_through_the_stub_without_recorded_fixtures(tmp_path, aws_credentials):
+    stub = start_stub(None)
+    try:
+        config = EstimatorConfig(cacheDir=str(tmp_path / 'cache'), pricingEndpoint=stub.endpoint)
+        catalog = build_catalog(config)
+    finally:
+        stub.shutdown()
+        stub.server_close()
+
+    plan = full_plan(config)
+    assert sorted(catalog.ec2) == sorted(plan.ec2)
+    assert sorted(catalog.rds) == sorted(plan.rds)
+    assert all(len(dfInstanceList) > 0 for dfInstanceList, fitIndex in catalog.ec2.values())
+    assert all(len(dfInstanceList) > 0 for dfInstanceList, fitIndex in catalog.rds.values())
+
+def test_skipped_instance_types_are_left_out(catalog):
+    config = EstimatorConfig()
+    for dfInstanceList, fitIndex in catalog.ec2.values():
+        for instanceType in dfInstanceList['instanceType']:
+            assert instanceType[0:2] not in config.skipGenerations
+            assert instanceType[2:3] not in config.skipVariants
+
+def test_load_fixtures_without_a_recording_is_synthetic(monkeypatch, tmp_path):
+    import pricing_stub
+
+    monkeypatch.setattr(pricing_stub, 'defaultFixtures', tmp_path / 'missing.json.gz')
+    assert load_fixtures() is None
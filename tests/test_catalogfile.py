@@ -0,0 +1,101 @@
+# Tests for binary catalog files
+
+import os
+import threading
+
+import pandas as pd
+import pytest
+
+from awsbatchestimate.catalog import Catalog
+from awsbatchestimate.catalogfile import load_catalog, save_catalog
+from awsbatchestimate.config import EstimatorConfig
+from awsbatchestimate.estimator import estimate
+from synthetic_cmdb import synthetic_cmdb
+
+def test_round_trip(tmp_path, catalog):
+    save_catalog(catalog, tmp_path / 'catalog')
+    loaded = load_catalog(tmp_path / 'catalog')
+
+    for built, saved in ((catalog.ec2, loaded.ec2), (catalog.rds, loaded.rds)):
+        assert list(saved) == list(built)
+        for key, (dfInstanceList, fitIndex) in built.items():
+            pd.testing.assert_frame_equal(saved[key][0], dfInstanceList[saved[key][0].columns], check_dtype=False)
+
+    config = EstimatorConfig(srcMemUsed='Peak Mem Used', matchPolicy='cheapest-any')
+    dfCMDB = synthetic_cmdb(300, seed=31)
+    pd.testing.assert_frame_equal(estimate(dfCMDB, loaded, config), estimate(dfCMDB, catalog, config))
+
+def test_numeric_columns_stay_on_the_map(tmp_path, catalog):
+    save_catalog(catalog, tmp_path / 'catalog')
+    dfInstanceList = next(iter(load_catalog(tmp_path / 'catalog').ec2.values()))[0]
+
+    # Views on the read-only map, not copies
+    for column in ('vcpu', 'memory', 'one_hr_rate', 'one_yr_rate', 'three_yr_rate'):
+        assert not dfInstanceList[column].to_numpy().flags.writeable, column
+
+# Without symlinks (Windows without the privilege) the path is a file naming the version
+@pytest.fixture(params=['link', 'pointer'])
+def links(request, monkeypatch):
+    if request.param == 'pointer':
+        def symlink(*args, **kwargs):
+            raise OSError("symbolic link privilege not held")
+        monkeypatch.setattr(os, 'symlink', symlink)
+    return request.param
+
+def test_saving_over_a_catalog_is_atomic(tmp_path, catalog, links):
+    path = tmp_path / 'catalog'
+    small = Catalog(ec2=dict(list(catalog.ec2.items())[:2]))
+    save_catalog(small, path)
+
+    failures = []
+    sizes = set()
+    done = threading.Event()
+
+    def read():
+        while not done.is_set():
+            try:
+                sizes.add(len(load_catalog(path).ec2))
+            except Exception as e:
+                failures.append(e)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    try:
+        for i in range(30):
+            save_catalog(catalog if i % 2 else small, path)
+    finally:
+        done.set()
+        reader.join()
+
+    assert failures == []
+    assert sizes <= {2, len(catalog.ec2)}
+    # The current version and the one before it are kept, nothing older
+    assert len(list(tmp_path.glob('catalog.v*'))) == 2
+    assert len(load_catalog(path).ec2) == len(catalog.ec2)
+    assert path.is_symlink() if links == 'link' else path.is_file()
+
+def test_replaces_an_unversioned_catalog(tmp_path, catalog):
+    path = tmp_path / 'catalog'
+    save_catalog(catalog, path)
+    version = path.resolve()
+    path.unlink()
+    version.rename(path)
+
+    save_catalog(Catalog(ec2=dict(list(catalog.ec2.items())[:1])), path)
+    assert path.is_symlink() and len(load_catalog(path).ec2) == 1
+
+def test_pointer_file_and_link_replace_each_other(tmp_path, catalog, monkeypatch):
+    def symlink(*args, **kwargs):
+        raise NotImplementedError()
+
+    path = tmp_path / 'catalog'
+    with monkeypatch.context() as patched:
+        patched.setattr(os, 'symlink', symlink)
+        save_catalog(Catalog(ec2=dict(list(catalog.ec2.items())[:1])), path)
+    assert path.is_file() and (tmp_path / path.read_text() / 'groups.npy').exists()
+    assert len(load_catalog(path).ec2) == 1
+
+    save_catalog(Catalog(ec2=dict(list(catalog.ec2.items())[:3])), path)
+    assert path.is_symlink() and len(load_catalog(path).ec2) == 3
+    # The pointer file's version is kept as the previous one
+    assert len(list(tmp_path.glob('catalog.v*'))) == 2
@@ -0,0 +1,122 @@
+# Tests for the vectorized CMDB classification, against the per-row .loc loops it replaced
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from awsbatchestimate.classify import classify_cmdb, map_databases, map_regions
+from awsbatchestimate.config import EstimatorConfig
+
+# A CMDB export as read from CSV: blank and zero database instance counts, Locations that
+# aren't mapped, mixed case platforms and OS versions, and servers with no used memory
+cmdbText = """\
+vCPU,cpuUsage,Memory GB,Peak Mem Used,Environment,Location,Platform,OS Ver,RDS_Instances,DB Rel/Ver,Total File System  in GB
+2,0.5,8,6,Prod,US,Windows 2016,Windows 2016,,,100
+4,0.25,16,0,Dev,EU,Linux,RHEL 7,0,Oracle 12c,250
+8,0.9,64,48,Prod,AP,Linux,Red Hat 6,1,Oracle 19c,500
+1,0.1,2,2,QA,,linux,rhel 7,2,SQL Server 2016,50
+16,0.75,128,0,Test,LATAM,LINUX,RED HAT 8,1,MySQL 5.7,1000
+2,0.05,4,4,UAT,eu,windows,Windows 2012 R2,,SQL Server 2014,20
+32,0.6,96,90,PreProd-Test,EU,Linux x86,CentOS 7,4,Postgres 11,2000
+4,1.0,4,0,Dev,Unknown DC,AIX,AIX 7.1,0,,80
+64,0.3,512,400,Prod,AP,Red Hat Linux,SLES 12,1,SQL 2008,300
+8,0.2,16,16,Test,US,Windows,Windows 2019,,Oracle,40
+"""
+
+def read_cmdb_text(tmp_path):
+    path = tmp_path / 'cmdb.csv'
+    path.write_text(cmdbText)
+    return pd.read_csv(path, keep_default_na=False)
+
+# The classification loops as they were before vectorizing, kept here only as the reference
+def legacy_classify(dfCMDB, config):
+    dfCMDB['RDS'] = False
+    dfDBServers = dfCMDB[dfCMDB[config.srcDbInstanceCount] != ""]
+    dfDBServers = dfDBServers[dfDBServers[config.srcDbInstanceCount] != "0"]
+    for row in dfDBServers.index.tolist():
+        dfCMDB.loc[row, 'RDS'] = True
+
+    dfCMDB['cores_calc'] = (dfCMDB[config.srcCores] * dfCMDB[config.srcCPUUsage]) + .51
+    dfCMDB['cores_calc'] = dfCMDB['cores_calc'].round(decimals=0)
+
+    for index in dfCMDB.index.tolist():
+        if dfCMDB.loc[index, config.srcMemUsed] == 0:
+            dfCMDB.loc[index, config.srcMemUsed] = dfCMDB.loc[index, config.srcMemProvisioned]
+
+    dfCMDB['calc_family'] = ""
+    dfCMDB['mem_cpu_ratio'] = dfCMDB[config.srcMemUsed] / dfCMDB['cores_calc']
+    for index in dfCMDB.index.tolist():
+        if ((dfCMDB.loc[index, 'cores_calc'] <= 8) and (dfCMDB.loc[index, config.srcMemUsed] <= 32)
+                and (config.DEV in dfCMDB.loc[index, config.srcEnv]
+                     or config.QA in dfCMDB.loc[index, config.srcEnv]
+                     or config.TEST in dfCMDB.loc[index, config.srcEnv])):
+            dfCMDB.loc[index, 'calc_family'] = "t"
+        elif dfCMDB.loc[index, 'mem_cpu_ratio'] < 3.5:
+            dfCMDB.loc[index, 'calc_family'] = "c"
+        elif dfCMDB.loc[index, 'mem_cpu_ratio'] > 4.5:
+            dfCMDB.loc[index, 'calc_family'] = "r"
+        else:
+            dfCMDB.loc[index, 'calc_family'] = "m"
+
+    dfCMDB['AWS_Region'] = ""
+    for index in dfCMDB.index.tolist():
+        if dfCMDB.loc[index, config.srcRegion] == config.srcASIA:
+            dfCMDB.loc[index, 'AWS_Region'] = config.awsASIA
+        elif dfCMDB.loc[index, config.srcRegion] == config.srcEU:
+            dfCMDB.loc[index, 'AWS_Region'] = config.awsEU
+        else:
+            dfCMDB.loc[index, 'AWS_Region'] = config.awsDFLT
+
+    dfCMDB['AWS_OS'] = ""
+    for index in dfCMDB.index.tolist():
+        if "Windows" in dfCMDB.loc[index, config.srcOS]:
+            dfCMDB.loc[index, 'AWS_OS'] = config.awsWindows
+        elif "Linux" in dfCMDB.loc[index, config.srcOS]:
+            if ("RHEL" in dfCMDB.loc[index, config.srcOSVer] or
+                    "Red" in dfCMDB.loc[index, config.srcOSVer] or
+                    "RED" in dfCMDB.loc[index, config.srcOSVer]):
+                dfCMDB.loc[index, 'AWS_OS'] = config.awsRHEL
+            else:
+                dfCMDB.loc[index, 'AWS_OS'] = config.awsDefault
+        else:
+            dfCMDB.loc[index, 'AWS_OS'] = config.awsDefault
+
+    dfCMDB['AWS_DB'] = ""
+    for row in dfCMDB[dfCMDB.RDS == True].index.tolist():
+        if config.srcOracle in dfCMDB.loc[row, config.srcDB]:
+            dfCMDB.loc[row, 'AWS_DB'] = config.awsOracle
+        elif config.srcSQLServer in dfCMDB.loc[row, config.srcDB]:
+            dfCMDB.loc[row, 'AWS_DB'] = config.awsSQLServer
+        else:
+            dfCMDB.loc[row, 'AWS_DB'] = config.awsAurora
+
+    return dfCMDB
+
+@pytest.mark.parametrize('srcMemUsed', ['Memory GB', 'Peak Mem Used'])
+def test_classify_matches_legacy_loops(tmp_path, srcMemUsed):
+    config = EstimatorConfig(srcMemUsed=srcMemUsed)
+    dfCMDB = read_cmdb_text(tmp_path)
+
+    expected = legacy_classify(dfCMDB.copy(), config)
+    actual = map_databases(classify_cmdb(dfCMDB.copy(), config), config)
+
+    pd.testing.assert_frame_equal(actual, expected)
+
+def test_typed_instance_counts_classify_like_text(tmp_path):
+    config = EstimatorConfig()
+    dfText = read_cmdb_text(tmp_path)
+    dfTyped = dfText.copy()
+    dfTyped[config.srcDbInstanceCount] = pd.to_numeric(dfTyped[config.srcDbInstanceCount].replace('', np.nan))
+
+    expected = map_databases(classify_cmdb(dfText, config), config)
+    actual = map_databases(classify_cmdb(dfTyped, config), config)
+
+    pd.testing.assert_series_equal(actual['RDS'], expected['RDS'])
+    pd.testing.assert_series_equal(actual['AWS_DB'], expected['AWS_DB'])
+
+def test_map_regions_defaults_unmapped_locations():
+    config = EstimatorConfig()
+    location = pd.Series(['AP', 'EU', 'US', '', 'eu', 'Unknown DC', 'eu-west-2', 'EU (London)'])
+
+    assert list(map_regions(location, config)) == [config.awsASIA, config.awsEU, config.awsDFLT, config.awsDFLT,
+                                                   config.awsDFLT, config.awsDFLT, 'eu-west-2', 'eu-west-2']
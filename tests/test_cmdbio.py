@@ -0,0 +1,71 @@
+# Tests for CMDB input: a CSV read on pyarrow must type every column the way pandas does,
+# whether the estimator reads it or not
+
+import pandas as pd
+import pytest
+
+from awsbatchestimate.classify import input_columns
+from awsbatchestimate.cmdbio import read_cmdb, write_cmdb
+from awsbatchestimate.config import EstimatorConfig
+from synthetic_cmdb import synthetic_cmdb
+
+config = EstimatorConfig(srcMemUsed='Peak Mem Used')
+
+def pandas_read(path):
+    return pd.read_csv(path, keep_default_na=False, float_precision='round_trip')
+
+# The Arrow read next to pandas', with Arrow backed text turned back into Python strings
+def assert_reads_like_pandas(path, columns):
+    dfCMDB = read_cmdb(path, columns=columns)
+    dfExpected = pandas_read(path)
+    for column in dfCMDB.columns:
+        if isinstance(dfCMDB[column].dtype, pd.StringDtype):
+            assert column not in columns and dfExpected[column].dtype == object, column
+            dfCMDB[column] = dfCMDB[column].astype(object)
+    pd.testing.assert_frame_equal(dfCMDB, dfExpected)
+    return dfCMDB
+
+def test_read_equals_pandas(tmp_path):
+    dfSynthetic = synthetic_cmdb(2000, seed=3)
+    dfSynthetic['cpuUsage'] = dfSynthetic['cpuUsage'] / 7
+    dfSynthetic.to_csv(tmp_path / 'cmdb.csv', index=False)
+
+    # The columns a run with the estimated memory reads leave 'Peak Mem Used' unread
+    columns = [column for column in input_columns(config) if column != 'Peak Mem Used']
+    dfCMDB = read_cmdb(tmp_path / 'cmdb.csv', columns=columns)
+    assert dfCMDB['Peak Mem Used'].dtype == float and dfCMDB['Total File System  in GB'].dtype == 'int64'
+    assert isinstance(dfCMDB['Server'].dtype, pd.StringDtype) and dfCMDB['Location'].dtype == object
+
+    assert_reads_like_pandas(tmp_path / 'cmdb.csv', columns)
+    assert_reads_like_pandas(tmp_path / 'cmdb.csv', input_columns(config))
+
+def test_values_pandas_reads_as_text(tmp_path):
+    (tmp_path / 'cmdb.csv').write_text(
+        "Server,vCPU,cpuUsage,Memory GB,Flag,Built,Checked,Note,Huge\n"
+        "a,2,.5,8,true,2023-01-05,nan,\"two\nlines\",1e400\n"
+        "b,,.25,16,FALSE,2023-02-11,1.5,,2\n"
+        "c,4,,32,True,2023-03-15,2,\"x, y\",3\n")
+
+    for columns in (['vCPU', 'cpuUsage', 'Memory GB'], ['vCPU', 'Flag', 'Built', 'Checked', 'Note']):
+        dfCMDB = assert_reads_like_pandas(tmp_path / 'cmdb.csv', columns)
+    assert list(dfCMDB['Flag']) == [True, False, True]
+    assert list(dfCMDB['Note']) == ['two\nlines', '', 'x, y']
+    assert list(dfCMDB['vCPU']) == ['2', '', '4']
+
+def test_repeated_column_names_read_with_pandas(tmp_path):
+    (tmp_path / 'cmdb.csv').write_text("Server,vCPU,vCPU\na,2,4\n")
+
+    dfCMDB = read_cmdb(tmp_path / 'cmdb.csv', columns=['vCPU'])
+    assert list(dfCMDB.columns) == ['Server', 'vCPU', 'vCPU.1']
+
+@pytest.mark.parametrize('suffix', ['.parquet', '.feather'])
+def test_columnar_output_keeps_numbers_numeric(tmp_path, suffix):
+    synthetic_cmdb(300, seed=4).to_csv(tmp_path / 'cmdb.csv', index=False)
+    dfCMDB = read_cmdb(tmp_path / 'cmdb.csv', config.categoricalColumns, ['vCPU', 'cpuUsage', 'Memory GB'])
+
+    write_cmdb(dfCMDB, tmp_path / ('cmdb' + suffix), config.categoricalColumns)
+    dfColumnar = read_cmdb(tmp_path / ('cmdb' + suffix))
+    for column in ('Peak Mem Used', 'Total File System  in GB'):
+        assert pd.api.types.is_numeric_dtype(dfColumnar[column]), column
+        assert (dfColumnar[column].to_numpy(dtype=float) == dfCMDB[column].to_numpy(dtype=float)).all()
+    assert list(dfColumnar['Server']) == list(dfCMDB['Server'])
@@ -0,0 +1,77 @@
+# Tests for diff mode: reusing the rows of a previous output must give exactly the output of
+# a full run
+
+import numpy as np
+import pandas as pd
+
+from awsbatchestimate.catalog import Catalog
+from awsbatchestimate.cmdbio import read_cmdb
+from awsbatchestimate.config import EstimatorConfig
+from awsbatchestimate.incremental import estimate_incremental, read_previous_estimate
+from awsbatchestimate.instancematch import build_fit_index
+from synthetic_cmdb import synthetic_cmdb
+
+config = EstimatorConfig(srcMemUsed='Peak Mem Used')
+
+def read_synthetic(path, dfCMDB):
+    dfCMDB.to_csv(path, index=False)
+    return read_cmdb(path)
+
+# The previous run's output, written and read back the way the command line does it
+def previous_output(path, dfCMDB, catalog):
+    estimate_incremental(dfCMDB, None, catalog, config).to_csv(path)
+    return read_previous_estimate(path)
+
+# A CMDB a month later: some servers resized, some retired and some new ones
+def changed_cmdb(dfCMDB):
+    dfChanged = dfCMDB.copy()
+    dfChanged.loc[::17, 'cpuUsage'] = .95
+    dfChanged.loc[5::23, 'Peak Mem Used'] = 1
+    dfChanged = dfChanged.drop(dfChanged.index[3::31])
+    dfNew = synthetic_cmdb(40, seed=9)
+    dfNew['Server'] = 'new' + dfNew['Server']
+    return pd.concat([dfChanged, dfNew])
+
+def test_incremental_output_equals_full_run(tmp_path, catalog, caplog):
+    dfCMDB = read_synthetic(tmp_path / 'cmdb.csv', synthetic_cmdb(600))
+    dfPrevious = previous_output(tmp_path / 'previous.csv', dfCMDB, catalog)
+    dfChanged = read_synthetic(tmp_path / 'changed.csv', changed_cmdb(dfCMDB))
+
+    with caplog.at_level('INFO', logger='awsbatchestimate'):
+        estimate_incremental(dfChanged, dfPrevious, catalog, config).to_csv(tmp_path / 'incremental.csv')
+    estimate_incremental(dfChanged, None, catalog, config).to_csv(tmp_path / 'full.csv')
+
+    # Most rows are copied across, only the changed and new ones are estimated
+    reused, total, estimated = [record.args for record in caplog.records if record.msg.startswith("Reusing")][0]
+    assert total == len(dfChanged) and 40 <= estimated < total / 4
+
+    assert (tmp_path / 'incremental.csv').read_bytes() == (tmp_path / 'full.csv').read_bytes()
+
+def test_rows_priced_from_changed_prices_are_estimated_again(tmp_path, catalog):
+    dfCMDB = read_synthetic(tmp_path / 'cmdb.csv', synthetic_cmdb(600))
+    dfPrevious = previous_output(tmp_path / 'previous.csv', dfCMDB, catalog)
+
+    # Prices of one group go up by a tenth
+    key = ('us-east-1', 'Linux', 'm')
+    dfInstanceList = catalog.ec2[key][0].copy()
+    for column in ('one_hr_rate', 'one_yr_rate', 'three_yr_rate'):
+        dfInstanceList[column] = dfInstanceList[column] * 1.1
+    repriced = Catalog(ec2=dict(catalog.ec2), rds=catalog.rds)
+    repriced.ec2[key] = (dfInstanceList, build_fit_index(dfInstanceList))
+
+    dfIncremental = estimate_incremental(dfCMDB, dfPrevious, repriced, config)
+    dfFull = estimate_incremental(dfCMDB, None, repriced, config)
+
+    group = ((dfFull['AWS_Region'] == 'us-east-1') & (dfFull['AWS_OS'] == 'Linux')
+             & (dfFull['calc_family'] == 'm') & ~dfFull['RDS']).to_numpy()
+    assert group.any()
+    np.testing.assert_allclose(dfIncremental['one_hr_rate'].to_numpy(dtype=float),
+                               dfFull['one_hr_rate'].to_numpy(dtype=float))
+    np.testing.assert_allclose(dfIncremental.loc[group, 'one_hr_rate'].to_numpy(dtype=float),
+                               dfPrevious.loc[group, 'one_hr_rate'].to_numpy(dtype=float) * 1.1)
+
+def test_previous_output_without_fingerprints_means_a_full_run(tmp_path):
+    pd.DataFrame({'vCPU': [2]}).to_csv(tmp_path / 'old.csv')
+
+    assert read_previous_estimate(tmp_path / 'old.csv') is None
+    assert read_previous_estimate(tmp_path / 'missing.csv') is None
@@ -0,0 +1,103 @@
+# Tests for the match policies: the cheapest fit policies must pick what a brute force search
+# over every fitting instance picks
+
+from dataclasses import replace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from awsbatchestimate.config import EstimatorConfig
+from awsbatchestimate.estimator import estimate
+from awsbatchestimate.instancematch import build_fit_index, first_fit, rateColumns
+from synthetic_cmdb import synthetic_cmdb
+
+config = EstimatorConfig(srcMemUsed='Peak Mem Used')
+
+# The lowest rate among the instances covering each requirement, nan where none does
+def brute_force_min(dfInstanceList, rateColumn, cores, memory):
+    vcpus = dfInstanceList['vcpu'].to_numpy(dtype=float)
+    sizes = dfInstanceList['memory'].to_numpy(dtype=float)
+    rates = dfInstanceList[rateColumn].to_numpy(dtype=float)
+    best = []
+    for c, m in zip(cores, memory):
+        fitting = rates[(vcpus >= c) & (sizes >= m) & ~np.isnan(rates)]
+        best.append(fitting.min() if len(fitting) else np.nan)
+    return np.array(best)
+
+# The instances a server of a row could be matched against: its own family's list, or every
+# family of its region and platform or engine when pooled
+def candidates(catalog, row, pooled):
+    groups, name = (catalog.rds, row['AWS_DB']) if row['RDS'] else (catalog.ec2, row['AWS_OS'])
+    if not pooled:
+        key = (row['AWS_Region'], name, row['calc_family'])
+        return groups[key][0] if key in groups else None
+    dfs = [dfInstanceList for (region, groupName, family), (dfInstanceList, fitIndex) in groups.items()
+           if (region, groupName) == (row['AWS_Region'], name)]
+    return pd.concat(dfs) if dfs else None
+
+def test_fit_index_picks_the_cheapest_fitting_instance():
+    dfInstanceList = pd.DataFrame({'instanceType': ['a', 'b', 'c', 'd', 'e', 'f'],
+                                   'vcpu': [2, 2, 4, 4, 8, 16],
+                                   'memory': [4, 8, 8, 16, 32, 32],
+                                   'one_hr_rate': [.1, .09, .2, np.nan, .3, .25]})
+    cores = np.repeat(np.arange(0, 18, .5), 12)
+    memory = np.tile(np.arange(0, 36, 3), 36)
+
+    choice = first_fit(build_fit_index(dfInstanceList, 'one_hr_rate'), cores, memory)
+    picked = np.where(choice >= 0, dfInstanceList['one_hr_rate'].to_numpy()[choice], np.nan)
+    np.testing.assert_array_equal(picked, brute_force_min(dfInstanceList, 'one_hr_rate', cores, memory))
+
+@pytest.mark.parametrize('matchRate', ['on-demand', '1yr', '3yr'])
+@pytest.mark.parametrize('matchPolicy', ['cheapest', 'cheapest-any'])
+def test_estimates_match_brute_force(catalog, matchPolicy, matchRate):
+    policyConfig = replace(config, matchPolicy=matchPolicy, matchRate=matchRate)
+    rateColumn = rateColumns[matchRate]
+    dfEstimate = estimate(synthetic_cmdb(300, seed=8), catalog, policyConfig)
+
+    expected = []
+    for position, row in dfEstimate.iterrows():
+        dfInstanceList = candidates(catalog, row, matchPolicy == 'cheapest-any')
+        expected.append(np.nan if dfInstanceList is None else
+                        brute_force_min(dfInstanceList, rateColumn, [row['cores_calc']], [row[config.srcMemUsed]])[0])
+    np.testing.assert_allclose(dfEstimate[rateColumn].to_numpy(dtype=float), expected)
+
+@pytest.mark.parametrize('matchRate', ['on-demand', '1yr', '3yr'])
+def test_policies_are_ordered_by_cost(catalog, matchRate):
+    dfCMDB = synthetic_cmdb(500, seed=4)
+    rateColumn = rateColumns[matchRate]
+    rates = {policy: estimate(dfCMDB, catalog, replace(config, matchPolicy=policy, matchRate=matchRate))[rateColumn]
+             .to_numpy(dtype=float) for policy in ('first-fit', 'cheapest', 'cheapest-any')}
+
+    # Anything first fit matches, the cheapest policies match too, at no higher rate
+    matched = ~np.isnan(rates['first-fit'])
+    assert matched.sum() > len(dfCMDB) / 2
+    assert not np.isnan(rates['cheapest'][matched]).any()
+    assert (rates['cheapest-any'][matched] <= rates['cheapest'][matched] + 1e-9).all()
+    assert (rates['cheapest'][matched] <= rates['first-fit'][matched] + 1e-9).all()
+    assert rates['cheapest-any'][matched].sum() < rates['first-fit'][matched].sum()
+
+# Matching resolves each distinct shape once and broadcasts it; row by row lookups must agree
+def test_shape_broadcast_equals_row_by_row_first_fit(catalog):
+    dfEstimate = estimate(synthetic_cmdb(600, seed=9), catalog, config)
+
+    expected = []
+    for position, row in dfEstimate.iterrows():
+        key = (row['AWS_Region'], row['AWS_DB'] if row['RDS'] else row['AWS_OS'], row['calc_family'])
+        groups = catalog.rds if row['RDS'] else catalog.ec2
+        choice = -1
+        if key in groups:
+            dfInstanceList, fitIndex = groups[key]
+            choice = first_fit(fitIndex, [row['cores_calc']], [row[config.srcMemUsed]])[0]
+        expected.append(dfInstanceList['instanceType'].iloc[choice] if choice >= 0 else None)
+    assert list(dfEstimate['ec2_instance_type'].where(dfEstimate['ec2_instance_type'].notna(), None)) == expected
+
+# Frames concatenated from several exports repeat index labels; matching goes by position
+def test_repeated_index_labels(catalog):
+    dfCMDB = pd.concat([synthetic_cmdb(200, seed=10), synthetic_cmdb(150, seed=11)])
+    assert not dfCMDB.index.is_unique
+
+    dfEstimate = estimate(dfCMDB, catalog, config)
+    dfExpected = estimate(dfCMDB.reset_index(drop=True), catalog, config)
+    assert dfEstimate['ec2_instance_type'].notna().sum() > 200
+    pd.testing.assert_frame_equal(dfEstimate.reset_index(drop=True), dfExpected)
@@ -0,0 +1,143 @@
+# Tests for the bulk offer file reader: a catalog priced from JSON or CSV offer files must be
+# the one priced from get_products, however the stream splits keys and values across reads
+
+import csv
+import gzip
+import io
+import json
+from dataclasses import replace
+
+import pandas as pd
+import pytest
+
+from awsbatchestimate import offerfiles
+from awsbatchestimate.catalog import build_catalog, ec2_queries, rds_queries
+from awsbatchestimate.config import EstimatorConfig
+from awsbatchestimate.offerfiles import JSONStream, csvAttributes, offer_price_lists
+from .conftest import SyntheticSource
+from synthetic_pricelist import synthetic_price_list
+
+config = EstimatorConfig(regions=('us-east-1', 'eu-central-1'))
+
+queries = {'AmazonEC2': ec2_queries(config), 'AmazonRDS': rds_queries(config)}
+
+# A product no query asks for, with text that looks like JSON structure
+unwanted = {'sku': 'UNWANTED', 'productFamily': 'Storage',
+            'attributes': {'location': 'US East (N. Virginia)', 'volumeType': 'gp3 "general" {purpose}, [ssd]'}}
+
+# The products and terms get_products returns for a service's queries, by SKU
+def offer_items(serviceCode):
+    items = {}
+    for filters in queries[serviceCode].values():
+        for item in synthetic_price_list(serviceCode, filters):
+            item = json.loads(item)
+            items[item['product']['sku']] = item
+    return items
+
+def write_json_offer(path, serviceCode, opener=open):
+    items = offer_items(serviceCode)
+    products = {sku: item['product'] for sku, item in items.items()}
+    products['UNWANTED'] = unwanted
+    terms = {termType: {sku: item['terms'][termType] for sku, item in items.items()}
+             for termType in ('OnDemand', 'Reserved')}
+    terms['OnDemand']['UNWANTED'] = {'UNWANTED.JRTCKXETXF': {'sku': 'UNWANTED', 'priceDimensions': {}}}
+    with opener(path, 'wt', encoding='utf-8') as f:
+        json.dump({'formatVersion': 'v1.0', 'offerCode': serviceCode, 'version': '20200101000000',
+                   'products': products, 'terms': terms, 'attributesList': {'location': ['US East']}}, f, indent=1)
+
+# One row per price dimension, after the metadata rows the bulk CSV files start with
+def write_csv_offer(path, serviceCode, opener=open):
+    header = ['SKU', 'OfferTermCode', 'RateCode', 'TermType', 'PriceDescription', 'EffectiveDate',
+              'StartingRange', 'EndingRange', 'Unit', 'PricePerUnit', 'Currency', 'LeaseContractLength',
+              'PurchaseOption', 'OfferingClass', 'Product Family'] + list(csvAttributes.values())
+    items = offer_items(serviceCode)
+    items['UNWANTED'] = {'product': unwanted, 'terms': {}}
+    with opener(path, 'wt', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+        writer.writerows([['FormatVersion', 'v1.0'], ['Disclaimer', 'synthetic'], ['Publication Date', '2020'],
+                          ['Version', '20200101000000'], ['OfferCode', serviceCode], header])
+        for sku, item in items.items():
+            attributes = item['product']['attributes']
+            productColumns = [item['product']['productFamily']] + [attributes.get(field, '') for field in csvAttributes]
+            for termType, offers in item['terms'].items():
+                for offer in offers.values():
+                    termAttributes = offer['termAttributes']
+                    for dimension in offer['priceDimensions'].values():
+                        (currency, price), = dimension['pricePerUnit'].items()
+                        writer.writerow([sku, offer['offerTermCode'], dimension['rateCode'], termType,
+                                         dimension['description'], offer['effectiveDate'], dimension['beginRange'],
+                                         dimension['endRange'], dimension['unit'], price, currency,
+                                         termAttributes.get('LeaseContractLength', ''),
+                                         termAttributes.get('PurchaseOption', ''),
+                                         termAttributes.get('OfferingClass', '')] + productColumns)
+            if not item['terms']:
+                writer.writerow([sku, 'JRTCKXETXF', sku + '.R', 'OnDemand', '', '', '0', 'Inf', 'GB-Mo', '0.08',
+                                 'USD', '', '', ''] + productColumns)
+
+# Offer file layouts: flat JSON, gzipped JSON in the bulk API layout and flat CSV
+layouts = {'json': ('{service}.json', write_json_offer, open),
+           'json.gz': ('{service}/current/index.json.gz', write_json_offer, gzip.open),
+           'csv': ('{service}.csv', write_csv_offer, open)}
+
+@pytest.fixture(scope='module')
+def expected_catalog():
+    return build_catalog(config, SyntheticSource())
+
+@pytest.mark.parametrize('layout', list(layouts))
+def test_catalog_equals_get_products_catalog(tmp_path, monkeypatch, expected_catalog, layout):
+    name, write, opener = layouts[layout]
+    for serviceCode in queries:
+        path = tmp_path / name.format(service=serviceCode)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write(path, serviceCode, opener)
+    # Reads small enough to split keys, strings and numbers across buffer boundaries
+    monkeypatch.setattr(offerfiles, 'chunkSize', 61)
+
+    catalog = build_catalog(replace(config, offerDir=str(tmp_path)))
+
+    for groups, expectedGroups in ((catalog.ec2, expected_catalog.ec2), (catalog.rds, expected_catalog.rds)):
+        assert list(groups) == list(expectedGroups)
+        for key, (dfInstanceList, fitIndex) in groups.items():
+            pd.testing.assert_frame_equal(dfInstanceList, expectedGroups[key][0])
+    assert sum(len(dfInstanceList) for dfInstanceList, fitIndex in catalog.ec2.values()) > 100
+
+# A number cut short at the end of a read still decodes, so every split point is tried
+@pytest.mark.parametrize('size', range(1, 13))
+def test_json_stream_values_across_reads(monkeypatch, size):
+    monkeypatch.setattr(offerfiles, 'chunkSize', size)
+    stream = JSONStream(io.StringIO('{"count": 1234567, "flag" : true,\n "nested": {"a": [1, 2.5e3], '
+                                    '"b\\"}": "x}\\u00e9"}, "empty": {}, "last": -0.125}'))
+
+    members = {}
+    for key in stream.members():
+        if key in ('nested', 'empty'):
+            members[key] = {inner: stream.value() for inner in stream.members()}
+        else:
+            members[key] = stream.value()
+    assert members == {'count': 1234567, 'flag': True, 'nested': {'a': [1, 2500.0], 'b"}': 'x}\u00e9'},
+                       'empty': {}, 'last': -.125}
+
+def test_json_items_are_the_get_products_items(tmp_path, monkeypatch):
+    write_json_offer(tmp_path / 'AmazonRDS.json', 'AmazonRDS')
+    monkeypatch.setattr(offerfiles, 'chunkSize', 7)
+
+    priceLists = offer_price_lists(tmp_path, 'AmazonRDS', queries['AmazonRDS'])
+
+    for name, filters in queries['AmazonRDS'].items():
+        expected = [json.loads(item) for item in synthetic_price_list('AmazonRDS', filters)]
+        items = [json.loads(item) for item in priceLists[name]]
+        assert [(item['product'], item['terms']) for item in items] == \
+               [(item['product'], item['terms']) for item in expected]
+
+def test_missing_and_malformed_offer_files(tmp_path):
+    with pytest.raises(FileNotFoundError, match='No offer file for AmazonEC2'):
+        offer_price_lists(tmp_path, 'AmazonEC2', queries['AmazonEC2'])
+
+    (tmp_path / 'AmazonEC2.json').write_text('{"products": {"A": {"sku": "A"}')
+    with pytest.raises(ValueError):
+        offer_price_lists(tmp_path, 'AmazonEC2', queries['AmazonEC2'])
+
+    (tmp_path / 'AmazonEC2.json').unlink()
+    (tmp_path / 'AmazonEC2.csv').write_text('FormatVersion,v1.0\n')
+    with pytest.raises(ValueError, match='no SKU header row'):
+        offer_price_lists(tmp_path, 'AmazonEC2', queries['AmazonEC2'])
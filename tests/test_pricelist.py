@@ -0,0 +1,95 @@
+# Tests for price list parsing: rates are found by what the terms are, whatever their codes
+
+import json
+
+import numpy as np
+import pytest
+
+from awsbatchestimate.config import EstimatorConfig
+from awsbatchestimate.pricelist import hoursPerYear, instanceColumns, parse_memory, parse_price_list
+from synthetic_pricelist import on_demand_rate, price_dimension, price_list_item, synthetic_price_list, term
+
+config = EstimatorConfig()
+
+linux = {'operatingSystem': 'Linux', 'instanceFamily': 'General purpose'}
+
+def item(instanceType='m5.xlarge', vcpu=4, memory=16, attributes=linux, serviceCode='AmazonEC2'):
+    return json.loads(price_list_item(serviceCode, attributes, instanceType, vcpu, memory))
+
+def parse(items, service='AmazonEC2', db=None):
+    return parse_price_list([json.dumps(i) for i in items], service, 'm', config, db)
+
+def test_rates_come_from_the_matching_terms():
+    hourly = on_demand_rate('m5.xlarge', 4, 16, linux)
+
+    dfInstanceList = parse([item()])
+
+    assert list(dfInstanceList.columns) == instanceColumns
+    row = dfInstanceList.iloc[0]
+    assert (row['instanceType'], row['vcpu'], row['memory'], row['family']) == ('m5.xlarge', 4, 16, 'm')
+    assert row['one_hr_rate'] == pytest.approx(hourly)
+    assert row['one_yr_rate'] == pytest.approx(hourly * hoursPerYear * .6)
+    assert row['three_yr_rate'] == pytest.approx(hourly * hoursPerYear * 1.2)
+
+def test_term_codes_and_order_dont_matter():
+    expected = parse([item()])
+    priced = item()
+    sku = priced['product']['sku']
+
+    # New codes, in reverse order, with a convertible term that costs less in front
+    reserved = list(priced['terms']['Reserved'].values())
+    terms = [term(sku, 'CODE' + str(i), [price_dimension(sku, 'CODE' + str(i), d['unit'],
+                                                         float(d['pricePerUnit']['USD']), d['description'])
+                                         for d in t['priceDimensions'].values()], t['termAttributes'])
+             for i, t in enumerate(reversed(reserved))]
+    terms.insert(0, term(sku, 'CONVERT', [price_dimension(sku, 'CONVERT', 'Quantity', 1, 'Upfront Fee')],
+                         {'LeaseContractLength': '1yr', 'OfferingClass': 'convertible',
+                          'PurchaseOption': 'All Upfront'}))
+    priced['terms']['Reserved'] = dict(terms)
+
+    assert parse([priced]).equals(expected)
+
+def test_reserved_terms_without_an_offering_class_are_standard():
+    rds = {'databaseEngine': 'Oracle', 'instanceFamily': 'General purpose'}
+    priced = item('db.m5.large', 2, 8, rds, 'AmazonRDS')
+    for t in priced['terms']['Reserved'].values():
+        del t['termAttributes']['OfferingClass']
+
+    row = parse([priced], 'AmazonRDS', config.awsOracle).iloc[0]
+    assert row['one_yr_rate'] == pytest.approx(on_demand_rate('db.m5.large', 2, 8, rds) * hoursPerYear * .6)
+
+def test_sql_server_one_year_rate_is_partial_upfront_plus_a_year_of_hours():
+    rds = {'databaseEngine': 'SQL Server', 'instanceFamily': 'General purpose'}
+    priced = item('db.m5.large', 2, 8, rds, 'AmazonRDS')
+    # SQL Server has no 1-year All Upfront term
+    priced['terms']['Reserved'] = {code: t for code, t in priced['terms']['Reserved'].items()
+                                   if t['termAttributes'] != {'LeaseContractLength': '1yr', 'OfferingClass': 'standard',
+                                                              'PurchaseOption': 'All Upfront'}}
+    hourly = on_demand_rate('db.m5.large', 2, 8, rds)
+
+    row = parse([priced], 'AmazonRDS', config.awsSQLServer).iloc[0]
+    assert row['one_yr_rate'] == pytest.approx(hourly * hoursPerYear * .3 + hourly * .3 * hoursPerYear)
+    assert np.isnan(parse([priced], 'AmazonRDS', config.awsOracle).iloc[0]['one_yr_rate'])
+
+def test_missing_terms_give_no_rate():
+    priced = item()
+    priced['terms'] = {}
+
+    row = parse([priced]).iloc[0]
+    assert np.isnan(row['one_hr_rate']) and np.isnan(row['one_yr_rate']) and np.isnan(row['three_yr_rate'])
+
+def test_skipped_instance_types_are_dropped():
+    items = synthetic_price_list('AmazonEC2', [{'Type': 'TERM_MATCH', 'Field': f, 'Value': v} for f, v in linux.items()])
+
+    instanceTypes = list(parse_price_list(items, 'AmazonEC2', 'm', config)['instanceType'])
+    assert instanceTypes and all(t.startswith(('m5.', 'm6i.')) for t in instanceTypes)
+    assert len(parse_price_list(items, 'AmazonEC2', 'm', EstimatorConfig(skipGenerations=(), skipVariants=()))) == len(items)
+
+    # Only EC2 is filtered
+    rds = [price_list_item('AmazonRDS', {'databaseEngine': 'Oracle'}, 'db.t3.medium', 2, 4)]
+    assert list(parse_price_list(rds, 'AmazonRDS', 't', config, config.awsOracle)['instanceType']) == ['db.t3.medium']
+
+@pytest.mark.parametrize('memory, expected', [('16 GiB', 16), ('3.75 GiB', 3), ('0.5 GiB', 0), ('1,952 GiB', 1952),
+                                              ('15.25 GiB', 15)])
+def test_memory_is_whole_gib(memory, expected):
+    assert parse_memory(memory) == expected
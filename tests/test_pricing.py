@@ -0,0 +1,155 @@
+# Tests for the price list fetcher and cache, against the local pricing stub
+
+import json
+
+import pytest
+
+from awsbatchestimate.config import EstimatorConfig
+from awsbatchestimate.pricing import PriceListSource, price_list_key
+from awsbatchestimate.trace import Tracer
+from pricing_stub import start_stub
+
+filters = [{'Type': 'TERM_MATCH', 'Field': 'location', 'Value': "US East (N. Virginia)"},
+           {'Type': 'TERM_MATCH', 'Field': 'operatingSystem', 'Value': 'Linux'}]
+
+# Three pages at the fetcher's 100 items per page
+items = [json.dumps({'sku': 'SKU' + str(i)}) for i in range(250)]
+
+@pytest.fixture
+def stub(aws_credentials):
+    stub = start_stub({price_list_key('AmazonEC2', filters): items})
+    yield stub
+    stub.shutdown()
+    stub.server_close()
+
+def pricing_config(tmp_path, stub=None, **fields):
+    if stub is not None:
+        fields['pricingEndpoint'] = stub.endpoint
+    return EstimatorConfig(cacheDir=str(tmp_path / 'cache'), pricingBaseBackoff=.001, **fields)
+
+def test_pages_are_followed_to_the_end(tmp_path, stub):
+    source = PriceListSource(pricing_config(tmp_path, stub))
+
+    priceLists = source.get_price_lists('AmazonEC2', {'linux': filters})
+
+    assert priceLists['linux'] == items
+    assert stub.calls == 3
+
+def test_identical_queries_are_fetched_once(tmp_path, stub):
+    tracer = Tracer()
+    source = PriceListSource(pricing_config(tmp_path, stub), tracer)
+
+    # Same filters in a different order
+    priceLists = source.get_price_lists('AmazonEC2', {('a',): filters, ('b',): list(reversed(filters))})
+
+    assert priceLists[('a',)] == items and priceLists[('b',)] == items
+    assert stub.calls == 3
+    assert [event['names'] for event in tracer.queries] == [[['a'], ['b']]]
+
+def test_throttled_page_is_retried(tmp_path, stub):
+    stub.throttle = 2
+    tracer = Tracer()
+    source = PriceListSource(pricing_config(tmp_path, stub), tracer)
+
+    priceLists = source.get_price_lists('AmazonEC2', {'linux': filters})
+
+    assert priceLists['linux'] == items
+    assert stub.calls == 5
+    assert tracer.queries[0]['retries'] == 2
+    assert tracer.queries[0]['apiCalls'] == 5
+
+def test_throttling_gives_up_after_max_attempts(tmp_path, stub):
+    from botocore.exceptions import ClientError
+
+    stub.throttle = 10
+    source = PriceListSource(pricing_config(tmp_path, stub, pricingMaxAttempts=3))
+
+    with pytest.raises(ClientError):
+        source.get_price_lists('AmazonEC2', {'linux': filters})
+    assert stub.calls == 3
+
+def test_dropped_connection_is_retried(tmp_path, stub):
+    stub.drop = 2
+    tracer = Tracer()
+    source = PriceListSource(pricing_config(tmp_path, stub), tracer)
+
+    priceLists = source.get_price_lists('AmazonEC2', {'linux': filters})
+
+    assert priceLists['linux'] == items
+    assert stub.calls == 5
+    assert tracer.queries[0]['retries'] == 2
+
+def test_refused_connection_gives_up_after_max_attempts(tmp_path, aws_credentials):
+    from botocore.exceptions import EndpointConnectionError
+
+    source = PriceListSource(pricing_config(tmp_path, pricingEndpoint='http://127.0.0.1:9', pricingMaxAttempts=2))
+
+    with pytest.raises(EndpointConnectionError):
+        source.get_price_lists('AmazonEC2', {'linux': filters})
+
+# A query that fails leaves the price lists fetched alongside it in the cache
+def test_fetched_price_lists_are_cached_when_a_query_fails(tmp_path, stub, monkeypatch):
+    fetch = PriceListSource.fetch_price_list
+
+    def fetch_or_fail(self, serviceCode, queryFilters):
+        if queryFilters is not filters:
+            raise RuntimeError("connection reset")
+        return fetch(self, serviceCode, queryFilters)
+
+    # The failing query fails at once, while the other is still waiting on the API
+    monkeypatch.setattr(PriceListSource, 'fetch_price_list', fetch_or_fail)
+    stub.delay = .2
+    failing = [dict(f, Value='Windows') if f['Field'] == 'operatingSystem' else f for f in filters]
+    source = PriceListSource(pricing_config(tmp_path, stub, pricingWorkers=2))
+    with pytest.raises(RuntimeError, match='connection reset'):
+        source.get_price_lists('AmazonEC2', {'linux': filters, 'windows': failing})
+    monkeypatch.undo()
+
+    source = PriceListSource(pricing_config(tmp_path, offline=True))
+    assert source.get_price_lists('AmazonEC2', {'linux': filters})['linux'] == items
+
+def test_cache_hit_makes_no_calls(tmp_path, stub):
+    PriceListSource(pricing_config(tmp_path, stub)).get_price_lists('AmazonEC2', {'linux': filters})
+    calls = stub.calls
+
+    # An endpoint that refuses connections, so any API call would fail
+    tracer = Tracer()
+    source = PriceListSource(pricing_config(tmp_path, pricingEndpoint='http://127.0.0.1:9'), tracer)
+    priceLists = source.get_price_lists('AmazonEC2', {'linux': filters})
+
+    assert priceLists['linux'] == items
+    assert stub.calls == calls
+    assert tracer.queries[0]['source'] == 'cache'
+
+def test_refresh_ignores_the_cache(tmp_path, stub):
+    PriceListSource(pricing_config(tmp_path, stub)).get_price_lists('AmazonEC2', {'linux': filters})
+
+    PriceListSource(pricing_config(tmp_path, stub, refresh=True)).get_price_lists('AmazonEC2', {'linux': filters})
+
+    assert stub.calls == 6
+
+def test_offline_without_cache_entry_fails(tmp_path):
+    source = PriceListSource(pricing_config(tmp_path, offline=True))
+
+    with pytest.raises(RuntimeError, match="No cached price list for AmazonEC2"):
+        source.get_price_lists('AmazonEC2', {'linux': filters})
+
+def test_offline_uses_stale_cache_entries(tmp_path, stub):
+    PriceListSource(pricing_config(tmp_path, stub)).get_price_lists('AmazonEC2', {'linux': filters})
+
+    source = PriceListSource(pricing_config(tmp_path, offline=True, cacheTTLHours=0))
+
+    assert source.get_price_lists('AmazonEC2', {'linux': filters})['linux'] == items
+
+def test_query_events_list_the_names_they_answered(tmp_path, stub):
+    tracer = Tracer()
+    config = pricing_config(tmp_path, stub)
+    names = {('us-east-1', 'Linux', 'm'): filters, ('eu-west-1', 'Linux', 'm'): list(reversed(filters))}
+
+    PriceListSource(config, tracer).get_price_lists('AmazonEC2', names)
+    PriceListSource(config, tracer).get_price_lists('AmazonEC2', names)
+
+    api, *cached = tracer.queries
+    assert api['source'] == 'api' and api['names'] == [list(name) for name in names]
+    assert [event['source'] for event in cached] == ['cache', 'cache']
+    assert [event['names'] for event in cached] == [[list(name)] for name in names]
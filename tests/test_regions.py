@@ -0,0 +1,54 @@
+# Tests for region handling: a full catalog must cover every region regionMap maps to, so
+# chunked runs price the same servers a run planned from the input does
+
+import pandas as pd
+
+from awsbatchestimate.catalog import build_catalog, plan_catalog
+from awsbatchestimate.classify import classify_cmdb
+from awsbatchestimate.cmdbio import read_cmdb, write_cmdb
+from awsbatchestimate.config import EstimatorConfig
+from awsbatchestimate.estimator import estimate, estimate_csv_chunked
+from .conftest import SyntheticSource
+from synthetic_cmdb import synthetic_cmdb
+
+config = EstimatorConfig(srcMemUsed='Peak Mem Used', regionMap={'UK': 'eu-west-2', 'SG': 'ap-southeast-1'})
+
+def test_default_regions_cover_the_region_map():
+    assert config.regions == ('us-east-1', 'eu-central-1', 'ap-northeast-2', 'eu-west-2', 'ap-southeast-1')
+    assert EstimatorConfig().regions == ('us-east-1', 'eu-central-1', 'ap-northeast-2')
+    assert EstimatorConfig(regions=('eu-west-2',), regionMap={'UK': 'eu-west-2'}).regions == ('eu-west-2',)
+
+def test_chunked_output_equals_planned_output(tmp_path):
+    dfCMDB = synthetic_cmdb(500, seed=11)
+    dfCMDB.loc[::4, 'Location'] = 'UK'
+    dfCMDB.loc[1::9, 'Location'] = 'SG'
+    dfCMDB.to_csv(tmp_path / 'cmdb.csv', index=False)
+
+    # A run planned from the input, and a chunked run against the full catalog
+    dfInput = read_cmdb(tmp_path / 'cmdb.csv')
+    plan = plan_catalog(classify_cmdb(dfInput.copy(), config), config)
+    write_cmdb(estimate(dfInput, build_catalog(config, SyntheticSource(), plan=plan), config), tmp_path / 'planned.csv')
+    estimate_csv_chunked(tmp_path / 'cmdb.csv', tmp_path / 'chunked.csv', 64, build_catalog(config, SyntheticSource()),
+                         config)
+
+    dfPlanned = pd.read_csv(tmp_path / 'planned.csv', keep_default_na=False)
+    dfChunked = pd.read_csv(tmp_path / 'chunked.csv', keep_default_na=False)
+    uk = dfPlanned['AWS_Region'] == 'eu-west-2'
+    assert uk.sum() >= 100 and (dfPlanned.loc[uk, 'ec2_instance_type'] != '').mean() > .9
+    pd.testing.assert_frame_equal(dfChunked, dfPlanned)
+
+def test_servers_outside_the_catalog_are_counted(catalog, caplog):
+    dfCMDB = synthetic_cmdb(200, seed=12)
+    dfCMDB.loc[::5, 'Location'] = 'eu-west-2'
+
+    with caplog.at_level('WARNING', logger='awsbatchestimate'):
+        dfEstimate = estimate(dfCMDB, catalog, config)
+
+    outside = (dfEstimate['AWS_Region'] == 'eu-west-2').to_numpy()
+    assert dfEstimate.loc[outside, 'ec2_instance_type'].isna().all()
+    rds = dfEstimate['RDS'].to_numpy()
+    messages = [record.getMessage() for record in caplog.records]
+    assert messages == [str((outside & ~rds).sum()) + " EC2 servers are in regions the catalog has no prices for"
+                        " and are left unmatched: eu-west-2 (" + str((outside & ~rds).sum()) + ")",
+                        str((outside & rds).sum()) + " RDS servers are in regions the catalog has no prices for"
+                        " and are left unmatched: eu-west-2 (" + str((outside & rds).sum()) + ")"]
@@ -0,0 +1,63 @@
+# Tests for rollup reports: totals fed chunk by chunk must be the totals of the whole frame,
+# and must add up to the estimate
+
+import numpy as np
+import pandas as pd
+
+from awsbatchestimate.cmdbio import read_cmdb
+from awsbatchestimate.config import EstimatorConfig
+from awsbatchestimate.estimator import estimate, estimate_csv_chunked
+from awsbatchestimate.rollup import Rollup, rollupTotals
+from synthetic_cmdb import synthetic_cmdb
+
+config = EstimatorConfig(srcMemUsed='Peak Mem Used')
+
+def test_chunks_roll_up_like_the_whole(catalog):
+    dfEstimate = estimate(synthetic_cmdb(1000, seed=41), catalog, config)
+
+    whole = Rollup(config).add(dfEstimate)
+    chunked = Rollup(config)
+    for start in range(0, len(dfEstimate), 97):
+        chunked.add(dfEstimate.iloc[start:start + 97])
+
+    pd.testing.assert_frame_equal(chunked.report(), whole.report())
+    pd.testing.assert_frame_equal(chunked.instances(), whole.instances())
+
+def test_streamed_rollup_equals_the_whole(tmp_path, catalog):
+    synthetic_cmdb(700, seed=42).to_csv(tmp_path / 'cmdb.csv', index=False)
+
+    streamed = Rollup(config)
+    estimate_csv_chunked(tmp_path / 'cmdb.csv', None, 64, catalog, config, rollup=streamed)
+    whole = Rollup(config).add(estimate(read_cmdb(tmp_path / 'cmdb.csv'), catalog, config))
+
+    pd.testing.assert_frame_equal(streamed.report(), whole.report())
+    pd.testing.assert_frame_equal(streamed.instances(), whole.instances())
+
+def test_totals_add_up_to_the_estimate(catalog):
+    dfEstimate = estimate(synthetic_cmdb(800, seed=43), catalog, config)
+    rollup = Rollup(config).add(dfEstimate)
+    dfReport = rollup.report()
+
+    unmatched = dfEstimate['ec2_instance_type'].isna()
+    assert dfReport['servers'].sum() == len(dfEstimate)
+    assert dfReport['unmatched'].sum() == unmatched.sum() > 0
+    for total, rate in (('one_hr_total', 'one_hr_rate'), ('one_yr_total', 'one_yr_rate'),
+                        ('three_yr_total', 'three_yr_rate'), ('ebs_month_total', 'ebs_month_rate')):
+        np.testing.assert_allclose(dfReport[total].sum(), dfEstimate[rate].sum())
+    np.testing.assert_allclose(dfReport['three_yr_tco'],
+                               dfReport['three_yr_total'] + 36 * dfReport['ebs_month_total'])
+    rds = dfReport['service'] == 'RDS'
+    assert dfReport.loc[rds, 'servers'].sum() == dfEstimate['RDS'].sum()
+
+    # The histogram counts every server once, unmatched ones under a blank type
+    dfInstances = rollup.instances()
+    assert dfInstances['servers'].sum() == len(dfEstimate)
+    assert dfInstances.loc[dfInstances['ec2_instance_type'].isna(), 'servers'].sum() == unmatched.sum()
+    counts = dfEstimate['ec2_instance_type'].value_counts()
+    assert dfInstances.groupby('ec2_instance_type')['servers'].sum().sort_index().equals(counts.sort_index().rename('servers'))
+
+def test_empty_rollup():
+    rollup = Rollup(config)
+
+    assert list(rollup.report().columns) == rollup.keys + rollupTotals + ['one_yr_tco', 'three_yr_tco']
+    assert rollup.report().empty and rollup.instances().empty
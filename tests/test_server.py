@@ -0,0 +1,148 @@
+# End to end tests of the estimation server against the pricing stub
+
+import json
+import sys
+import threading
+import urllib.error
+import urllib.request
+
+import pandas as pd
+import pytest
+
+from awsbatchestimate.catalog import Catalog
+from awsbatchestimate.catalogfile import save_catalog
+from awsbatchestimate.config import EstimatorConfig
+from awsbatchestimate.estimator import estimate
+from awsbatchestimate.server import EstimationServer
+from pricing_stub import start_stub
+from synthetic_cmdb import synthetic_cmdb
+
+@pytest.fixture
+def stub(aws_credentials):
+    stub = start_stub(None)
+    yield stub
+    stub.shutdown()
+    stub.server_close()
+
+@pytest.fixture
+def start_server():
+    servers = []
+
+    def start(config, catalogPath=None):
+        server = EstimationServer(('127.0.0.1', 0), config, refreshHours=0, catalogPath=catalogPath)
+        threading.Thread(target=server.serve_forever, kwargs={'poll_interval': .05}, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def request(server, method, path, body=None):
+    url = 'http://127.0.0.1:' + str(server.server_address[1]) + path
+    data = body if isinstance(body, bytes) or body is None else json.dumps(body).encode('utf-8')
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=data, method=method)) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+def test_estimate_health_and_refresh(tmp_path, stub, start_server):
+    config = EstimatorConfig(srcMemUsed='Peak Mem Used', cacheDir=str(tmp_path / 'cache'),
+                             pricingEndpoint=stub.endpoint)
+    server = start_server(config)
+    dfCMDB = synthetic_cmdb(200, seed=3)
+
+    status, health = request(server, 'GET', '/health')
+    assert status == 200 and health['ec2Groups'] == len(server.catalog.ec2) > 0
+
+    status, body = request(server, 'POST', '/estimate', {'servers': json.loads(dfCMDB.to_json(orient='records'))})
+    assert status == 200
+    dfExpected = estimate(dfCMDB, server.catalog, config)
+    dfActual = pd.DataFrame(body['servers'])
+    assert list(dfActual.columns) == list(dfExpected.columns)
+    assert list(dfActual['ec2_instance_type'].fillna('')) == list(dfExpected['ec2_instance_type'].fillna(''))
+    assert dfActual['three_yr_rate'].sum() == pytest.approx(dfExpected['three_yr_rate'].sum())
+
+    # A forced refresh goes back to the pricing API and swaps in a new catalog
+    calls = stub.calls
+    catalog = server.catalog
+    status, health = request(server, 'POST', '/refresh')
+    assert status == 200
+    assert stub.calls > calls
+    assert server.catalog is not catalog
+
+def test_bad_requests(tmp_path, stub, start_server):
+    server = start_server(EstimatorConfig(cacheDir=str(tmp_path / 'cache'), pricingEndpoint=stub.endpoint))
+
+    assert request(server, 'POST', '/estimate', b'{not json')[0] == 400
+    assert request(server, 'POST', '/estimate', {'servers': 'none'})[0] == 400
+    assert request(server, 'POST', '/estimate', {'servers': [{'vCPU': 2}]})[0] == 400
+    assert request(server, 'POST', '/estimate', {'servers': []}) == (200, {'servers': []})
+    assert request(server, 'GET', '/nowhere')[0] == 404
+
+def test_serves_a_saved_catalog_without_pricing(tmp_path, catalog, start_server):
+    path = tmp_path / 'catalog'
+    save_catalog(catalog, path)
+    # Nothing listens here, so any pricing call would fail
+    config = EstimatorConfig(cacheDir=str(tmp_path / 'cache'), pricingEndpoint='http://127.0.0.1:9')
+    server = start_server(config, str(path))
+
+    status, health = request(server, 'GET', '/health')
+    assert status == 200 and health['catalogFile'] == str(path)
+    assert health['ec2Groups'] == len(catalog.ec2) and health['rdsGroups'] == len(catalog.rds)
+
+    status, body = request(server, 'POST', '/estimate', {'servers': [
+        {'vCPU': 4, 'cpuUsage': .5, 'Memory GB': 16, 'Environment': 'Prod', 'Location': 'EU',
+         'Platform': 'Linux', 'OS Ver': 'CentOS 7', 'RDS_Instances': '', 'DB Rel/Ver': '',
+         'Total File System  in GB': 100}]})
+    assert status == 200 and body['servers'][0]['ec2_instance_type'] is not None
+
+    # A refresh reopens the file, picking up a newly saved catalog
+    save_catalog(Catalog(ec2=dict(list(catalog.ec2.items())[:1])), path)
+    status, health = request(server, 'POST', '/refresh')
+    assert status == 200 and health['ec2Groups'] == 1 and health['rdsGroups'] == 0
+
+def test_shape_memo_is_bounded(catalog):
+    config = EstimatorConfig()
+    bounded = Catalog(ec2=catalog.ec2, rds=catalog.rds, resolvedLimit=50)
+    shapes = [('us-east-1', 'Linux', 'm', float(cores), float(memory))
+              for cores in range(1, 21) for memory in range(1, 11)]
+
+    expected = catalog.resolve('ec2', config, shapes)
+    assert bounded.resolve('ec2', config, shapes) == expected
+    assert len(bounded.resolved[('ec2', 'first-fit', 'on-demand')]) == 50
+    # Evicted shapes resolve the same again
+    assert bounded.resolve('ec2', config, shapes[:10]) == expected[:10]
+
+# Request threads share the memo; evicting from it while others read it must not fail
+def test_shape_memo_is_thread_safe(catalog):
+    config = EstimatorConfig()
+    bounded = Catalog(ec2=catalog.ec2, rds=catalog.rds, resolvedLimit=8)
+    shapes = [('us-east-1', 'Linux', 'm', float(cores), float(memory))
+              for cores in range(1, 9) for memory in range(1, 5)]
+    expected = catalog.resolve('ec2', config, shapes)
+    failures = []
+
+    def resolve(offset):
+        try:
+            for call in range(400):
+                position = (offset + call) % len(shapes)
+                assert bounded.resolve('ec2', config, shapes[position:position + 3]) == expected[position:position + 3]
+        except Exception as error:
+            failures.append(error)
+
+    # Switch threads as often as possible, so any unguarded step gets interleaved
+    switchInterval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=resolve, args=(offset,)) for offset in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switchInterval)
+    assert failures == []
+    assert len(bounded.resolved[('ec2', 'first-fit', 'on-demand')]) == 8
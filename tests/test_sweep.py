@@ -0,0 +1,54 @@
+# Tests for scenario sweeps: every scenario's totals must be those of an estimate run with
+# its knobs
+
+from dataclasses import replace
+
+import pytest
+
+from awsbatchestimate.config import EstimatorConfig
+from awsbatchestimate.estimator import estimate, summarize_estimate
+from awsbatchestimate.sweep import expand_scenarios, sweep
+from synthetic_cmdb import synthetic_cmdb
+
+config = EstimatorConfig(srcMemUsed='Peak Mem Used')
+
+def test_expand_scenarios():
+    assert expand_scenarios({'cpuHeadroom': [.3, .5], 'ec2EBSUnitCost': .1}) == [
+        {'cpuHeadroom': .3, 'ec2EBSUnitCost': .1}, {'cpuHeadroom': .5, 'ec2EBSUnitCost': .1}]
+    assert expand_scenarios([{'cpuHeadroom': .3}, {}]) == [{'cpuHeadroom': .3}, {}]
+    with pytest.raises(ValueError, match="can't vary matchPolicy"):
+        expand_scenarios({'matchPolicy': ['cheapest']})
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_scenarios_match_direct_estimates(catalog, workers):
+    dfCMDB = synthetic_cmdb(400, seed=5)
+    scenarios = expand_scenarios({'cpuHeadroom': [.3, .51], 'memoryRatioCutoff': [4.5, 6],
+                                  'ec2EBSUnitCost': [.1, .151]})
+
+    dfSweep = sweep(dfCMDB, catalog, scenarios, config, workers)
+
+    assert len(dfSweep) == len(scenarios)
+    for position, scenario in enumerate(scenarios):
+        scenarioConfig = replace(config, **scenario)
+        dfEstimate = estimate(dfCMDB, catalog, scenarioConfig)
+        row = dfSweep.iloc[position]
+        for name, value in summarize_estimate(dfEstimate, scenarioConfig).items():
+            assert row[name] == pytest.approx(value), name
+        assert row['ebs_month_total'] == pytest.approx(dfEstimate['ebs_month_rate'].sum())
+
+def test_storage_only_scenarios_share_one_estimate(tmp_path, catalog, caplog):
+    dfCMDB = synthetic_cmdb(300, seed=6)
+    scenarios = expand_scenarios({'ec2EBSUnitCost': [.05, .1, .2], 'rdsEBSUnitCost': [.1, .3]})
+
+    with caplog.at_level('INFO', logger='awsbatchestimate'):
+        dfSweep = sweep(dfCMDB, catalog, scenarios, config, workers=2)
+    assert [record.args for record in caplog.records if record.msg.startswith("Sweeping")] == [(6, 1)]
+
+    # Sizing is the same everywhere, only the storage total moves with the rates
+    assert dfSweep['three_yr_total'].nunique() == 1
+    dfEstimate = estimate(dfCMDB, catalog, config)
+    rds = dfEstimate['RDS'].to_numpy(dtype=bool)
+    storage = dfEstimate[config.srcBlockStorage].to_numpy(dtype=float)
+    for position, scenario in enumerate(scenarios):
+        expected = storage[~rds].sum() * scenario['ec2EBSUnitCost'] + storage[rds].sum() * scenario['rdsEBSUnitCost']
+        assert dfSweep['ebs_month_total'].iloc[position] == pytest.approx(expected)
@@ -0,0 +1,56 @@
+# Tests for the run trace
+
+import sys
+
+import numpy as np
+import pytest
+
+from awsbatchestimate import trace
+from awsbatchestimate.trace import Tracer, current_rss, peak_rss
+
+def test_stage_memory_is_the_change_over_the_stage():
+    if current_rss() is None:
+        pytest.skip("no /proc to sample RSS from")
+    tracer = Tracer()
+
+    with tracer.stage('allocate'):
+        block = np.ones(64 * 2 ** 20 // 8)
+    with tracer.stage('free'):
+        del block
+    with tracer.stage('idle'):
+        pass
+
+    allocate, free, idle = tracer.stages
+    assert allocate['rssDeltaMB'] > 48
+    assert free['rssDeltaMB'] < -48
+    assert abs(idle['rssDeltaMB']) < 8
+
+# A peak allocated and freed within a stage only shows in the high-water mark
+def test_stage_peak_growth_catches_short_lived_peaks():
+    if peak_rss() is None or current_rss() is None:
+        pytest.skip("no resource module or /proc to read memory from")
+    tracer = Tracer()
+
+    # Enough to climb 128MB past the high-water mark from where memory is now
+    with tracer.stage('spike'):
+        block = np.ones((peak_rss() - current_rss() + 2 ** 27) // 8)
+        del block
+    with tracer.stage('idle'):
+        pass
+
+    spike, idle = tracer.stages
+    assert spike['peakRSSDeltaMB'] > 64 and idle['peakRSSDeltaMB'] == 0
+    assert abs(spike['rssDeltaMB']) < 8
+
+# Without the resource module (Windows) or /proc the memory fields are left out
+def test_stage_memory_left_out_where_unavailable(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'resource', None)
+    monkeypatch.delattr(trace.os, 'sysconf', raising=False)
+    tracer = Tracer()
+
+    with tracer.stage('read', rows=3):
+        pass
+
+    assert peak_rss() is None and current_rss() is None
+    assert set(tracer.stages[0]) == {'kind', 'name', 'rows', 'seconds'}
+    assert tracer.summary()['peakRSSMB'] is None
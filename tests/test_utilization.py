@@ -0,0 +1,94 @@
+# Tests for utilization sizing: sketched quantiles must be within the sketch's accuracy of the
+# exact ones, sketches must merge like one sketch, and applying them must leave the CMDB's
+# own columns alone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from awsbatchestimate.config import EstimatorConfig
+from awsbatchestimate.estimator import estimate
+from awsbatchestimate.utilization import UtilizationSketch, apply_utilization, compute_utilization
+from synthetic_cmdb import synthetic_cmdb
+
+accuracy = .01
+
+def samples(servers, perServer, seed=0):
+    rng = np.random.default_rng(seed)
+    names = np.repeat(['srv' + str(i).zfill(7) for i in range(servers)], perServer)
+    scale = np.repeat(rng.uniform(.5, 50, servers), perServer)
+    return pd.DataFrame({'Server': names,
+                         'cpuUsage': np.clip(rng.beta(2, 5, len(names)), 0, 1),
+                         'memoryUsed': rng.lognormal(0, .6, len(names)) * scale})
+
+def test_quantiles_are_within_the_accuracy():
+    dfSamples = samples(20, 5000)
+    dfSamples.loc[::97, 'memoryUsed'] = 0
+
+    sketch = UtilizationSketch(accuracy).add(dfSamples['Server'], 'memory', dfSamples['memoryUsed'])
+    dfStatistics = sketch.statistics('memory')
+
+    for server, values in dfSamples.groupby('Server')['memoryUsed']:
+        values = values.to_numpy()
+        assert dfStatistics.loc[server, 'peak'] == values.max()
+        for name, quantile in (('p95', .95), ('p99', .99)):
+            low, high = np.quantile(values, quantile, method='lower'), np.quantile(values, quantile, method='higher')
+            assert low * (1 - accuracy) <= dfStatistics.loc[server, name] <= high * (1 + accuracy), (server, name)
+
+def test_merged_sketches_equal_one_sketch():
+    dfSamples = samples(30, 400, seed=1)
+    whole = UtilizationSketch(accuracy).add(dfSamples['Server'], 'cpu', dfSamples['cpuUsage'])
+
+    merged = UtilizationSketch(accuracy)
+    dfShuffled = dfSamples.sample(frac=1, random_state=2)
+    for part in (dfShuffled.iloc[start::4] for start in range(4)):
+        merged.merge(UtilizationSketch(accuracy).add(part['Server'], 'cpu', part['cpuUsage']))
+
+    pd.testing.assert_frame_equal(merged.statistics('cpu').sort_index(), whole.statistics('cpu').sort_index())
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_files_are_read_like_one_sketch(tmp_path, workers):
+    dfSamples = samples(25, 300, seed=3)
+    parts = [dfSamples.iloc[:2000], dfSamples.iloc[2000:5000], dfSamples.iloc[5000:]]
+    parts[0].to_csv(tmp_path / 'a.csv', index=False)
+    parts[1].to_parquet(tmp_path / 'b.parquet', index=False)
+    parts[2].to_csv(tmp_path / 'c.csv', index=False)
+    config = EstimatorConfig(metricMemory='memoryUsed')
+
+    dfUtilization = compute_utilization([tmp_path / 'a.csv', tmp_path / 'b.parquet', tmp_path / 'c.csv'],
+                                        config, workers)
+
+    sketch = UtilizationSketch(accuracy)
+    sketch.add(dfSamples['Server'], 'cpu', dfSamples['cpuUsage'])
+    sketch.add(dfSamples['Server'], 'memory', dfSamples['memoryUsed'])
+    dfExpected = pd.concat([sketch.statistics('cpu').add_prefix('cpu_'),
+                            sketch.statistics('memory').add_prefix('memory_')], axis=1)
+    pd.testing.assert_frame_equal(dfUtilization.sort_index(), dfExpected.sort_index())
+
+def test_applying_leaves_the_cmdb_columns_alone(catalog):
+    # Used memory defaults to the provisioned memory column
+    config = EstimatorConfig(cpuStatistic='p99', memoryStatistic='peak')
+    dfCMDB = synthetic_cmdb(300, seed=51)
+    dfOriginal = dfCMDB.copy()
+    # Metrics for every other server
+    servers = dfCMDB['Server'].to_numpy()[::2]
+    dfUtilization = pd.DataFrame({'cpu_p99': np.linspace(.05, .95, len(servers)),
+                                  'memory_peak': np.linspace(1, 200, len(servers))}, index=servers)
+
+    dfSized = apply_utilization(dfCMDB, dfUtilization, config)
+
+    pd.testing.assert_frame_equal(dfCMDB, dfOriginal)
+    pd.testing.assert_frame_equal(dfSized[dfOriginal.columns], dfOriginal)
+    measured = dfCMDB['Server'].isin(dfUtilization.index).to_numpy()
+    np.testing.assert_array_equal(dfSized.loc[measured, config.utilCPU], dfUtilization['cpu_p99'])
+    np.testing.assert_array_equal(dfSized.loc[measured, config.utilMemory], dfUtilization['memory_peak'])
+    np.testing.assert_array_equal(dfSized.loc[~measured, config.utilCPU], dfCMDB.loc[~measured, 'cpuUsage'])
+    np.testing.assert_array_equal(dfSized.loc[~measured, config.utilMemory], dfCMDB.loc[~measured, 'Memory GB'])
+
+    # The estimate sizes from the utilization columns, keeping the provisioned memory
+    dfEstimate = estimate(dfSized, catalog, config)
+    dfReference = dfCMDB.assign(cpuUsage=dfSized[config.utilCPU], **{'Memory GB': dfSized[config.utilMemory]})
+    dfExpected = estimate(dfReference, catalog, config)
+    for column in ('cores_calc', 'calc_family', 'ec2_instance_type', 'three_yr_rate'):
+        pd.testing.assert_series_equal(dfEstimate[column], dfExpected[column])
+    pd.testing.assert_series_equal(dfEstimate['Memory GB'], dfOriginal['Memory GB'])